@@ -2,7 +2,29 @@ from math import *  # pylint: disable=unused-wildcard-import
 import adsk.core  # pylint: disable=import-error
 import adsk.fusion  # pylint: disable=import-error
 import adsk.cam  # pylint: disable=import-error
+import functools
+import json
+import os
+import threading
+import time
 import traceback
+import uuid
+
+from .eds.batch import (max_batch_surfaces, split_equations, surface_batch,
+                        sweep_equations, sweep_values)
+from .eds.cost import build_counts, cost_model
+from .eds.disk_cache import grid_disk_cache
+from .eds.edit import (can_move_points, changed_points, moved_line_ends,
+                       parameter_names, parameters_surface)
+from .eds.expression import EquationError
+from .eds.grid import evaluated_grid_cache
+from .eds.instrument import build_recorder
+from .eds.region import domain_types, is_closed_span
+from .eds.mesh import (decimate_grid, decimation_indices, decimation_stride,
+                       grid_triangle_indices)
+from .eds.scan import scan_surface
+from .eds.spline import bezier_knots, hermite_control_points
+from .eds.surface import surface_points
 
 # needed for events
 handlers = []
@@ -11,147 +33,220 @@ handlers = []
 ###############################################################################
 ###############################################################################
 
+# upper limit on the number of vertices drawn by the preview mesh
+default_preview_vertices = 20000
+
+# the folder of the add-in, where its cache and measurements are kept
+addin_folder = os.path.dirname(os.path.abspath(__file__))
+
+# seconds per operation measured by the builds on this machine, to estimate
+# how long the next build takes
+build_costs = cost_model(os.path.join(addin_folder, 'costs.json'))
+
+# grids evaluated by builds are kept next to the add-in, so building the same
+# surface again (or at another build type) does not evaluate it again
+build_disk_cache = grid_disk_cache(os.path.join(addin_folder, 'cache'))
+
+# builds recorded from the dialog are appended to this file, one JSON line
+# each, so a slow build can be looked into without building it again
+build_log_path = os.path.join(addin_folder, 'builds.jsonl')
+
+# the summary of the last recorded build, shown when the dialog is opened
+last_build_summary = ''
+
+# methods of equation_driven_surface a recorded build times as its phases
+recorded_phases = ['calculate_points', 'calculate_points_from', 'build',
+                   'make_loft_sections',
+                   'make_rails', 'loft_multiple', 'loft_all_sections',
+                   'build_tiles', 'stitch_surfaces', 'group_timeline_objects',
+                   'group_single_loft', 'make_mesh_body', 'export_file',
+                   'move_points', 'remove_surface', 'tag_body']
+
+# API methods a recorded build counts the calls of, by their class
+recorded_api_calls = {
+    'core.Point3D': ['create'],
+    'core.Vector3D': ['create'],
+    'core.NurbsCurve3D': ['createNonRational'],
+    'core.ObjectCollection': ['create', 'add'],
+    'core.ValueInput': ['createByReal'],
+    'core.Attributes': ['add', 'itemByName'],
+    'fusion.Design': ['findAttributes'],
+    'fusion.Sketches': ['add'],
+    'fusion.SketchLines': ['addByTwoPoints'],
+    'fusion.SketchFixedSplines': ['addByNurbsCurve'],
+    'fusion.SketchPoint': ['move'],
+    'fusion.Profiles': ['item'],
+    'fusion.Features': ['createPath'],
+    'fusion.LoftFeatures': ['createInput', 'add'],
+    'fusion.LoftSections': ['add'],
+    'fusion.LoftCenterLineOrRails': ['addRail'],
+    'fusion.StitchFeatures': ['createInput', 'add'],
+    'fusion.BaseFeatures': ['add'],
+    'fusion.MeshBodies': ['addByTriangleMeshData'],
+    'fusion.TimelineGroups': ['add'],
+}
+
+
+def log(message):
+    """
+    writes a message to the TEXT COMMANDS window
+    """
+    adsk.core.Application.get().log(message)
+
+
+class BuildCancelled(Exception):
+    """
+    raised when the user cancels a build from its progress dialog
+    """
+
+
+# fired from the worker thread when the points of a build are calculated
+points_ready_event_id = 'eds_points_ready'
+
+# evaluations running on worker threads, by the id passed with the event
+background_evaluations = {}
+
+
+class background_evaluation():
+    """
+    calculates the points of a surface on a worker thread, so that Fusion
+    stays responsive, and reports back to the main thread through a custom
+    event when it is done
+    """
+
+    def __init__(self, eds):
+        self.eds = eds
+        self.error = None
+        self.is_done = False
+        self.id = str(id(self))
+        self.thread = threading.Thread(target=self.run, daemon=True)
+
+    def start(self):
+        background_evaluations[self.id] = self
+        self.thread.start()
+
+    def run(self):
+        try:
+            self.eds.calculate_points()
+        except Exception as error:  # noqa
+            self.error = error
+        adsk.core.Application.get().fireCustomEvent(points_ready_event_id, self.id)
+
+    # processes Fusion's events until the points are ready, raising
+    # BuildCancelled if the progress dialog is cancelled first
+    def wait(self, progress_dialog):
+        while not self.is_done:
+            adsk.doEvents()
+            if progress_dialog.wasCancelled:
+                background_evaluations.pop(self.id, None)
+                raise BuildCancelled()
+            self.thread.join(0.01)
+        if self.error:
+            raise self.error
+        return
+
+
+def register_custom_events():
+    app = adsk.core.Application.get()
+    points_ready_event = app.registerCustomEvent(points_ready_event_id)
+    onPointsReady = PointsReadyEventHandler()
+    points_ready_event.add(onPointsReady)
+    handlers.append(onPointsReady)
+    preview_ready_event = app.registerCustomEvent(preview_ready_event_id)
+    onPreviewReady = PreviewReadyEventHandler()
+    preview_ready_event.add(onPreviewReady)
+    handlers.append(onPreviewReady)
+
+
+# the attribute group of the attributes that tie the sketches, features and
+# bodies of a build together. every one of them gets an attribute named by
+# the id of the surface, and the bodies one named 'inputs' holding the
+# inputs they were built from
+eds_attribute_group = 'EquationDrivenSurface'
+
+# custom graphics groups drawn by the preview, removed before the next one
+preview_graphics = []
+
+
+def remove_preview_graphics():
+    for graphics in preview_graphics:
+        if graphics.isValid:
+            graphics.deleteMe()
+    preview_graphics.clear()
+
+
 # class used to create equation driven surface
+# the points are calculated by surface_points, this adds the Fusion geometry
 
 
-class equation_driven_surface():
+class equation_driven_surface(surface_points):
     def __init__(self, eds_input):
+        super().__init__(
+            equation=eds_input[0], domain=eds_input[1], has_base=eds_input[2],
+            base_type=eds_input[3], base_offset=eds_input[4],
+            res_type=eds_input[5], step_size=eds_input[6],
+            num_interv_x=eds_input[7], num_interv_y=eds_input[8],
+            max_deviation=eds_input[10], tile_size=eds_input[13],
+            domain_type=eds_input[15], mask=eds_input[16])
         app = adsk.core.Application.get()
         self.root_comp = app.activeProduct.rootComponent
         self.sketches = self.root_comp.sketches
         self.timeline = app.activeProduct.timeline
         # get inputs
-        self.equation = eds_input[0]
-        self.domain = eds_input[1]
-        self.has_base = eds_input[2]
-        self.base_type = eds_input[3]
-        self.base_offset = eds_input[4]
-        self.res_type = eds_input[5]
-        self.step_size = eds_input[6]
-        self.num_interv_x = eds_input[7]
-        self.num_interv_y = eds_input[8]
         self.plane = eds_input[9]
+        self.build_type = eds_input[11]
+        # fitted splines instead of lines, along the axes of a rectangle only
+        self.smooth_splines = eds_input[12] and self.domain_type == "Rectangle"
+        self.defer_compute = eds_input[14]  # sketch without recomputing each curve
+        # lofted tiles are built one by one, so the ones that can be
+        # evaluated are built even when others can not
+        self.allow_failed_tiles = self.build_type in ("Loft", "Single Loft")
+        # one loft through all sections instead of one loft per strip
+        self.single_loft = self.build_type == "Single Loft"
+        self.export_path = None  # file written by the "Export File" build
+        self.eds_input = eds_input
+        self.surface_id = uuid.uuid4().hex  # names the attributes of the build
+        self.edited_body = None  # body of an earlier build to change into this
+        self.edited_parameters = None  # the inputs edited_body was built from
+        # groups the timeline items of the build, off for the surfaces of a
+        # batch as every one of them is a timeline group itself
+        self.group_timeline = True
         # internal variables
-        self.points = []  # array of points of form [[p1,p2],[p4,p5]]
         self.loft_sections = []
         self.rails = []
-        self.min_z = 0
-        self.base_level = 0
-
-    ##########################################################################
-
-    def make_xy_points_grid(self):
-        """
-        creates a 2D array of points in the xy-plane in the specifed domain
-        uses step size, number of intervals (x & y) and resolution type
-        """
-        x_min, x_max = self.domain[0][0], self.domain[0][1]
-        y_min, y_max = self.domain[1][0], self.domain[1][1]
-        # these two different methods reflect the difference in input type: step size vs number of intervals
-        if self.res_type == "Interval Length":
-            x_step = y_step = self.step_size
-            row = []
-            x = x_min
-            while x <= x_max:
-                y = y_min
-                while y <= y_max:
-                    row.append([x, y])
-                    y += y_step
-                x += x_step
-                self.points.append(row)
-                row = []
-        else:
-            row = []
-            for i in range(0, self.num_interv_x+1):
-                for j in range(0, self.num_interv_y+1):
-                    x = (i/self.num_interv_x)*(x_max-x_min)+x_min
-                    y = (j/self.num_interv_y)*(y_max-y_min)+y_min
-                    row.append([x, y])
-                self.points.append(row)
-                row = []
-        return
-
-    def add_z_dimension(self):
-        """
-        takes a set of points in the xy-plane and a function_string and returns
-        a set of points in 3D space as well as the minimum z value
-        """
-        def z_function(x, y):
-            return eval(self.equation)
-        self.min_z = z_function(self.points[0][0][0],
-                                self.points[0][0][1])  # initialize
-        for row in self.points:
-            for point in row:
-                point.append(z_function(point[0], point[1]))
-                if point[2] < self.min_z:
-                    self.min_z = point[2]
-        return self.points
-
-    def center_points(self):
-        """
-        shift all points such that they are in the center of the xy-plane
-        """
-        points = self.points
-        shifted_points = points
-        x_min, x_max = points[0][0][0], points[-1][0][0]
-        y_min, y_max = points[0][0][1], points[0][-1][1]
-        x_offset = (x_min + x_max) / 2
-        y_offset = (y_min + y_max) / 2
-        print(y_offset)
-        for i in range(len(points)):
-            for j in range(len(points[i])):
-                x = points[i][j][0] - x_offset
-                y = points[i][j][1] - y_offset
-                z = points[i][j][2]
-                shifted_points[i][j] = [x, y, z]
-        return shifted_points
-
-    # interprets the base_type set by the user and returns a base_level
-    def get_base_level(self):
-        if self.base_type == "Automatic":
-            if self.min_z < -self.base_offset:
-                self.base_level = self.min_z + self.base_offset
-            else:
-                self.base_level = 0
-        elif self.base_type == "xy-plane":
-            self.base_level = self.base_offset
-        elif self.base_type == "Minimum Value":
-            self.base_level = self.min_z + self.base_offset
-        return
-
-    # takes a set of points in 3D space and adds a set of points at base_level
-    def add_base_points(self):
-        for row in self.points:
-            first_point = row[0]
-            last_point = row[len(row) - 1]
-            row.append([last_point[0], last_point[1], self.base_level])
-            row.append([first_point[0], first_point[1], self.base_level])
-        return self.points
-
-    # returns the array of points outlining the solid body to be created
-    def calculate_points(self):  # noqa
-        self.make_xy_points_grid()
-        points = self.add_z_dimension()
-        points = self.center_points()
+        self.progress = None  # called with the step count as the build goes
+        self.build_step = 0
+        # time spent in and curves made by make_section, shared with the tiles
+        self.sketch_stats = {'seconds': 0, 'curves': 0}
+
+    # an exported surface is evaluated as it is written, so only its grid and
+    # base level are found beforehand
+    def calculate_points(self):
+        if self.build_type == "Export File":
+            return self.prepare_export()
+        return super().calculate_points()
+
+    # plots the set of points as a single custom graphics mesh, with the base
+    # outlined by lines. grids denser than max_vertices are decimated first
+    def plot_points(self, max_vertices=default_preview_vertices):
+        graphics = self.root_comp.customGraphicsGroups.add()
+        preview_graphics.append(graphics)
+        surface = self.surface()
+        stride = decimation_stride(*surface.shape[:2], max_vertices)
+        surface = decimate_grid(surface, max_vertices)
+        num_rows, num_cols = surface.shape[:2]
+        coordinates = adsk.fusion.CustomGraphicsCoordinates.create(
+            surface.ravel().tolist())
+        indices = grid_triangle_indices(num_rows, num_cols, self.is_closed())
+        graphics.addMesh(coordinates, indices.tolist(), [], [])
         if self.has_base:
-            self.get_base_level()
-            points = self.add_base_points()
-        self.points = points
-        return self.points
-
-    ###########################################################################
-
-    # plots the set of points
-    def plot_points(self):
-        sketch = self.sketches.add(self.plane)
-        sketchPoints = sketch.sketchPoints
-        for row in self.points:
-            for point in row:
-                x = point[0]
-                y = point[1]
-                z = point[2]
-                point = adsk.core.Point3D.create(x, y, z)
-                sketchPoints.add(point)
+            # one closed strip per slice: last point, base, first point
+            rows = decimation_indices(len(self.points), stride)
+            outline = self.points[rows][:, [-3, -2, -1, 0]]
+            coordinates = adsk.fusion.CustomGraphicsCoordinates.create(
+                outline.ravel().tolist())
+            graphics.addLines(coordinates, [], True, [4] * len(outline))
+        return graphics
 
     # creates a line from cart_point1 to cart_point2. returns line object
     # inputs are of the form cart_point = [x,y,z]
@@ -160,19 +255,53 @@ class equation_driven_surface():
         point1 = Point3D.create(cart_point1[0], cart_point1[1], cart_point1[2])
         point2 = Point3D.create(cart_point2[0], cart_point2[1], cart_point2[2])
         line = sketch.sketchCurves.sketchLines.addByTwoPoints(point1, point2)
+        self.sketch_stats['curves'] += 1
         return line
 
+    # creates a fixed spline through points with the given tangents, made of
+    # one cubic segment between each pair of points. returns spline object
+    def make_spline(self, sketch, points, tangents, parameters):
+        control_points = hermite_control_points(points, tangents, parameters)
+        control_points = [adsk.core.Point3D.create(*point)
+                          for point in control_points.tolist()]
+        curve = adsk.core.NurbsCurve3D.createNonRational(
+            control_points, 3, bezier_knots(parameters).tolist(), False)
+        spline = sketch.sketchCurves.sketchFixedSplines.addByNurbsCurve(curve)
+        self.sketch_stats['curves'] += 1
+        return spline
+
     # creates multiple lines based on a set of ordered points that are ideally
-    # in the same plane
-    def make_section(self, points_2D, type):
+    # in the same plane. with tangents, the first len(parameters) points are
+    # joined by a spline instead and only the rest (the base) by lines
+    # with defer_compute, the sketch is only computed once all of its curves
+    # are added instead of after every curve
+    def make_section(self, points_2D, type, tangents=None, parameters=None,
+                     role='section'):
         sketch = self.sketches.add(self.plane)  # create sketch object
         sketch.isLightBulbOn = False  # hide sketches no matter what
+        self.tag(sketch, role)
+        sketch.isComputeDeferred = self.defer_compute
         lines_collection = adsk.core.ObjectCollection.create()  # for path
-        for i in range(len(points_2D) - 1):
+        num_fitted = 1
+        if tangents is not None and type == 'polyline':
+            # one spline per strip, as each loft takes its own piece of rail
+            splines = [self.make_spline(sketch, points_2D[i:i + 2],
+                                        tangents[i:i + 2], parameters[i:i + 2])
+                       for i in range(len(parameters) - 1)]
+            sketch.isComputeDeferred = False
+            return splines
+        elif tangents is not None:
+            num_fitted = len(parameters)
+            lines_collection.add(self.make_spline(
+                sketch, points_2D[:num_fitted], tangents, parameters))
+        points_2D = points_2D.tolist()  # floats are much faster to index
+        for i in range(num_fitted - 1, len(points_2D) - 1):
             line = self.make_line(sketch, points_2D[i], points_2D[i + 1])
             lines_collection.add(line)
         if type == 'profile':
             self.make_line(sketch, points_2D[len(points_2D) - 1], points_2D[0])
+        sketch.isComputeDeferred = False  # profiles need the computed sketch
+        if type == 'profile':
             profile = sketch.profiles.item(0)
             return profile
         elif type == 'polyline':
@@ -181,12 +310,19 @@ class equation_driven_surface():
             path = self.root_comp.features.createPath(lines_collection)
             return path
 
-    # creates multiple sections of desired type
-    def make_sections(self, points, type):
+    # creates multiple sections of desired type. their sketches are tagged
+    # with the role and their index, counted from first_index
+    def make_sections(self, points, type, tangents=None, parameters=None,
+                      role='section', first_index=0):
         sections = []
         for i in range(len(points)):
+            start = time.perf_counter()
             sections.append(self.make_section(
-                points[i], type))
+                points[i], type,
+                None if tangents is None else tangents[i], parameters,
+                '{} {}'.format(role, first_index + i)))
+            self.sketch_stats['seconds'] += time.perf_counter() - start
+            self.report_progress()
         return sections
 
     # like above but specifically for lofting (not rails)
@@ -195,27 +331,37 @@ class equation_driven_surface():
             type = 'profile'
         else:
             type = 'path'
-        self.loft_sections = self.make_sections(
-            self.points, type)
+        if self.smooth_splines:
+            self.loft_sections = self.make_sections(
+                self.points, type, self.surface_tangents('y'), self.y_values)
+        else:
+            self.loft_sections = self.make_sections(
+                self.points, type)
         return
 
-    # transposes arrays
-    def transpose_array(self, array):
-        col = []
-        transposed_array = []
-        for i in range(len(array[0])):
-            for j in range(len(array)):
-                col.append(array[j][i])
-            transposed_array.append(col)
-            col = []
-        return transposed_array
-
-    # makes rails for loft
+    # makes rails for loft. the rail points are a strided view of the
+    # points, so transposing them copies nothing
+    # for a single loft, every rail is one path along the whole surface
+    # instead, and self.rails is a list of them
     def make_rails(self):
-        tpd_points = self.transpose_array(self.points)
-        tpd_rails = self.make_sections(
-            tpd_points, 'polyline')
-        self.rails = self.transpose_array(tpd_rails)
+        tpd_points = self.rail_points().transpose(1, 0, 2)
+        type = 'path' if self.single_loft else 'polyline'
+        if self.smooth_splines:
+            # the base rails are straight, so they stay lines
+            num_cols = len(self.y_values)
+            tangents = self.surface_tangents('x').transpose(1, 0, 2)
+            tpd_rails = self.make_sections(
+                tpd_points[:num_cols], type, tangents, self.x_values, 'rail')
+            tpd_rails += self.make_sections(
+                tpd_points[num_cols:], type, role='rail', first_index=num_cols)
+        else:
+            tpd_rails = self.make_sections(
+                tpd_points, type, role='rail')
+        if self.single_loft:
+            self.rails = tpd_rails
+        else:
+            # the rails of each loft, one interval of every rail
+            self.rails = list(zip(*tpd_rails))
         return
 
     # to stich surfaces together at end of surface loft
@@ -223,22 +369,29 @@ class equation_driven_surface():
         stitch_features = self.root_comp.features.stitchFeatures
         tolerance = adsk.core.ValueInput.createByReal(1.0)  # random tolerance
         stitch_input = stitch_features.createInput(surfaces, tolerance)
-        stitch_features.add(stitch_input)
-        return
+        stitch_feature = stitch_features.add(stitch_input)
+        self.tag(stitch_feature, 'stitch')
+        return stitch_feature
 
-    def loft_single(self, section_pair, loft_rails):
+    def loft_single(self, section_pair, loft_rails, is_closed=False):
         join_feature = adsk.fusion.FeatureOperations.JoinFeatureOperation
         loft_features = self.root_comp.features.loftFeatures
         loft_input = loft_features.createInput(join_feature)
+        loft_input.isClosed = is_closed  # from the last section to the first
         for rail in loft_rails:
             loft_input.centerLineOrRails.addRail(rail)
         for section in section_pair:
             loft_input.loftSections.add(section)
         loft_feature = loft_features.add(loft_input)
+        self.tag(loft_feature, 'loft')
         return loft_feature
 
+    # lofts the sections together strip by strip and returns the body. a
+    # closed grid has one more strip, from its last section to its first
     def loft_multiple(self):
         sections = self.loft_sections
+        if self.is_closed():
+            sections = sections + sections[:1]
         rails = self.rails  # so we don't make these backwards
         sections.reverse()
         rails.reverse()  # makes the normals look better when without base
@@ -251,29 +404,328 @@ class equation_driven_surface():
             surface = loft_feature.bodies.item(0)
             if not self.has_base:
                 surfaces.add(surface)
+            self.report_progress()
         if not self.has_base and len(surfaces) > 1:
-            self.stitch_surfaces(surfaces)  # to connect all the surfaces
+            # to connect all the surfaces
+            return self.stitch_surfaces(surfaces).bodies.item(0)
+        return surface
+
+    # lofts all sections at once, guided by the full length rails, and returns
+    # the body. with a base the sections are closed profiles, so this one
+    # feature is the whole solid
+    def loft_all_sections(self):
+        sections = list(reversed(self.loft_sections))  # as loft_multiple
+        loft_feature = self.loft_single(sections, self.rails, self.is_closed())
+        self.report_progress()
+        return loft_feature.bodies.item(0)
+
+    # groups the sketches of a single loft into rails and sections
+    def group_single_loft(self):
+        timeline_groups = self.timeline.timelineGroups
+        section_name = 'Loft Profiles' if self.has_base else 'Loft Paths'
+        end_index = self.timeline.count - 2  # the item before the loft
+        for name, length in [('Rails', len(self.rails)),
+                             (section_name, len(self.loft_sections))]:
+            timeline_groups.add(end_index - length + 1, end_index).name = name
+            end_index -= length
+        return
+
+    # builds the surface (and base) as a single triangle mesh body
+    def make_mesh_body(self):
+        vertices, triangles = self.mesh()
+        design = adsk.fusion.Design.cast(adsk.core.Application.get().activeProduct)
+        base_feature = None
+        if design.designType == adsk.fusion.DesignTypes.ParametricDesignType:
+            base_feature = self.root_comp.features.baseFeatures.add()
+            base_feature.startEdit()
+        mesh_body = self.root_comp.meshBodies.addByTriangleMeshData(
+            vertices.ravel().tolist(), triangles.ravel().tolist(), [], [])
+        mesh_body.name = 'Equation Driven Surface'
+        if base_feature:
+            base_feature.finishEdit()
+            base_feature.name = 'Equation Driven Surface'
+            self.tag(base_feature, 'mesh')
+        return mesh_body
+
+    # the number of steps build reports progress for
+    def count_build_steps(self):
+        if self.build_type in ("Mesh Body", "Export File"):
+            return 1
+        steps = 1
+        num_base_points = 2 if self.has_base else 0
+        for rows, columns in self.tiles():
+            sections = len(self.x_values[rows])
+            rails = len(self.y_values[columns]) + num_base_points
+            lofts = 1 if self.single_loft else sections - 1 + self.is_closed()
+            steps += sections + rails + lofts
+        return steps
+
+    # tells the progress callback, if any, that one more step is done
+    def report_progress(self):
+        self.build_step += 1
+        if self.progress:
+            self.progress(self.build_step)
+
+    # the counts of what the build (or a build of another type) evaluates
+    # and creates
+    def build_counts(self, build_type=None):
+        return build_counts(len(self.x_values), len(self.y_values),
+                            self.has_base, build_type or self.build_type,
+                            self.smooth_splines, self.tile_size, self.is_closed(),
+                            self.grid_x is None)
+
+    # builds the surface with the chosen method, logs how long it took and
+    # updates the measured costs of the operations it did. an edited surface
+    # has its points moved if it can, and is replaced otherwise
+    def build(self):
+        if self.edited_body and self.move_points():
+            self.report_progress()
+            return
+        elif self.edited_body:
+            self.remove_surface(self.edited_parameters['id'])
+        start = time.perf_counter()
+        counts = self.build_counts()
+        if self.evaluation_seconds is not None:
+            build_costs.update('sample', self.evaluation_seconds, counts['samples'])
+        if self.build_type == "Export File":
+            evaluated = self.evaluation_seconds or 0
+            self.export_file(self.export_path)
+            # less the time the points evaluated as they were written took
+            seconds = time.perf_counter() - start - (
+                (self.evaluation_seconds or 0) - evaluated)
+            build_costs.update('export triangle', seconds, counts['export triangles'])
+            log('Exported {} in {:.2f}s'.format(self.export_path, seconds))
+        elif self.build_type == "Mesh Body":
+            self.tag_body(self.make_mesh_body())
+            seconds = time.perf_counter() - start
+            build_costs.update('mesh triangle', seconds, counts['mesh triangles'])
+            message = 'Mesh body built in {:.2f}s'.format(seconds)
+            if 'loft strip' in build_costs.costs:
+                loft_counts = dict(self.build_counts("Loft"), samples=0)
+                loft_seconds = build_costs.estimate(loft_counts, self.defer_compute)
+                message += ', about {:.2f}s less than lofting it'.format(
+                    loft_seconds - seconds)
+            log(message)
+        else:
+            if len(self.tiles()) > 1:
+                bodies = self.build_tiles()
+                message = '{} tiles built'.format(len(self.tiles()))
+            elif self.single_loft:
+                self.make_loft_sections()
+                self.make_rails()
+                bodies = [self.loft_all_sections()]
+                if self.group_timeline:
+                    self.group_single_loft()
+                message = 'Single loft built'
+            else:
+                self.make_loft_sections()
+                self.make_rails()
+                bodies = [self.loft_multiple()]
+                if self.group_timeline:
+                    self.group_timeline_objects()
+                message = 'Loft built'
+            for body in bodies:
+                self.tag_body(body)
+            seconds = time.perf_counter() - start
+            log('{} in {:.2f}s'.format(message, seconds))
+            # tiles that failed make the counts too high
+            if not self.failed_tiles:
+                lofting = seconds - self.sketch_stats['seconds']
+                if self.single_loft:
+                    build_costs.update('single loft section', lofting,
+                                       counts['single loft sections'])
+                else:
+                    build_costs.update('loft strip', lofting, counts['lofts'])
+            self.log_sketch_timing()
+        build_costs.save()
+        self.report_progress()
         return
 
+    # logs the time spent sketching per curve, next to the time per curve
+    # measured by earlier builds that did the opposite about deferring
+    # sketch compute
+    def log_sketch_timing(self):
+        seconds, curves = self.sketch_stats['seconds'], self.sketch_stats['curves']
+        if not curves:
+            return
+        modes = {True: 'deferred', False: 'not deferred'}
+        build_costs.update('sketch curve ' + modes[self.defer_compute], seconds, curves)
+        message = 'Sketched {} curves in {:.2f}s, {:.2f}ms each with compute {}'.format(
+            curves, seconds, 1000 * seconds / curves, modes[self.defer_compute])
+        other = 'sketch curve ' + modes[not self.defer_compute]
+        if other in build_costs.costs:
+            message += ' and {:.2f}ms each with compute {} in earlier builds'.format(
+                1000 * build_costs.costs[other], modes[not self.defer_compute])
+        log(message)
+
+    # returns the part of the surface in the given rows and columns, built
+    # like any other surface but reporting progress through this one
+    def make_tile(self, rows, columns):
+        tile = self.tile(rows, columns)
+        tile.loft_sections = []
+        tile.rails = []
+        tile.progress = lambda step: self.report_progress()
+        return tile
+
+    # lofts every tile on its own, in a timeline group of its own, and then
+    # stitches the tile surfaces together. a tile that can not be evaluated
+    # or lofted is recorded in failed_tiles and the others are built anyway
+    # returns the bodies built
+    def build_tiles(self):
+        timeline_groups = self.timeline.timelineGroups
+        surfaces = adsk.core.ObjectCollection.create()
+        bodies = []
+        for index, (rows, columns) in enumerate(self.tiles()):
+            if index in self.failed_tiles:
+                continue
+            tile = self.make_tile(rows, columns)
+            start_index = self.timeline.count
+            try:
+                tile.make_loft_sections()
+                tile.make_rails()
+                if self.single_loft:
+                    body = tile.loft_all_sections()
+                else:
+                    body = tile.loft_multiple()
+            except BuildCancelled:
+                raise
+            except Exception as error:  # noqa
+                self.failed_tiles[index] = str(error)
+                log('Tile {} failed: {}'.format(index + 1, error))
+                self.remove_timeline_items(start_index)
+                continue
+            if self.group_timeline and self.timeline.count - start_index > 1:
+                timeline_groups.add(start_index, self.timeline.count - 1).name = \
+                    'Tile {}'.format(index + 1)
+            bodies.append(body)
+            if not self.has_base:
+                surfaces.add(body)
+        if len(surfaces) > 1:
+            return [self.stitch_surfaces(surfaces).bodies.item(0)]
+        return bodies
+
+    # deletes what was created since the timeline had start_index items
+    def remove_timeline_items(self, start_index):
+        for index in reversed(range(start_index, self.timeline.count)):
+            entity = self.timeline.item(index).entity
+            if entity and entity.isValid:
+                entity.deleteMe()
+
+    # the inputs the surface is built from, as stored on its bodies
+    def parameters(self):
+        values = self.eds_input[:9] + self.eds_input[10:]
+        parameters = dict(zip(parameter_names, values))
+        parameters['id'] = self.surface_id
+        return parameters
+
+    # ties an entity to the other entities of the build, see
+    # eds_attribute_group. role tells what part of the build it is
+    def tag(self, entity, role):
+        entity.attributes.add(eds_attribute_group, self.surface_id, role)
+
+    def tag_body(self, body):
+        self.tag(body, 'body')
+        body.attributes.add(eds_attribute_group, 'inputs',
+                            json.dumps(self.parameters()))
+
+    # makes the build change the surface of a body an earlier build made,
+    # instead of making a new one. returns False if no build made the body
+    def edit(self, body):
+        attribute = body.attributes.itemByName(eds_attribute_group, 'inputs')
+        if not attribute or self.build_type == "Export File":
+            return False
+        self.edited_body = body
+        self.edited_parameters = json.loads(attribute.value)
+        return True
+
+    # the entities of an earlier build, by their role
+    def tagged_entities(self, surface_id):
+        design = adsk.fusion.Design.cast(adsk.core.Application.get().activeProduct)
+        attributes = design.findAttributes(eds_attribute_group, surface_id)
+        return [(attribute.value, attribute.parent) for attribute in attributes
+                if attribute.parent and attribute.parent.isValid]
+
+    # turns the edited surface into this one by moving the sketch points
+    # that changed, when both builds make the same sketches with the same
+    # lines. only the sections and rails through a moved point are edited,
+    # so a new base offset only moves the base lines, and Fusion recomputes
+    # the lofts that depend on them. returns False if the points can not
+    # be moved
+    def move_points(self):
+        start = time.perf_counter()
+        old = parameters_surface(self.edited_parameters)
+        old.disk_cache = self.disk_cache
+        old.calculate_points()
+        if not can_move_points(self.edited_parameters, old, self.parameters(), self):
+            return False
+        sketches = dict(self.tagged_entities(self.edited_parameters['id']))
+        changed = changed_points(old.points, self.points)
+        rows = changed.any(axis=1).nonzero()[0].tolist()
+        columns = changed.any(axis=0).nonzero()[0].tolist()
+        roles = ['section {}'.format(row) for row in rows] + \
+            ['rail {}'.format(column) for column in columns]
+        if not all(role in sketches for role in roles):
+            return False  # some of the sketches were deleted since
+        moved = 0
+        for row in rows:
+            moved += self.move_line_ends(
+                sketches['section {}'.format(row)], old.points[row],
+                self.points[row], changed[row], self.has_base)
+        for column in columns:
+            moved += self.move_line_ends(
+                sketches['rail {}'.format(column)], old.points[:, column],
+                self.points[:, column], changed[:, column], self.is_closed())
+        self.surface_id = self.edited_parameters['id']
+        self.tag_body(self.edited_body)
+        log('Moved {} line ends in {} sketches in {:.2f}s'.format(
+            moved, len(roles), time.perf_counter() - start))
+        return True
+
+    # moves the ends of the lines of a section or rail sketch that are on
+    # changed points from their old to their new position
+    def move_line_ends(self, sketch, old_points, new_points, changed, closed):
+        lines = sketch.sketchCurves.sketchLines
+        sketch.isComputeDeferred = True
+        line_ends = moved_line_ends(changed, closed)
+        for line, end, point in line_ends:
+            sketch_line = lines.item(line)
+            sketch_point = sketch_line.endSketchPoint if end else sketch_line.startSketchPoint
+            translation = (new_points[point] - old_points[point]).tolist()
+            sketch_point.move(adsk.core.Vector3D.create(*translation))
+        sketch.isComputeDeferred = False
+        return len(line_ends)
+
+    # deletes the features and sketches an earlier build made, the latest
+    # first so nothing is deleted before what depends on it
+    def remove_surface(self, surface_id):
+        entities = [entity for role, entity in self.tagged_entities(surface_id)
+                    if role != 'body']
+        for entity in sorted(entities, key=timeline_index, reverse=True):
+            if entity.isValid:
+                entity.deleteMe()
+        if self.edited_body.isValid:  # a mesh body of a direct design
+            self.edited_body.deleteMe()
+
     ###########################################################################
 
     # groups timeline items into three groups
     def group_timeline_objects(self):
         # there are are lot of whacky edge cases here
         timeline_groups = self.timeline.timelineGroups
+        num_lofts = len(self.loft_sections) - 1 + self.is_closed()
         if not self.has_base:
             names = ['Loft & Stitch', 'Rails', 'Loft Paths']
-            lengths = [len(self.loft_sections),
+            lengths = [num_lofts + 1,
                        len(self.rails[0]),
                        len(self.loft_sections)]
         else:
             names = ['Loft', 'Rails', 'Loft Profiles']
-            lengths = [len(self.loft_sections) - 1,
+            lengths = [num_lofts,
                        len(self.rails[0]),
                        len(self.loft_sections)]
         start_index = self.timeline.count
 
-        if len(self.loft_sections) <= 2:  # in the situation where only one loft is required
+        if num_lofts <= 1:  # in the situation where only one loft is required
             names.pop(0)
             lengths.pop(0)
             start_index -= 1
@@ -284,6 +736,93 @@ class equation_driven_surface():
         return
 
 
+# several equation driven surfaces over one shared grid, see surface_batch.
+# the surfaces are built one after the other, each in a timeline group of
+# its own, and report their progress as the progress of the batch
+
+
+class equation_driven_batch(surface_batch):
+    def __init__(self, eds_input, equations, sweep=None, spacing=0):
+        surfaces = [equation_driven_surface([equation] + eds_input[1:])
+                    for equation in equations]
+        super().__init__(surfaces, spacing, sweep)
+        for surface in surfaces:
+            surface.group_timeline = False
+            surface.progress = lambda step: self.report_progress()
+        self.timeline = surfaces[0].timeline
+        self.export_path = None  # numbered for each surface
+        self.progress = None
+        self.build_step = 0
+
+    def count_build_steps(self):
+        return sum(surface.count_build_steps() for surface in self.surfaces)
+
+    def report_progress(self):
+        self.build_step += 1
+        if self.progress:
+            self.progress(self.build_step)
+
+    def build(self):
+        start = time.perf_counter()
+        for index, surface in enumerate(self.surfaces):
+            if self.export_path:
+                root, extension = os.path.splitext(self.export_path)
+                surface.export_path = '{}-{}{}'.format(root, index + 1, extension)
+            start_index = self.timeline.count if self.timeline else 0
+            surface.build()
+            if self.timeline and self.timeline.count - start_index > 1:
+                self.timeline.timelineGroups.add(
+                    start_index, self.timeline.count - 1).name = \
+                    'Surface {}: {}'.format(index + 1, surface.equation)
+        log('{} surfaces built in {:.2f}s'.format(
+            len(self.surfaces), time.perf_counter() - start))
+        return
+
+
+# the position of an entity in the timeline, -1 if it has none as in a
+# direct design
+def timeline_index(entity):
+    try:
+        return entity.timelineObject.index
+    except:  # noqa
+        return -1
+
+
+# starts recording a build, see build_recorder. with profile the build is
+# also profiled with cProfile
+def start_recording(profile):
+    recorder = build_recorder(profile)
+    recorder.time_methods(equation_driven_surface, recorded_phases)
+    recorder.time_methods(equation_driven_batch, ['evaluate'])
+    for class_path, names in recorded_api_calls.items():
+        module, class_name = class_path.split('.')
+        owner = getattr(getattr(adsk, module), class_name, None)
+        if owner:
+            recorder.count_calls(owner, names)
+    recorder.start()
+    return recorder
+
+
+# stops recording the build of surfaces, appends its record to the build
+# log and keeps its summary for the dialog
+def finish_recording(recorder, surfaces, outcome):
+    global last_build_summary
+    recorder.stop()
+    eds = surfaces[0]
+    points = [surface.points for surface in surfaces if surface.points is not None]
+    if points:
+        recorder.memory('points', sum(array.nbytes for array in points))
+    details = {'inputs': eds.parameters(), 'outcome': outcome,
+               'failed tiles': sum(len(surface.failed_tiles) for surface in surfaces)}
+    if len(surfaces) > 1:
+        details['batch equations'] = [surface.equation for surface in surfaces]
+    if eds.x_values is not None:
+        details['counts'] = eds.build_counts()
+    recorder.write(build_log_path, details)
+    last_build_summary = recorder.summary()
+    log(last_build_summary)
+
+
 def run(context):
     ui = None
     try:
@@ -308,6 +847,8 @@ def run(context):
         cmdDef.commandCreated.add(onCommandCreated)
         handlers.append(onCommandCreated)
 
+        register_custom_events()
+
         if context['IsApplicationStartup'] is False:
             ui.messageBox(
                 'The "Equation Driven Surface" command has been added\nto the CREATE panel of the SURFACE workspace.')
@@ -328,6 +869,9 @@ def stop(context):
         cmdDef = ui.commandDefinitions.itemById('eds_id')
         if cmdDef:
             cmdDef.deleteMe()
+
+        app.unregisterCustomEvent(points_ready_event_id)
+        app.unregisterCustomEvent(preview_ready_event_id)
     except:
         if ui:
             ui.messageBox('Failed:\n{}'.format(traceback.format_exc()))
@@ -351,6 +895,7 @@ class CommandCreatedEventHandler(adsk.core.CommandCreatedEventHandler):
             default_y_max = adsk.core.ValueInput.createByReal(4)
             default_step_size = 1
             default_interval_num = 10
+            default_max_deviation = 0.05
             default_base_offset = adsk.core.ValueInput.createByReal(-1)
 
             # Get command inputs
@@ -368,6 +913,16 @@ class CommandCreatedEventHandler(adsk.core.CommandCreatedEventHandler):
                 'equation', 'z = f(x,y) = ', default_equation, 3, False)
             inputs.itemById(
                 'equation').tooltip = "Define the function being plotted"
+            edit_input = inputs.addSelectionInput(
+                'edit_id', 'Edit Surface', 'Select a surface built by this command')
+            edit_input.addSelectionFilter('Bodies')
+            edit_input.addSelectionFilter('MeshBodies')
+            edit_input.setSelectionLimits(0, 1)
+            edit_input.tooltip = "Change a surface built earlier instead of building a new one"
+            edit_input.tooltipDescription = "Selecting a surface built by this command fills in \
+                the inputs it was built from. When only the points move, as for a new equation \
+                or base offset on the same grid, the sketch points that changed are moved in \
+                place. Otherwise the surface is deleted and built again."
 
             # Setion 2: Domain
             domain_inputs = inputs.addGroupCommandInput('domain_id', 'Domain')
@@ -381,6 +936,43 @@ class CommandCreatedEventHandler(adsk.core.CommandCreatedEventHandler):
                 'y_min_id', 'Y Minimum', '', default_y_min)
             domain_child.addValueInput(
                 'y_max_id', 'Y Maximum', '', default_y_max)
+            domain_child.addValueInput(
+                'r_min_id', 'Radius Minimum', '', adsk.core.ValueInput.createByReal(0.5))
+            domain_child.addValueInput(
+                'r_max_id', 'Radius Maximum', '', adsk.core.ValueInput.createByReal(4))
+            domain_child.addValueInput(
+                'angle_min_id', 'Angle Minimum', 'deg', adsk.core.ValueInput.createByReal(0))
+            domain_child.addValueInput(
+                'angle_max_id', 'Angle Maximum', 'deg', adsk.core.ValueInput.createByReal(2 * pi))
+            domain_child.addTextBoxCommandInput(
+                'mask_id', 'Keep where', 'x**2 + y**2 <= 16', 2, False)
+            inputs.itemById(
+                'mask_id').tooltip = "An inequality in x and y that holds on the part of the domain to build"
+            inputs.itemById(
+                'mask_id').tooltipDescription = "Comparisons can be chained and joined with and and or, \
+                e.g. x**2 + y**2 <= 16 or -2 < x < 2 and y > x**2 - 4. The region has to be one \
+                stretch along x, and along y at every x, which any convex region is."
+
+            domain_dropdown_input = domain_child.addDropDownCommandInput(
+                'domain_type', 'Domain Shape', adsk.core.DropDownStyles.LabeledIconDropDownStyle)
+            domain_dropdown_items = domain_dropdown_input.listItems
+            for domain_type in domain_types:
+                domain_dropdown_items.add(domain_type, domain_type == "Rectangle")
+            inputs.itemById(
+                'domain_type').tooltip = "Chose the shape of the region the surface covers"
+            inputs.itemById(
+                'domain_type').tooltipDescription = "<b>Rectangle</b> - from X Minimum to X Maximum \
+                and Y Minimum to Y Maximum.<br><br>\
+                \
+                <b>Polar</b> - around the origin, between two radii and two angles. The slices \
+                are rays from the origin, so radially symmetric surfaces have no corners. Lofts \
+                need a minimum radius above zero.<br><br>\
+                \
+                <b>Mask</b> - the part of the rectangle where an inequality holds. Every slice \
+                runs across the region, so nothing outside of it is evaluated or lofted.<br><br>\
+                \
+                Smooth Splines are only used on rectangles."
+            show_domain_inputs(inputs, "Rectangle")
 
             # Section 3: Resolution
             resolution_inputs = inputs.addGroupCommandInput(
@@ -394,17 +986,87 @@ class CommandCreatedEventHandler(adsk.core.CommandCreatedEventHandler):
             res_dropdown_items = res_dropdown_input.listItems
             res_dropdown_items.add("Interval Length", True)
             res_dropdown_items.add("Number of Intervals", False)
+            res_dropdown_items.add("Maximum Deviation", False)
             res_child.addFloatSpinnerCommandInput(
                 'step_size', 'Step Size', '', 0.01, 10, 0.25, default_step_size)
             res_child.addIntegerSpinnerCommandInput(
                 'num_interv_x', 'Num Intervals X', 1, 1000, 1, default_interval_num)
             res_child.addIntegerSpinnerCommandInput(
                 'num_interv_y', 'Num Intervals Y', 1, 1000, 1, default_interval_num)
+            res_child.addFloatSpinnerCommandInput(
+                'max_deviation', 'Max Deviation', '', 0.0001, 10, 0.01, default_max_deviation)
+            inputs.itemById(
+                'max_deviation').tooltip = "Largest allowed distance between the surface and the sampled grid"
+            inputs.itemById(
+                'max_deviation').tooltipDescription = "Slices and samples are added where the surface curves most, \
+                until the straight segments between samples stay within this distance of the surface"
+            res_child.addIntegerSpinnerCommandInput(
+                'preview_vertices', 'Preview Vertices', 100, 1000000, 1000, default_preview_vertices)
+            inputs.itemById(
+                'preview_vertices').tooltip = "Denser grids are thinned out to about this many vertices in the preview"
+            res_child.addTextBoxCommandInput(
+                'preview_status', '', '', 2, True)
             # initialize as hidden
             inputs.itemById('num_interv_y').isVisible = False
             inputs.itemById('num_interv_x').isVisible = False
+            inputs.itemById('max_deviation').isVisible = False
+
+            # Section 4: Build
+            build_inputs = inputs.addGroupCommandInput('build_id', 'Build')
+            build_inputs.isExpanded = True
+            build_child = build_inputs.children
+            build_dropdown_input = build_child.addDropDownCommandInput(
+                'build_type', 'Build using', adsk.core.DropDownStyles.LabeledIconDropDownStyle)
+            inputs.itemById(
+                'build_type').tooltip = "Chose how the geometry is created"
+            inputs.itemById(
+                'build_type').tooltipDescription = "<b>Loft</b> - lofts a BRep surface or solid through sketched \
+                slices of the graph. Editable, but slow for dense grids.<br><br>\
+                \
+                <b>Single Loft</b> - lofts all slices in one feature, guided by rails that run \
+                the whole length of the graph. With a solid body the slices are closed \
+                profiles, so the solid is a single feature instead of one loft per strip.<br><br>\
+                \
+                <b>Mesh Body</b> - creates the whole graph as one triangle mesh body in a \
+                single step. With a solid body the mesh is closed, so it can be printed \
+                directly or turned into a solid with Convert Mesh.<br><br>\
+                \
+                <b>Export File</b> - writes the graph straight to a binary STL (in \
+                millimeters) or 3MF file for 3D printing, without creating any geometry."
+            build_dropdown_items = build_dropdown_input.listItems
+            build_dropdown_items.add("Loft", True)
+            build_dropdown_items.add("Single Loft", False)
+            build_dropdown_items.add("Mesh Body", False)
+            build_dropdown_items.add("Export File", False)
+            build_child.addIntegerSpinnerCommandInput(
+                'tile_size', 'Tile Size', 0, 1000, 1, 0)
+            inputs.itemById(
+                'tile_size').tooltip = "Intervals per side of a tile, 0 for a single tile"
+            inputs.itemById(
+                'tile_size').tooltipDescription = "Splits the domain into square tiles of this many \
+                intervals that share the samples on their seams. The tiles are evaluated at the \
+                same time and the Loft build lofts each one in its own timeline group before \
+                stitching them together. A tile that fails is reported and the rest are built anyway."
+            build_child.addBoolValueInput(
+                'spline_id', 'Smooth Splines', True, '', False)
+            build_child.addBoolValueInput(
+                'defer_id', 'Defer Sketch Compute', True, '', True)
+            inputs.itemById(
+                'defer_id').tooltip = "Compute each sketch once, after all of its curves are added"
+            inputs.itemById(
+                'defer_id').tooltipDescription = "Fusion recomputes a sketch after every curve \
+                added to it unless its compute is deferred. The time spent sketching is written \
+                to the TEXT COMMANDS window, next to the time of the last build with the other \
+                setting, so the two can be compared."
+            inputs.itemById(
+                'spline_id').tooltip = "Loft through fitted splines instead of lines"
+            inputs.itemById(
+                'spline_id').tooltipDescription = "Draws every slice and rail as a spline through \
+                the points, with tangents taken from the derivatives of the equation. A much \
+                coarser grid then gives a smooth surface with far fewer sketch curves. Only \
+                used by the Loft build."
 
-            # Section 4: Base
+            # Section 5: Base
             base_inputs = inputs.addGroupCommandInput('base_id', 'Solid Body')
             base_inputs.isEnabledCheckBoxDisplayed = True
             base_inputs.isEnabledCheckBoxChecked = False
@@ -424,6 +1086,64 @@ class CommandCreatedEventHandler(adsk.core.CommandCreatedEventHandler):
             inputs.itemById(
                 'base_offset_id').tooltip = "Offset of the base from the xy-plane or the plot's minimum value"
 
+            # Section 6: Batch
+            batch_inputs = inputs.addGroupCommandInput('batch_id', 'Batch')
+            batch_inputs.isEnabledCheckBoxDisplayed = True
+            batch_inputs.isEnabledCheckBoxChecked = False
+            batch_child = batch_inputs.children
+            batch_dropdown_input = batch_child.addDropDownCommandInput(
+                'batch_type', 'Surfaces of', adsk.core.DropDownStyles.LabeledIconDropDownStyle)
+            batch_dropdown_items = batch_dropdown_input.listItems
+            batch_dropdown_items.add("Equations", True)
+            batch_dropdown_items.add("Parameter Sweep", False)
+            batch_child.addTextBoxCommandInput(
+                'batch_equations', 'More Equations', '', 4, False)
+            batch_child.addStringValueInput('sweep_parameter', 'Parameter', 'a')
+            batch_child.addFloatSpinnerCommandInput(
+                'sweep_from', 'From', '', -1000000, 1000000, 0.1, 0)
+            batch_child.addFloatSpinnerCommandInput(
+                'sweep_to', 'To', '', -1000000, 1000000, 0.1, 1)
+            batch_child.addIntegerSpinnerCommandInput(
+                'sweep_count', 'Surfaces', 2, max_batch_surfaces, 1, 5)
+            batch_child.addValueInput(
+                'batch_spacing', 'Spacing', '', adsk.core.ValueInput.createByReal(1))
+            show_batch_inputs(inputs, "Equations")
+            inputs.itemById(
+                'batch_type').tooltip = "Build several surfaces over the same domain"
+            inputs.itemById(
+                'batch_type').tooltipDescription = "<b>Equations</b> - builds the equation above \
+                and every equation under More Equations, one per line.<br><br>\
+                \
+                <b>Parameter Sweep</b> - builds the equation above once for every value of \
+                the parameter, evenly spaced from From to To, e.g. sin(a*x)*y for a from 1 to 3.\
+                <br><br>The grid is made once and all surfaces are evaluated together. Every \
+                surface is a timeline group of its own, placed Spacing beyond the one before it."
+
+            # Section 7: Diagnostics
+            diagnostics_inputs = inputs.addGroupCommandInput(
+                'diagnostics_id', 'Diagnostics')
+            diagnostics_inputs.isExpanded = False
+            diagnostics_child = diagnostics_inputs.children
+            diagnostics_child.addBoolValueInput(
+                'record_id', 'Record Build', True, '', False)
+            diagnostics_child.addBoolValueInput(
+                'cprofile_id', 'Python Profile', True, '', False)
+            diagnostics_child.addTextBoxCommandInput(
+                'record_summary', '', last_build_summary.replace('\n', '<br>'), 4, True)
+            inputs.itemById(
+                'record_id').tooltip = "Record where the time of the build goes"
+            inputs.itemById(
+                'record_id').tooltipDescription = "Times every phase of the build, counts the calls \
+                of each Fusion API method and measures the memory the points take. The record is \
+                appended to builds.jsonl in the add-in folder, one JSON line per build, and a \
+                summary is shown here the next time the command is opened."
+            inputs.itemById(
+                'cprofile_id').tooltip = "Also profile the build with cProfile"
+            inputs.itemById(
+                'cprofile_id').tooltipDescription = "The slowest functions are added to the record \
+                and the whole profile is written next to builds.jsonl. Profiling makes the build \
+                slower, so the recorded times are longer than usual. Only used with Record Build."
+
             # tooltip descriptions
             inputs.itemById(
                 'base_dropdown_id').tooltipDescription = "The base level is set relative to some geometry with an Offset\
@@ -470,6 +1190,11 @@ class CommandCreatedEventHandler(adsk.core.CommandCreatedEventHandler):
             onInputChanged = CommandInputChangedHandler()
             cmd.inputChanged.add(onInputChanged)
             handlers.append(onInputChanged)
+
+            # Connect to the destroy event
+            onDestroy = CommandDestroyHandler()
+            cmd.destroy.add(onDestroy)
+            handlers.append(onDestroy)
         except:
             if ui:
                 ui.messageBox('Failed:\n{}'.format(traceback.format_exc()))
@@ -492,48 +1217,302 @@ class CommandExecuteHandler(adsk.core.CommandEventHandler):
             # read command inputs
             # Equation & Domain
             equation = inputs.itemById('equation').text
-            x_min = inputs.itemById('x_min_id').value
-            x_max = inputs.itemById('x_max_id').value
-            y_min = inputs.itemById('y_min_id').value
-            y_max = inputs.itemById('y_max_id').value
-            domain = [[x_min, x_max], [y_min, y_max]]
+            domain_type, domain, mask = read_domain(inputs)
 
             # Resolution
             res_type = inputs.itemById('res_type').selectedItem.name
             step_size = inputs.itemById('step_size').value
             num_interv_x = inputs.itemById('num_interv_x').value
             num_interv_y = inputs.itemById('num_interv_y').value
+            max_deviation = inputs.itemById('max_deviation').value
 
             # Base
             has_base = inputs.itemById('base_id').isEnabledCheckBoxChecked
             base_type = inputs.itemById('base_dropdown_id').selectedItem.name
             base_offset = inputs.itemById('base_offset_id').value
 
+            # Build
+            build_type = inputs.itemById('build_type').selectedItem.name
+            smooth_splines = inputs.itemById('spline_id').value
+            tile_size = inputs.itemById('tile_size').value
+            defer_compute = inputs.itemById('defer_id').value
+
+            # Diagnostics
+            record_build = inputs.itemById('record_id').value
+            profile_build = inputs.itemById('cprofile_id').value
+
             # get xy_plane
             xy_plane = app.activeProduct.rootComponent.xYConstructionPlane
 
             # define equation driven surface input
             eds_input = [equation, domain, has_base, base_type,
-                         base_offset, res_type, step_size, num_interv_x, num_interv_y, xy_plane]
-
-            # make equation driven surface
-            eds = equation_driven_surface(eds_input)
+                         base_offset, res_type, step_size, num_interv_x, num_interv_y, xy_plane,
+                         max_deviation, build_type, smooth_splines, tile_size,
+                         defer_compute, domain_type, mask]
+
+            preview.cancel()
+            remove_preview_graphics()
+
+            # make equation driven surface, or the surfaces of a batch. a
+            # surface that is edited is built on its own
+            edit_input = inputs.itemById('edit_id')
+            batch = None if edit_input.selectionCount else read_batch(inputs)
+            if batch:
+                eds = equation_driven_batch(eds_input, *batch)
+                surfaces = eds.surfaces
+            else:
+                eds = equation_driven_surface(eds_input)
+                eds.disk_cache = build_disk_cache
+                if edit_input.selectionCount:
+                    eds.edit(edit_input.selection(0).entity)
+                surfaces = [eds]
+            if build_type == "Export File":
+                file_dialog = ui.createFileDialog()
+                file_dialog.title = 'Export Equation Driven Surface'
+                file_dialog.filter = 'Binary STL (*.stl);;3MF (*.3mf)'
+                if file_dialog.showSave() != adsk.core.DialogResults.DialogOK:
+                    return
+                eds.export_path = file_dialog.filename
+
+            # the points are calculated on a worker thread and the geometry
+            # is created step by step, both behind a progress dialog that
+            # can cancel the build. cancelling fails the command, so Fusion
+            # rolls back everything it created
+            progress_dialog = ui.createProgressDialog()
+            progress_dialog.isCancelButtonShown = True
+            progress_dialog.show(
+                'Equation Driven Surface', 'Evaluating points...', 0, 1, 0)
+
+            def update_progress(step):
+                progress_dialog.progressValue = step
+                adsk.doEvents()
+                if progress_dialog.wasCancelled:
+                    raise BuildCancelled()
+            recorder = start_recording(profile_build) if record_build else None
+            outcome = 'built'
             try:
-                eds.calculate_points()
-                eds.make_loft_sections()
-                eds.make_rails()
-                eds.loft_multiple()
-                eds.group_timeline_objects()
-            except:
+                evaluation = background_evaluation(eds)
+                evaluation.start()
+                evaluation.wait(progress_dialog)
+                progress_dialog.maximum = eds.count_build_steps()
+                progress_dialog.message = 'Building geometry: %v of %m steps'
+                eds.progress = update_progress
+                eds.build()
+                failures = ['{}Tile {}: {}'.format(
+                    'Surface {}, '.format(number) if batch else '', index + 1, reason)
+                    for number, surface in enumerate(surfaces, 1)
+                    for index, reason in sorted(surface.failed_tiles.items())]
+                if failures:
+                    ui.messageBox('{} of {} tiles could not be built:\n\n{}'.format(
+                        len(failures), sum(len(surface.tiles()) for surface in surfaces),
+                        '\n'.join(failures)))
+            except BuildCancelled:
+                outcome = 'cancelled'
+                event_args.executeFailed = True
+                event_args.executeFailedMessage = 'The surface was cancelled.'
+            except Exception as error:  # noqa
+                outcome = 'failed: {}'.format(error)
                 ui.messageBox(
-                    'There was some kind of error, please check the inputs and try again')
+                    'There was some kind of error, please check the inputs and try again\n\n{}'.format(error))
+            finally:
+                progress_dialog.hide()
+                if recorder:
+                    finish_recording(recorder, surfaces, outcome)
 
         except:  # noqa
             if ui:
                 ui.messageBox('Failed:\n{}'.format(traceback.format_exc()))
 
 
+# Points ready
+class PointsReadyEventHandler(adsk.core.CustomEventHandler):
+    def __init__(self):
+        super().__init__()
+
+    def notify(self, args):
+        event_args = adsk.core.CustomEventArgs.cast(args)
+        evaluation = background_evaluations.pop(event_args.additionalInfo, None)
+        if evaluation:
+            evaluation.is_done = True
+
+
 # Preview
+# the evaluated grid is kept between previews, so changing only the base
+# settings does not evaluate the equation again and panning the domain only
+# evaluates the samples that are new
+preview_grid_cache = evaluated_grid_cache()
+
+# fired from the preview worker thread when a full preview is evaluated
+preview_ready_event_id = 'eds_preview_ready'
+
+# intervals per side of the coarse preview drawn right away
+coarse_preview_intervals = 32
+
+# seconds the inputs have to stay unchanged before the full preview is made
+preview_delay = 0.3
+
+
+def preview_intervals(eds_input):
+    """
+    returns the number of intervals along x and y of the grid the inputs
+    describe, or None when it is only known once the surface is sampled
+    """
+    domain, res_type, step_size = eds_input[1], eds_input[5], eds_input[6]
+    if res_type == "Number of Intervals":
+        return eds_input[7], eds_input[8]
+    elif eds_input[15] != "Rectangle":
+        return None
+    elif res_type == "Interval Length":
+        return (int(floor((domain[0][1] - domain[0][0]) / step_size + 1e-9)),
+                int(floor((domain[1][1] - domain[1][0]) / step_size + 1e-9)))
+    return None
+
+
+class preview_scheduler():
+    """
+    previews the surface without holding up the dialog. every change of the
+    inputs draws a coarse preview right away and restarts a timer, and only
+    once the inputs stop changing is the full preview evaluated, on a worker
+    thread, and drawn from a custom event on the main thread
+    every change starts a new generation: evaluations of older generations
+    are dropped instead of drawn, and as only one evaluation runs at a time,
+    a burst of changes never queues up more than the latest inputs
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.generation = 0
+        self.timer = None
+        self.worker = None
+        self.request = None  # (generation, eds, max_vertices) to evaluate next
+        self.result = None  # (generation, eds, max_vertices, error) to draw
+        self.status = None  # text box input showing the state of the preview
+        self.intervals = None  # intervals along x and y, if known beforehand
+        self.describe_build = None  # describes the build of a grid size
+
+    def schedule(self, eds_input, max_vertices, status=None, describe_build=None):
+        with self.lock:
+            self.generation += 1
+            generation = self.generation
+        if self.timer:
+            self.timer.cancel()
+        self.status = status
+        self.describe_build = describe_build
+        intervals = self.intervals = preview_intervals(eds_input)
+        is_coarse = intervals is None or max(intervals) > coarse_preview_intervals
+        coarse_input = list(eds_input)
+        if is_coarse:
+            coarse_input[5] = "Number of Intervals"
+            coarse_input[7], coarse_input[8] = [
+                min(count, coarse_preview_intervals)
+                for count in intervals or (coarse_preview_intervals,) * 2]
+        coarse = equation_driven_surface(coarse_input)
+        try:
+            coarse.calculate_points()
+            self.show(coarse, max_vertices, None, is_coarse)
+        except Exception as error:  # noqa
+            self.show(coarse, max_vertices, error, is_coarse)
+        if is_coarse:
+            # the surface is made here, as the API is only used on this thread
+            eds = equation_driven_surface(eds_input)
+            eds.grid_cache = preview_grid_cache
+            self.timer = threading.Timer(
+                preview_delay, self.start, [generation, eds, max_vertices])
+            self.timer.daemon = True
+            self.timer.start()
+
+    # runs on the timer's thread once the inputs stopped changing
+    def start(self, generation, eds, max_vertices):
+        with self.lock:
+            if generation != self.generation:
+                return
+            self.request = (generation, eds, max_vertices)
+            if self.worker:  # it takes the request when it is done
+                return
+            self.worker = threading.Thread(target=self.run, daemon=True)
+            self.worker.start()
+
+    def run(self):
+        while True:
+            with self.lock:
+                request, self.request = self.request, None
+                if request is None:
+                    self.worker = None
+                    return
+            generation, eds, max_vertices = request
+            error = None
+            try:
+                eds.calculate_points()
+            except Exception as exception:  # noqa
+                error = exception
+            with self.lock:
+                if generation != self.generation:
+                    continue
+                self.result = (generation, eds, max_vertices, error)
+            adsk.core.Application.get().fireCustomEvent(
+                preview_ready_event_id, str(generation))
+
+    # draws the full preview of a generation, unless newer inputs came in
+    def draw(self, generation):
+        with self.lock:
+            result = self.result
+            if result is None or result[0] != generation:
+                return
+            self.result = None
+            if generation != self.generation:
+                return
+        self.show(*result[1:], is_coarse=False)
+
+    def show(self, eds, max_vertices, error, is_coarse):
+        remove_preview_graphics()
+        if error:
+            message = 'Preview failed: {}'.format(error)
+        else:
+            eds.plot_points(max_vertices)
+            num_rows, num_cols = eds.surface().shape[:2]
+            message = 'Preview: {} x {} points'.format(num_rows, num_cols)
+            if is_coarse:
+                message += ', refining...'
+        if self.describe_build:
+            # the grid of the build is the previewed one, once refined
+            if not is_coarse and not error:
+                message += '<br>' + self.describe_build(*eds.surface().shape[:2])
+            elif self.intervals:
+                num_rows, num_cols = [count + 1 for count in self.intervals]
+                num_rows -= eds.is_closed()  # its last row is its first
+                message += '<br>' + self.describe_build(num_rows, num_cols)
+            else:
+                message += '<br>Build: estimated once the surface is sampled'
+        if self.status and self.status.isValid:
+            self.status.formattedText = message
+
+    # drops the pending and running previews, when the command ends
+    def cancel(self):
+        with self.lock:
+            self.generation += 1
+            self.request = None
+            self.result = None
+        if self.timer:
+            self.timer.cancel()
+        self.status = None
+
+
+preview = preview_scheduler()
+
+
+# Preview ready
+class PreviewReadyEventHandler(adsk.core.CustomEventHandler):
+    def __init__(self):
+        super().__init__()
+
+    def notify(self, args):
+        try:
+            event_args = adsk.core.CustomEventArgs.cast(args)
+            preview.draw(int(event_args.additionalInfo))
+        except:  # noqa
+            log('Preview failed:\n{}'.format(traceback.format_exc()))
+
+
 class CommandExecutePreviewHandler(adsk.core.CommandEventHandler):
     def __init__(self):
         super().__init__()
@@ -541,18 +1520,13 @@ class CommandExecutePreviewHandler(adsk.core.CommandEventHandler):
     def notify(self, args):
         try:
             app = adsk.core.Application.get()
-            ui = app.userInterface
             event_args = adsk.core.CommandEventArgs.cast(args)
             inputs = event_args.command.commandInputs
 
             # Get command inputs
             # Equation & Domain
             equation = inputs.itemById('equation').text
-            x_min = inputs.itemById('x_min_id').value
-            x_max = inputs.itemById('x_max_id').value
-            y_min = inputs.itemById('y_min_id').value
-            y_max = inputs.itemById('y_max_id').value
-            domain = [[x_min, x_max], [y_min, y_max]]
+            domain_type, domain, mask = read_domain(inputs)
 
             # Base
             has_base = inputs.itemById('base_id').isEnabledCheckBoxChecked
@@ -564,38 +1538,47 @@ class CommandExecutePreviewHandler(adsk.core.CommandEventHandler):
             step_size = inputs.itemById('step_size').value
             num_interv_x = inputs.itemById('num_interv_x').value
             num_interv_y = inputs.itemById('num_interv_y').value
-
-            # validation
-            max_verticies = 350
-            if res_type == "Interval Length":
-                total_vertices = (x_max-x_min)*(y_max-y_min)/step_size
-            else:
-                total_vertices = (num_interv_x+1)*(num_interv_y+1)
-            if total_vertices > max_verticies:
-                response = ui.messageBox(
-                    'Resolutions this high may take a while to process. Do you wish to proceed anyway? (if not, resolution will be adjusted)', '', 3)
-                if response == 3:  # if no
-                    if res_type == "Interval Length":
-                        step_size = (x_max-x_min)*(y_max-y_min)/max_verticies
-                        inputs.itemById('step_size').value = step_size
-                    else:
-                        max_num_interv = round(sqrt(max_verticies))-2
-                        inputs.itemById('num_interv_x').value = max_num_interv
-                        inputs.itemById('num_interv_y').value = max_num_interv
+            max_deviation = inputs.itemById('max_deviation').value
+
+            # Build
+            build_type = inputs.itemById('build_type').selectedItem.name
+            smooth_splines = inputs.itemById('spline_id').value
+            tile_size = inputs.itemById('tile_size').value
+            defer_compute = inputs.itemById('defer_id').value
+
+            # a batch previews its first surface
+            batch = read_batch(inputs)
+            num_surfaces = len(batch[0]) if batch else 1
+            if batch:
+                equation = batch[0][0]
+
+            # the time and memory the build takes are shown in the dialog,
+            # from the costs measured by earlier builds
+            is_closed = domain_type == "Polar" and is_closed_span(domain)
+
+            def describe_build(num_rows, num_cols):
+                counts = build_counts(num_rows, num_cols, has_base, build_type,
+                                      smooth_splines, tile_size, is_closed,
+                                      domain_type == "Rectangle")
+                counts = {name: count * num_surfaces for name, count in counts.items()}
+                text = build_costs.describe(counts, defer_compute)
+                if num_surfaces > 1:
+                    text += ' for {} surfaces, the first is previewed'.format(num_surfaces)
+                return text
 
             # get xy_plane
-            app = adsk.core.Application.get()
             xy_plane = app.activeProduct.rootComponent.xYConstructionPlane
 
             # define equation driven surface input
             eds_input = [equation, domain, has_base, base_type,
-                         base_offset, res_type, step_size, num_interv_x, num_interv_y, xy_plane]
+                         base_offset, res_type, step_size, num_interv_x, num_interv_y, xy_plane,
+                         max_deviation, None, False, 0, False, domain_type, mask]
 
-            eds = equation_driven_surface(eds_input)
-            eds.calculate_points()
-            eds.plot_points()
+            preview.schedule(eds_input, inputs.itemById('preview_vertices').value,
+                             inputs.itemById('preview_status'), describe_build)
         except:  # noqa
-            pass  # try except to avoid crashing while inputs are being changed
+            # logged, as a message box would interrupt typing
+            log('Preview failed:\n{}'.format(traceback.format_exc()))
 
 
 # Validate
@@ -608,14 +1591,19 @@ class CommandValidateInputsHandler(adsk.core.ValidateInputsEventHandler):
         inputs = eventArgs.firingEvent.sender.commandInputs
 
         # Check to see if the check box is checked or not.
-        x_min = inputs.itemById('x_min_id').value
-        x_max = inputs.itemById('x_max_id').value
-        y_min = inputs.itemById('y_min_id').value
-        y_max = inputs.itemById('y_max_id').value
+        domain_type, domain, mask = read_domain(inputs)
+        (x_min, x_max), (y_min, y_max) = domain
         step_size = inputs.itemById('step_size').value
         res_type = inputs.itemById('res_type').selectedItem.name
-
-        if res_type == 'Interval Length':
+        build_type = inputs.itemById('build_type').selectedItem.name
+
+        if domain_type == 'Polar':
+            # a loft can not start from the point sections at the origin
+            r_min, r_max, angle_min, angle_max = x_min, x_max, y_min, y_max
+            eventArgs.areInputsValid = (
+                0 <= r_min < r_max and 0 < angle_max - angle_min <= 2 * pi + 1e-9 and
+                (r_min > 0 or build_type not in ('Loft', 'Single Loft')))
+        elif res_type == 'Interval Length' and domain_type == 'Rectangle':
             if x_max - x_min < step_size or y_max - y_min < step_size:
                 eventArgs.areInputsValid = False
             else:
@@ -626,6 +1614,55 @@ class CommandValidateInputsHandler(adsk.core.ValidateInputsEventHandler):
             else:
                 eventArgs.areInputsValid = True
 
+        # evaluate the grid before anything is built, and show where it
+        # can not be built. every surface of a batch is scanned
+        if eventArgs.areInputsValid:
+            problem = None
+            try:
+                batch = read_batch(inputs)
+            except EquationError as error:
+                batch, problem = None, str(error)
+            equations = batch[0] if batch else [inputs.itemById('equation').text]
+            for equation in equations:
+                if problem:
+                    break
+                problem = scan_inputs(
+                    equation, ((x_min, x_max), (y_min, y_max)),
+                    res_type, step_size, inputs.itemById('num_interv_x').value,
+                    inputs.itemById('num_interv_y').value, domain_type, mask)
+                if problem and batch:
+                    problem = '{}: {}'.format(equation, problem)
+            if problem:
+                eventArgs.areInputsValid = False
+                status = inputs.itemById('preview_status')
+                preview.cancel()
+                remove_preview_graphics()
+                status.formattedText = 'The surface can not be built: {}'.format(problem)
+
+
+# the grid the inputs describe is scanned once, as the inputs are validated
+# after every change. a surface sampled to a maximum deviation only has its
+# grid once it is sampled, so a coarse grid over its domain is scanned. a
+# mask that can not be parsed or has no single region is a problem too
+@functools.lru_cache(maxsize=16)
+def scan_inputs(equation, domain, res_type, step_size, num_interv_x, num_interv_y,
+                domain_type="Rectangle", mask=''):
+    if res_type == "Maximum Deviation":
+        res_type, num_interv_x, num_interv_y = "Number of Intervals", 32, 32
+    surface = surface_points(equation, [list(domain[0]), list(domain[1])],
+                             res_type=res_type, step_size=step_size,
+                             num_interv_x=num_interv_x, num_interv_y=num_interv_y,
+                             domain_type=domain_type, mask=mask)
+    try:
+        surface.make_xy_points_grid()
+    except EquationError as error:
+        return 'mask: {}'.format(error)
+    except ValueError as error:
+        return str(error)
+    if surface.grid_x is not None:
+        return scan_surface(equation, surface.grid_x, surface.grid_y)
+    return scan_surface(equation, surface.x_values, surface.y_values)
+
 
 # Update
 class CommandInputChangedHandler(adsk.core.InputChangedEventHandler):
@@ -639,15 +1676,131 @@ class CommandInputChangedHandler(adsk.core.InputChangedEventHandler):
         step_size_input = inputs.itemById('step_size')
         num_interv_y = inputs.itemById('num_interv_y')
         num_interv_x = inputs.itemById('num_interv_x')
+        max_deviation = inputs.itemById('max_deviation')
 
-        # Change the visibility of 'step size' and 'number of intervals' inputs
+        # Change the visibility of 'step size', 'number of intervals' and 'max deviation' inputs
         changedInput = eventArgs.input
         if changedInput.id == 'res_type':
-            if changedInput.selectedItem.name == 'Number of Intervals':
-                num_interv_x.isVisible = True
-                num_interv_y.isVisible = True
-                step_size_input.isVisible = False
-            else:
-                num_interv_x.isVisible = False
-                num_interv_y.isVisible = False
-                step_size_input.isVisible = True
+            res_type = changedInput.selectedItem.name
+            num_interv_x.isVisible = res_type == 'Number of Intervals'
+            num_interv_y.isVisible = res_type == 'Number of Intervals'
+            step_size_input.isVisible = res_type == 'Interval Length'
+            max_deviation.isVisible = res_type == 'Maximum Deviation'
+        elif changedInput.id == 'build_type':
+            show_build_inputs(inputs, changedInput.selectedItem.name)
+        elif changedInput.id == 'domain_type':
+            show_domain_inputs(inputs, changedInput.selectedItem.name)
+        elif changedInput.id == 'batch_type':
+            show_batch_inputs(inputs, changedInput.selectedItem.name)
+        elif changedInput.id == 'edit_id' and changedInput.selectionCount:
+            body = changedInput.selection(0).entity
+            attribute = body.attributes.itemByName(eds_attribute_group, 'inputs')
+            if attribute:
+                set_inputs(inputs, json.loads(attribute.value))
+            else:  # not built by this command
+                changedInput.clearSelection()
+
+
+# shows the inputs of the shape of domain chosen
+def show_domain_inputs(inputs, domain_type):
+    for input_id in ('x_min_id', 'x_max_id', 'y_min_id', 'y_max_id'):
+        inputs.itemById(input_id).isVisible = domain_type != "Polar"
+    for input_id in ('r_min_id', 'r_max_id', 'angle_min_id', 'angle_max_id'):
+        inputs.itemById(input_id).isVisible = domain_type == "Polar"
+    inputs.itemById('mask_id').isVisible = domain_type == "Mask"
+
+
+# the shape of domain, the domain and the mask the domain inputs describe. a
+# polar domain is [[r_min, r_max], [angle_min, angle_max]]
+def read_domain(inputs):
+    domain_type = inputs.itemById('domain_type').selectedItem.name
+    if domain_type == "Polar":
+        domain = [[inputs.itemById('r_min_id').value, inputs.itemById('r_max_id').value],
+                  [inputs.itemById('angle_min_id').value,
+                   inputs.itemById('angle_max_id').value]]
+    else:
+        domain = [[inputs.itemById('x_min_id').value, inputs.itemById('x_max_id').value],
+                  [inputs.itemById('y_min_id').value, inputs.itemById('y_max_id').value]]
+    mask = inputs.itemById('mask_id').text if domain_type == "Mask" else ''
+    return domain_type, domain, mask
+
+
+# shows the inputs of the kind of batch chosen
+def show_batch_inputs(inputs, batch_type):
+    is_sweep = batch_type == "Parameter Sweep"
+    inputs.itemById('batch_equations').isVisible = not is_sweep
+    for input_id in ('sweep_parameter', 'sweep_from', 'sweep_to', 'sweep_count'):
+        inputs.itemById(input_id).isVisible = is_sweep
+
+
+# the equations of the batch the inputs describe, the sweep they are the
+# equations of, if any, and the spacing between the surfaces. None when
+# batch is off. raises EquationError for a parameter that can not be swept
+def read_batch(inputs):
+    if not inputs.itemById('batch_id').isEnabledCheckBoxChecked:
+        return None
+    equation = inputs.itemById('equation').text
+    spacing = inputs.itemById('batch_spacing').value
+    if inputs.itemById('batch_type').selectedItem.name == "Parameter Sweep":
+        parameter = inputs.itemById('sweep_parameter').value.strip()
+        values = sweep_values(inputs.itemById('sweep_from').value,
+                              inputs.itemById('sweep_to').value,
+                              inputs.itemById('sweep_count').value)
+        sweep = (equation, parameter, values)
+        return sweep_equations(*sweep), sweep, spacing
+    equations = [equation] + split_equations(inputs.itemById('batch_equations').text)
+    return equations[:max_batch_surfaces], None, spacing
+
+
+# shows the inputs that only some build types use
+def show_build_inputs(inputs, build_type):
+    is_loft = build_type in ('Loft', 'Single Loft')
+    inputs.itemById('spline_id').isVisible = is_loft
+    inputs.itemById('defer_id').isVisible = is_loft
+
+
+# fills in the dialog with the inputs an earlier build was made from
+def set_inputs(inputs, parameters):
+    domain = parameters['domain']
+    domain_type = parameters.get('domain_type', "Rectangle")
+    domain_ids = (('r_min_id', 'r_max_id', 'angle_min_id', 'angle_max_id')
+                  if domain_type == "Polar" else ('x_min_id', 'x_max_id', 'y_min_id', 'y_max_id'))
+    inputs.itemById('equation').text = parameters['equation']
+    inputs.itemById('mask_id').text = parameters.get('mask') or inputs.itemById('mask_id').text
+    for input_id, value in [(domain_ids[0], domain[0][0]), (domain_ids[1], domain[0][1]),
+                            (domain_ids[2], domain[1][0]), (domain_ids[3], domain[1][1]),
+                            ('base_offset_id', parameters['base_offset']),
+                            ('step_size', parameters['step_size']),
+                            ('num_interv_x', parameters['num_interv_x']),
+                            ('num_interv_y', parameters['num_interv_y']),
+                            ('max_deviation', parameters['max_deviation']),
+                            ('tile_size', parameters['tile_size']),
+                            ('spline_id', parameters['smooth_splines']),
+                            ('defer_id', parameters['defer_compute'])]:
+        inputs.itemById(input_id).value = value
+    inputs.itemById('base_id').isEnabledCheckBoxChecked = parameters['has_base']
+    inputs.itemById('batch_id').isEnabledCheckBoxChecked = False
+    for input_id, name in [('base_dropdown_id', parameters['base_type']),
+                           ('res_type', parameters['res_type']),
+                           ('build_type', parameters['build_type']),
+                           ('domain_type', domain_type)]:
+        for item in inputs.itemById(input_id).listItems:
+            if item.name == name:
+                item.isSelected = True
+    res_type = parameters['res_type']
+    inputs.itemById('num_interv_x').isVisible = res_type == 'Number of Intervals'
+    inputs.itemById('num_interv_y').isVisible = res_type == 'Number of Intervals'
+    inputs.itemById('step_size').isVisible = res_type == 'Interval Length'
+    inputs.itemById('max_deviation').isVisible = res_type == 'Maximum Deviation'
+    show_build_inputs(inputs, parameters['build_type'])
+    show_domain_inputs(inputs, domain_type)
+
+
+# Destroy
+class CommandDestroyHandler(adsk.core.CommandEventHandler):
+    def __init__(self):
+        super().__init__()
+
+    def notify(self, args):
+        preview.cancel()
+        remove_preview_graphics()
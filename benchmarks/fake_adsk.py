@@ -0,0 +1,729 @@
+"""
+a stand-in for the adsk package that records every call the add-in makes
+
+install() puts fake adsk, adsk.core, adsk.fusion and adsk.cam modules into
+sys.modules, so the add-in can be imported and its command handlers run
+without Fusion 360. every API call is counted in calls, and the number of
+objects of each kind that were created in created
+"""
+import collections
+import importlib.util
+import os
+import sys
+import tempfile
+import types
+
+calls = collections.Counter()
+created = collections.Counter()
+
+# custom events registered by the add-in, by id. these outlive reset, as
+# the add-in only registers them once when it starts
+custom_events = {}
+
+# every attribute added to an entity, for Design.findAttributes
+attributes = []
+
+# the file a save dialog returns, as if the user had chosen it
+save_path = os.path.join(tempfile.gettempdir(), 'fake_adsk_export.stl')
+
+
+def reset():
+    calls.clear()
+    created.clear()
+    attributes.clear()
+    Application.app = None
+
+
+def record(call, kind=None):
+    calls[call] += 1
+    if kind:
+        created[kind] += 1
+
+
+class Collection():
+    """
+    a list that behaves like a Fusion API collection
+    """
+
+    def __init__(self, items=None):
+        self.items = list(items or [])
+
+    @property
+    def count(self):
+        return len(self.items)
+
+    def item(self, index):
+        return self.items[index]
+
+    def __len__(self):
+        return len(self.items)
+
+    def __getitem__(self, index):
+        return self.items[index]
+
+    def __iter__(self):
+        return iter(self.items)
+
+
+class Attribute():
+    def __init__(self, parent, group_name, name, value):
+        self.parent = parent
+        self.groupName, self.name, self.value = group_name, name, value
+
+
+class Attributes(Collection):
+    """
+    the attributes of an entity
+    """
+
+    def __init__(self, parent):
+        super().__init__()
+        self.parent = parent
+
+    def add(self, group_name, name, value):
+        record('Attributes.add')
+        attribute = self.itemByName(group_name, name)
+        if attribute:
+            attribute.value = value
+            return attribute
+        attribute = Attribute(self.parent, group_name, name, value)
+        self.items.append(attribute)
+        attributes.append(attribute)
+        return attribute
+
+    def itemByName(self, group_name, name):
+        for attribute in self.items:
+            if (attribute.groupName, attribute.name) == (group_name, name):
+                return attribute
+        return None
+
+
+class Entity():
+    """
+    something that can be deleted and carry attributes
+    """
+
+    def __init__(self):
+        self.isValid = True
+        self.attributes = Attributes(self)
+
+    def deleteMe(self):
+        record(type(self).__name__ + '.deleteMe')
+        self.isValid = False
+        for attribute in self.attributes:
+            attribute.parent = None
+        return True
+
+
+class TimelineObject():
+    def __init__(self, index):
+        self.index = index
+
+
+###############################################################################
+# adsk.core
+
+
+class Point3D():
+    def __init__(self, x, y, z):
+        self.x, self.y, self.z = x, y, z
+
+    @staticmethod
+    def create(x=0, y=0, z=0):
+        record('Point3D.create')
+        return Point3D(x, y, z)
+
+
+class Vector3D(Point3D):
+    @staticmethod
+    def create(x=0, y=0, z=0):
+        record('Vector3D.create')
+        return Vector3D(x, y, z)
+
+
+class NurbsCurve3D():
+    def __init__(self, control_points, degree, knots):
+        self.controlPoints, self.degree, self.knots = control_points, degree, knots
+
+    @staticmethod
+    def createNonRational(control_points, degree, knots, is_periodic):
+        record('NurbsCurve3D.createNonRational')
+        return NurbsCurve3D(control_points, degree, knots)
+
+
+class ObjectCollection(Collection):
+    @staticmethod
+    def create():
+        record('ObjectCollection.create')
+        return ObjectCollection()
+
+    def add(self, item):
+        record('ObjectCollection.add')
+        self.items.append(item)
+        return True
+
+
+class ValueInput():
+    @staticmethod
+    def createByReal(value):
+        record('ValueInput.createByReal')
+        input = ValueInput()
+        input.realValue = value
+        return input
+
+
+class DialogResults():
+    DialogOK = 0
+    DialogCancel = 1
+
+
+class DropDownStyles():
+    LabeledIconDropDownStyle = 0
+
+
+class UserInterface():
+    def __init__(self):
+        self.messages = []
+
+    def messageBox(self, text, *args):
+        record('UserInterface.messageBox')
+        self.messages.append(text)
+        return DialogResults.DialogOK
+
+    def createProgressDialog(self):
+        record('UserInterface.createProgressDialog')
+        return ProgressDialog()
+
+    def createFileDialog(self):
+        record('UserInterface.createFileDialog')
+        return FileDialog()
+
+
+class FileDialog():
+    def __init__(self):
+        self.title = ''
+        self.filter = ''
+        self.filename = ''
+
+    def showSave(self):
+        record('FileDialog.showSave')
+        self.filename = save_path
+        return DialogResults.DialogOK
+
+
+class ProgressDialog():
+    def __init__(self):
+        self.isCancelButtonShown = False
+        self.wasCancelled = False
+        self.progressValue = 0
+        self.maximum = 0
+        self.message = ''
+
+    def show(self, title, message, minimum, maximum, delay=0):
+        record('ProgressDialog.show')
+        self.message, self.maximum = message, maximum
+        return True
+
+    def hide(self):
+        record('ProgressDialog.hide')
+        return True
+
+
+class CustomEvent():
+    def __init__(self, id):
+        self.id = id
+        self.handlers = []
+
+    def add(self, handler):
+        self.handlers.append(handler)
+        return True
+
+
+class Application():
+    app = None
+
+    def __init__(self):
+        self.userInterface = UserInterface()
+        self.activeProduct = Design()
+        self.messages = []
+
+    @staticmethod
+    def get():
+        if Application.app is None:
+            Application.app = Application()
+        return Application.app
+
+    def log(self, message, *args):
+        record('Application.log')
+        self.messages.append(message)
+
+    def registerCustomEvent(self, id):
+        record('Application.registerCustomEvent')
+        return custom_events.setdefault(id, CustomEvent(id))
+
+    def unregisterCustomEvent(self, id):
+        record('Application.unregisterCustomEvent')
+        return custom_events.pop(id, None) is not None
+
+    # the handlers run right away, on the thread that fires the event
+    def fireCustomEvent(self, id, additional_info=''):
+        record('Application.fireCustomEvent')
+        args = types.SimpleNamespace(additionalInfo=additional_info)
+        for handler in custom_events[id].handlers:
+            handler.notify(args)
+        return True
+
+
+# event handlers and arguments: the handlers subclass these and the event
+# arguments are passed through cast unchanged
+class EventHandler():
+    def __init__(self):
+        pass
+
+
+class CommandCreatedEventHandler(EventHandler):
+    pass
+
+
+class CommandEventHandler(EventHandler):
+    pass
+
+
+class ValidateInputsEventHandler(EventHandler):
+    pass
+
+
+class InputChangedEventHandler(EventHandler):
+    pass
+
+
+class CustomEventHandler(EventHandler):
+    pass
+
+
+class EventArgs():
+    @staticmethod
+    def cast(args):
+        return args
+
+
+CommandCreatedEventArgs = CommandEventArgs = EventArgs
+ValidateInputsEventArgs = InputChangedEventArgs = CustomEventArgs = EventArgs
+
+
+###############################################################################
+# adsk.fusion
+
+
+class FeatureOperations():
+    JoinFeatureOperation = 0
+    NewBodyFeatureOperation = 1
+
+
+class DesignTypes():
+    DirectDesignType = 0
+    ParametricDesignType = 1
+
+
+class Design():
+    def __init__(self):
+        self.designType = DesignTypes.ParametricDesignType
+        self.timeline = Timeline()
+        self.rootComponent = Component(self.timeline)
+
+    @staticmethod
+    def cast(product):
+        return product
+
+    def findAttributes(self, group_name, name):
+        record('Design.findAttributes')
+        return [attribute for attribute in attributes
+                if (attribute.groupName, attribute.name) == (group_name, name)]
+
+
+class Timeline():
+    def __init__(self):
+        self.count = 0
+        self.timelineGroups = TimelineGroups()
+
+    def add_item(self):
+        self.count += 1
+
+
+class TimelineGroups(Collection):
+    def add(self, start_index, end_index):
+        record('TimelineGroups.add', 'timeline group')
+        group = TimelineGroup(start_index, end_index)
+        self.items.append(group)
+        return group
+
+
+class TimelineGroup():
+    def __init__(self, start_index, end_index):
+        self.start_index, self.end_index = start_index, end_index
+        self.name = ''
+
+
+class Component():
+    def __init__(self, timeline):
+        self.timeline = timeline
+        self.xYConstructionPlane = object()
+        self.sketches = Sketches(timeline)
+        self.features = Features(timeline)
+        self.customGraphicsGroups = CustomGraphicsGroups()
+        self.meshBodies = MeshBodies()
+
+
+class Sketches(Collection):
+    def __init__(self, timeline):
+        super().__init__()
+        self.timeline = timeline
+
+    def add(self, plane):
+        record('Sketches.add', 'sketch')
+        self.timeline.add_item()
+        sketch = Sketch()
+        sketch.timelineObject = TimelineObject(self.timeline.count - 1)
+        self.items.append(sketch)
+        return sketch
+
+
+class Sketch(Entity):
+    def __init__(self):
+        super().__init__()
+        self.isLightBulbOn = True
+        self.isComputeDeferred = False
+        self.sketchPoints = SketchPoints()
+        self.sketchCurves = SketchCurves()
+        self.profiles = Collection([Profile()])
+
+
+class SketchPoints(Collection):
+    def add(self, point):
+        record('SketchPoints.add', 'sketch point')
+        self.items.append(point)
+        return point
+
+
+class SketchCurves(Collection):
+    def __init__(self):
+        super().__init__()
+        self.sketchLines = SketchLines(self)
+        self.sketchFixedSplines = SketchFixedSplines(self)
+
+
+class SketchLines(Collection):
+    def __init__(self, curves):
+        super().__init__()
+        self.curves = curves
+
+    def addByTwoPoints(self, start_point, end_point):
+        record('SketchLines.addByTwoPoints', 'sketch line')
+        line = SketchLine(start_point, end_point)
+        self.items.append(line)
+        self.curves.items.append(line)
+        return line
+
+
+class SketchFixedSplines(Collection):
+    def __init__(self, curves):
+        super().__init__()
+        self.curves = curves
+
+    def addByNurbsCurve(self, curve):
+        record('SketchFixedSplines.addByNurbsCurve', 'sketch spline')
+        self.items.append(curve)
+        self.curves.items.append(curve)
+        return curve
+
+
+class SketchLine():
+    def __init__(self, start_point, end_point):
+        self.startPoint, self.endPoint = start_point, end_point
+        self.startSketchPoint = SketchPoint(start_point)
+        self.endSketchPoint = SketchPoint(end_point)
+
+
+class SketchPoint():
+    def __init__(self, point):
+        self.geometry = point
+
+    def move(self, translation):
+        record('SketchPoint.move')
+        self.geometry = Point3D(self.geometry.x + translation.x,
+                                self.geometry.y + translation.y,
+                                self.geometry.z + translation.z)
+        return True
+
+
+class Profile():
+    pass
+
+
+class Path():
+    def __init__(self, curves):
+        self.curves = curves
+
+
+class Features():
+    def __init__(self, timeline):
+        self.loftFeatures = LoftFeatures(timeline)
+        self.stitchFeatures = StitchFeatures(timeline)
+        self.baseFeatures = BaseFeatures(timeline)
+
+    def createPath(self, curves, *args):
+        record('Features.createPath', 'path')
+        return Path(curves)
+
+
+class LoftFeatures(Collection):
+    def __init__(self, timeline):
+        super().__init__()
+        self.timeline = timeline
+
+    def createInput(self, operation):
+        record('LoftFeatures.createInput')
+        return LoftInput(operation)
+
+    def add(self, loft_input):
+        record('LoftFeatures.add', 'loft')
+        self.timeline.add_item()
+        feature = Feature()
+        feature.timelineObject = TimelineObject(self.timeline.count - 1)
+        self.items.append(feature)
+        return feature
+
+
+class LoftInput():
+    def __init__(self, operation):
+        self.operation = operation
+        self.loftSections = LoftSections()
+        self.centerLineOrRails = LoftRails()
+
+
+class LoftSections(Collection):
+    def add(self, section):
+        record('LoftSections.add')
+        self.items.append(section)
+        return section
+
+
+class LoftRails(Collection):
+    def addRail(self, rail):
+        record('LoftCenterLineOrRails.addRail')
+        self.items.append(rail)
+        return True
+
+
+class StitchFeatures(Collection):
+    def __init__(self, timeline):
+        super().__init__()
+        self.timeline = timeline
+
+    def createInput(self, surfaces, tolerance, *args):
+        record('StitchFeatures.createInput')
+        return (surfaces, tolerance)
+
+    def add(self, stitch_input):
+        record('StitchFeatures.add', 'stitch')
+        self.timeline.add_item()
+        feature = Feature()
+        feature.timelineObject = TimelineObject(self.timeline.count - 1)
+        self.items.append(feature)
+        return feature
+
+
+class BaseFeatures(Collection):
+    def __init__(self, timeline):
+        super().__init__()
+        self.timeline = timeline
+
+    def add(self):
+        record('BaseFeatures.add', 'base feature')
+        self.timeline.add_item()
+        feature = Feature()
+        feature.timelineObject = TimelineObject(self.timeline.count - 1)
+        self.items.append(feature)
+        return feature
+
+
+class Feature(Entity):
+    def __init__(self):
+        super().__init__()
+        self.bodies = Collection([Body()])
+        self.name = ''
+
+    def startEdit(self):
+        record('BaseFeature.startEdit')
+        return True
+
+    def finishEdit(self):
+        record('BaseFeature.finishEdit')
+        return True
+
+
+class Body(Entity):
+    def __init__(self):
+        super().__init__()
+        self.name = ''
+
+
+class MeshBodies(Collection):
+    def addByTriangleMeshData(self, coordinates, indices, normals,
+                              normal_indices):
+        record('MeshBodies.addByTriangleMeshData', 'mesh body')
+        created['mesh triangle'] += len(indices) // 3
+        body = Body()
+        self.items.append(body)
+        return body
+
+
+class CustomGraphicsCoordinates():
+    def __init__(self, coordinates):
+        self.coordinates = coordinates
+
+    @staticmethod
+    def create(coordinates):
+        record('CustomGraphicsCoordinates.create')
+        return CustomGraphicsCoordinates(coordinates)
+
+
+class CustomGraphicsGroups(Collection):
+    def add(self):
+        record('CustomGraphicsGroups.add', 'custom graphics group')
+        group = CustomGraphicsGroup()
+        self.items.append(group)
+        return group
+
+
+class CustomGraphicsGroup():
+    def __init__(self):
+        self.isValid = True
+        # the (coordinates, indices) of every mesh and the (coordinates,
+        # strip_lengths) of every set of lines drawn, for the tests
+        self.meshes = []
+        self.lines = []
+
+    def addMesh(self, coordinates, indices, normals, normal_indices):
+        record('CustomGraphicsGroup.addMesh', 'custom graphics mesh')
+        self.meshes.append((coordinates.coordinates, indices))
+
+    def addLines(self, coordinates, indices, is_line_strip, strip_lengths=None):
+        record('CustomGraphicsGroup.addLines', 'custom graphics lines')
+        self.lines.append((coordinates.coordinates, strip_lengths))
+
+    def deleteMe(self):
+        record('CustomGraphicsGroup.deleteMe')
+        self.isValid = False
+
+
+###############################################################################
+
+
+def make_module(name, namespace):
+    module = types.ModuleType(name)
+    for attribute, value in namespace.items():
+        if isinstance(value, type) and value.__module__ == __name__:
+            setattr(module, attribute, value)
+    return module
+
+
+def install():
+    """
+    replaces the adsk package in sys.modules with this stand-in
+    """
+    adsk = types.ModuleType('adsk')
+    adsk.core = make_module('adsk.core', globals())
+    adsk.fusion = make_module('adsk.fusion', globals())
+    adsk.cam = types.ModuleType('adsk.cam')
+    adsk.doEvents = lambda: None
+    sys.modules.update({'adsk': adsk, 'adsk.core': adsk.core,
+                        'adsk.fusion': adsk.fusion, 'adsk.cam': adsk.cam})
+    return adsk
+
+
+def load_addin():
+    """
+    installs the stand-in and imports the add-in as a package, so that its
+    relative imports of the eds package work as they do inside Fusion 360
+    """
+    install()
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    package = types.ModuleType('equation_driven_surface_addin')
+    package.__path__ = [root]
+    sys.modules[package.__name__] = package
+    spec = importlib.util.spec_from_file_location(
+        package.__name__ + '.addin',
+        os.path.join(root, 'Equation Driven Surface.py'))
+    addin = importlib.util.module_from_spec(spec)
+    sys.modules[spec.name] = addin
+    spec.loader.exec_module(addin)
+    return addin
+
+
+###############################################################################
+# command inputs
+
+# the values of the add-in dialog's inputs when it opens
+default_inputs = {
+    'equation': 'cos((2/3)*pow((pow(x,2)+pow(y,2)),(1/2)))+1',
+    'x_min_id': -4, 'x_max_id': 4, 'y_min_id': -4, 'y_max_id': 4,
+    'domain_type': 'Rectangle', 'r_min_id': 0.5, 'r_max_id': 4,
+    'angle_min_id': 0, 'angle_max_id': 6.283185307179586, 'mask_id': '',
+    'res_type': 'Number of Intervals', 'step_size': 1,
+    'num_interv_x': 10, 'num_interv_y': 10, 'max_deviation': 0.05,
+    'preview_vertices': 20000,
+    'build_type': 'Loft', 'spline_id': False, 'tile_size': 0,
+    'defer_id': True, 'edit_id': [], 'record_id': False, 'cprofile_id': False,
+    'batch_id': False,
+    'base_id': False, 'base_dropdown_id': 'Automatic', 'base_offset_id': -1,
+}
+
+
+class Item():
+    def __init__(self, name):
+        self.name = name
+
+
+class CommandInput():
+    def __init__(self, id, value):
+        self.id = id
+        self.isValid = True
+        self.isVisible = True
+        self.value = value
+        self.text = value
+        self.isEnabledCheckBoxChecked = value
+        self.selectedItem = Item(value)
+        # the entities of a selection input
+        self.selections = value if isinstance(value, list) else []
+        self.selectionCount = len(self.selections)
+
+    def selection(self, index):
+        return types.SimpleNamespace(entity=self.selections[index])
+
+
+class CommandInputs():
+    def __init__(self, values):
+        self.inputs = {id: CommandInput(id, value)
+                       for id, value in values.items()}
+
+    def itemById(self, id):
+        return self.inputs.get(id)
+
+
+class Command():
+    def __init__(self, values):
+        self.commandInputs = CommandInputs(values)
+
+
+class CommandEventArgsStandIn():
+    """
+    the arguments of a command event for a dialog filled in with values
+    """
+
+    def __init__(self, values):
+        self.command = Command(values)
+        self.firingEvent = types.SimpleNamespace(sender=self.command)
+        self.executeFailed = False
+        self.executeFailedMessage = ''
+        self.areInputsValid = True
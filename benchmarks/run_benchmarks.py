@@ -0,0 +1,179 @@
+"""
+benchmarks the whole execute command of the add-in against fake_adsk
+
+    python benchmarks/run_benchmarks.py
+    python benchmarks/run_benchmarks.py --save baseline.json
+    python benchmarks/run_benchmarks.py --compare baseline.json
+
+for every combination of grid size, base mode and equation the dialog is
+filled in and CommandExecuteHandler is run, recording the wall time of each
+phase of the build and the number of API calls and objects it made. with
+--compare, the run fails if any case makes more API calls than the baseline
+or gets slower than the baseline by more than --tolerance
+"""
+import argparse
+import collections
+import functools
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+import fake_adsk  # noqa: E402
+
+addin = fake_adsk.load_addin()
+addin.register_custom_events()
+# every run evaluates its grid, instead of loading it from an earlier run
+addin.build_disk_cache = None
+# the costs measured by the runs are not written next to the add-in
+addin.build_costs.path = None
+
+# the methods of equation_driven_surface that are timed, in build order
+phases = ['calculate_points', 'make_loft_sections', 'make_rails',
+          'loft_multiple', 'group_timeline_objects', 'make_mesh_body']
+
+default_equations = ['cos((2/3)*pow((pow(x,2)+pow(y,2)),(1/2)))+1',
+                     'x**2+y**2',
+                     'sin(x+y)-cos(x)']
+
+# builds that are a build method plus other dialog inputs
+build_options = {
+    'Spline Loft': {'build_type': 'Loft', 'spline_id': True},
+    'Tiled Loft': {'build_type': 'Loft', 'tile_size': 5},
+    'Undeferred Loft': {'build_type': 'Loft', 'defer_id': False},
+}
+
+phase_seconds = collections.Counter()
+
+
+def timed(method):
+    @functools.wraps(method)
+    def wrapper(*args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return method(*args, **kwargs)
+        finally:
+            phase_seconds[method.__name__] += time.perf_counter() - start
+    return wrapper
+
+
+for phase in phases:
+    setattr(addin.equation_driven_surface, phase,
+            timed(getattr(addin.equation_driven_surface, phase)))
+
+
+def run_case(equation, intervals, has_base, build_type):
+    """
+    runs the execute command once and returns its timings and API counts
+    """
+    fake_adsk.reset()
+    phase_seconds.clear()
+    values = dict(fake_adsk.default_inputs, equation=equation,
+                  num_interv_x=intervals, num_interv_y=intervals,
+                  base_id=has_base, build_type=build_type)
+    values.update(build_options.get(build_type, {}))
+    args = fake_adsk.CommandEventArgsStandIn(values)
+    start = time.perf_counter()
+    addin.CommandExecuteHandler().notify(args)
+    total = time.perf_counter() - start
+    errors = fake_adsk.Application.get().userInterface.messages
+    return {
+        'equation': equation, 'intervals': intervals, 'has_base': has_base,
+        'build_type': build_type, 'error': errors[0] if errors else None,
+        'total': total, 'phases': dict(phase_seconds),
+        'calls': dict(fake_adsk.calls), 'created': dict(fake_adsk.created),
+        'api_calls': sum(fake_adsk.calls.values()),
+    }
+
+
+def case_key(result):
+    return '{equation} | {intervals} | base={has_base} | {build_type}'.format(
+        **result)
+
+
+def print_results(results):
+    columns = ['total'] + phases
+    print('{:>9} {:>5} {:>10} '.format('intervals', 'base', 'build') +
+          ' '.join('{:>12.12}'.format(column) for column in columns) +
+          ' {:>9} {:>8} {:>8} {:>6}'.format('api calls', 'sketches', 'lines', 'lofts'))
+    equation = None
+    for result in results:
+        if result['equation'] != equation:
+            equation = result['equation']
+            print(equation)
+        timings = [result['total']] + [
+            result['phases'].get(phase, 0) for phase in phases]
+        created = result['created']
+        print('{intervals:>9} {has_base!s:>5} {build_type:>10} '.format(**result) +
+              ' '.join('{:>11.4f}s'.format(seconds) for seconds in timings) +
+              ' {:>9} {:>8} {:>8} {:>6}'.format(
+                  result['api_calls'], created.get('sketch', 0),
+                  created.get('sketch line', 0), created.get('loft', 0)) +
+              ('  ERROR: ' + result['error'] if result['error'] else ''))
+
+
+def compare(results, baseline, tolerance):
+    """
+    returns a description of every case that made more API calls or got
+    slower than in the baseline
+    """
+    baseline = {case_key(result): result for result in baseline}
+    regressions = []
+    for result in results:
+        old = baseline.get(case_key(result))
+        if old is None:
+            continue
+        if result['api_calls'] > old['api_calls']:
+            regressions.append('{}: {} API calls, was {}'.format(
+                case_key(result), result['api_calls'], old['api_calls']))
+        # a small absolute allowance keeps tiny cases from being noisy
+        if result['total'] > old['total'] * (1 + tolerance) + 0.005:
+            regressions.append('{}: {:.4f}s, was {:.4f}s'.format(
+                case_key(result), result['total'], old['total']))
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().split('\n')[0])
+    parser.add_argument('--sizes', type=int, nargs='+', default=[5, 10, 20, 40],
+                        help='numbers of intervals in x and y')
+    parser.add_argument('--equations', nargs='+', default=default_equations)
+    parser.add_argument('--builds', nargs='+',
+                        default=['Loft', 'Single Loft', 'Mesh Body'],
+                        help='build methods of the dialog to benchmark, or ' +
+                        ', '.join(build_options))
+    parser.add_argument('--repeat', type=int, default=3,
+                        help='runs per case, the fastest one is kept')
+    parser.add_argument('--save', help='write the results to this JSON file')
+    parser.add_argument('--compare', help='JSON file of a previous --save')
+    parser.add_argument('--tolerance', type=float, default=0.25,
+                        help='allowed relative slowdown compared to --compare')
+    args = parser.parse_args(argv)
+
+    results = []
+    for equation in args.equations:
+        for build_type in args.builds:
+            for has_base in (False, True):
+                for intervals in args.sizes:
+                    runs = [run_case(equation, intervals, has_base, build_type)
+                            for _ in range(args.repeat)]
+                    results.append(min(runs, key=lambda run: run['total']))
+    print_results(results)
+
+    if args.save:
+        with open(args.save, 'w') as results_file:
+            json.dump(results, results_file, indent=1)
+    if args.compare:
+        with open(args.compare) as baseline_file:
+            regressions = compare(results, json.load(baseline_file),
+                                  args.tolerance)
+        for regression in regressions:
+            print('REGRESSION ' + regression)
+        if regressions:
+            return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,8 @@
+"""
+the geometry of equation driven surfaces, independent of Fusion 360
+
+the add-in builds Fusion geometry on top of surface_points, and the same
+calculations can be run from scripts or with ``python -m eds``
+"""
+from .expression import EquationError, compile_equation, evaluate_equation
+from .surface import surface_points
@@ -0,0 +1,157 @@
+"""
+several surfaces over one shared domain: a list of equations, or one equation
+swept over the values of a parameter. the grid is made once and every
+surface is evaluated on it in one pass
+"""
+import ast
+import copy
+import keyword
+
+import numpy as np
+
+from .expression import (EquationError, allowed_variables, evaluate_equation,
+                         numpy_namespace, parse_equation)
+from .grid import adaptive_axis_values
+from .scan import undefined_text
+
+# most surfaces a batch builds
+max_batch_surfaces = 50
+
+
+def split_equations(text):
+    """
+    returns the equations of a text with one equation per line or separated
+    by semicolons, without empty ones
+    """
+    equations = [equation.strip() for line in text.splitlines()
+                 for equation in line.split(';')]
+    return [equation for equation in equations if equation]
+
+
+def check_parameter(parameter):
+    """
+    raises EquationError if parameter can not name a swept parameter: it has
+    to be a name that is not a variable or the name of a function or constant
+    """
+    if (not parameter.isidentifier() or keyword.iskeyword(parameter) or
+            parameter in allowed_variables or parameter in numpy_namespace):
+        raise EquationError('"{}" can not be the name of a parameter'.format(parameter))
+
+
+def sweep_values(first, last, count):
+    return np.linspace(first, last, count)
+
+
+class substitute_parameter(ast.NodeTransformer):
+    """
+    replaces a parameter in a syntax tree by a number
+    """
+
+    def __init__(self, parameter, value):
+        self.parameter = parameter
+        self.value = float(value)
+
+    def visit_Name(self, node):
+        if node.id != self.parameter:
+            return node
+        number = ast.Constant(abs(self.value))
+        if self.value < 0:  # so the sign binds as it would for the name
+            return ast.UnaryOp(ast.USub(), number)
+        return number
+
+
+def sweep_equations(equation, parameter, values):
+    """
+    returns the equation with the parameter replaced by each of the values,
+    as equations of x and y only
+    """
+    check_parameter(parameter)
+    tree = parse_equation(equation, allowed_variables + [parameter])
+    return [ast.unparse(substitute_parameter(parameter, value).visit(copy.deepcopy(tree)))
+            for value in values]
+
+
+def evaluate_sweep(equation, parameter, values, x, y):
+    """
+    evaluates the equation for all values of the parameter at once, with the
+    parameter along a third axis. the equation is compiled once. x and y
+    broadcast to the grid. returns z of shape (values, rows, columns)
+    """
+    check_parameter(parameter)
+    tree = parse_equation(equation, allowed_variables + [parameter])
+    code = compile(tree, '<equation>', 'eval')
+    values = np.asarray(values, dtype=float)
+    variables = {'x': x[None], 'y': y[None], parameter: values[:, None, None]}
+    with np.errstate(all='ignore'):
+        z = np.asarray(eval(code, numpy_namespace, variables), dtype=float)
+    return np.broadcast_to(z, (len(values),) + np.broadcast(x, y).shape).copy()
+
+
+def evaluate_equations(equations, x, y):
+    """
+    evaluates every equation on the grid x and y broadcast to, into one
+    array of shape (equations, rows, columns)
+    """
+    z = np.empty((len(equations),) + np.broadcast(x, y).shape)
+    for index, equation in enumerate(equations):
+        z[index] = evaluate_equation(equation, x, y)
+    return z
+
+
+class surface_batch():
+    """
+    surface_points of different equations that share their domain and
+    resolution, and are made from the same grid and evaluated together. a
+    sweep (equation, parameter, values) whose equations the surfaces are is
+    evaluated in one pass over all of its values
+    every surface is moved spacing further along x than the one before it,
+    so they do not overlap
+    """
+
+    def __init__(self, surfaces, spacing=0, sweep=None):
+        self.surfaces = surfaces
+        self.spacing = spacing
+        self.sweep = sweep
+
+    # makes the shared grid on the first surface. a rectangular grid sampled
+    # to a maximum deviation has the samples every surface needs
+    def make_xy_points_grid(self):
+        first = self.surfaces[0]
+        if first.res_type != "Maximum Deviation" or first.domain_type != "Rectangle":
+            first.make_xy_points_grid()
+            return
+        x_values, y_values = [], []
+        for surface in self.surfaces:
+            surface_x, surface_y = adaptive_axis_values(
+                surface.equation, surface.domain, surface.max_deviation)
+            x_values.append(surface_x)
+            y_values.append(surface_y)
+        first.x_values = np.unique(np.concatenate(x_values))
+        first.y_values = np.unique(np.concatenate(y_values))
+
+    def evaluate(self, x, y):
+        """
+        evaluates every surface at the x and y of the grid and raises a
+        ValueError for the first one that is undefined somewhere
+        """
+        if self.sweep:
+            z = evaluate_sweep(*self.sweep, x, y)
+        else:
+            z = evaluate_equations([surface.equation for surface in self.surfaces], x, y)
+        for surface, surface_z in zip(self.surfaces, z):
+            if not np.all(np.isfinite(surface_z)):
+                raise ValueError('{}: {}'.format(
+                    surface.equation, undefined_text(x, y, surface_z)))
+        return z
+
+    def calculate_points(self):
+        self.make_xy_points_grid()
+        first = self.surfaces[0]
+        x, y = first.sample_coordinates()
+        z = self.evaluate(x, y)
+        offset = np.ptp(np.broadcast_to(x, z.shape[1:])) + self.spacing
+        for index, surface in enumerate(self.surfaces):
+            surface.calculate_points_from(first.x_values, first.y_values, z[index],
+                                          first.grid_x, first.grid_y)
+            surface.points[..., 0] += index * offset
+        return [surface.points for surface in self.surfaces]
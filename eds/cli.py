@@ -0,0 +1,187 @@
+"""
+generates equation driven surfaces in bulk, outside of Fusion 360
+
+    python -m eds jobs.jsonl --output surfaces --format stl --workers 4
+
+every line of a JSONL file (or row of a CSV file) is one surface. a job
+needs an equation and may set any of the fields in job_fields, with the
+same meaning as the inputs of the add-in's dialog. jobs are spread over a
+pool of processes and the throughput is reported at the end. with --cache,
+evaluated grids are kept in a directory and reused by later runs. with
+--row-workers, the grid of every surface is itself split across processes,
+for a few large surfaces of expensive equations
+"""
+import argparse
+import csv
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from .disk_cache import grid_disk_cache
+from .mesh import count_mesh_triangles
+from .surface import surface_points
+
+
+def parse_bool(value):
+    if isinstance(value, str):
+        return value.strip().lower() in ('1', 'true', 'yes', 'y')
+    return bool(value)
+
+
+# fields a job can set, with the type they are read as
+job_fields = {
+    'name': str,
+    'equation': str,
+    'x_min': float, 'x_max': float, 'y_min': float, 'y_max': float,
+    'domain_type': str, 'mask': str,
+    'r_min': float, 'r_max': float, 'angle_min': float, 'angle_max': float,
+    'res_type': str, 'step_size': float,
+    'num_interv_x': int, 'num_interv_y': int, 'max_deviation': float,
+    'has_base': parse_bool, 'base_type': str, 'base_offset': float,
+    'format': str,
+}
+
+# the default domain is the one of the add-in's dialog
+default_job = {'x_min': -4, 'x_max': 4, 'y_min': -4, 'y_max': 4,
+               'r_min': 0.5, 'r_max': 4, 'angle_min': 0, 'angle_max': 2 * np.pi}
+
+output_formats = ['stl', '3mf', 'npz']
+
+
+def read_jobs(path):
+    """
+    reads the jobs of a JSONL or CSV file into a list of dictionaries
+    """
+    with open(path, newline='') as jobs_file:
+        if os.path.splitext(path)[1].lower() == '.csv':
+            rows = list(csv.DictReader(jobs_file))
+        else:
+            rows = [json.loads(line) for line in jobs_file if line.strip()]
+    jobs = []
+    for row in rows:
+        job = dict(default_job)
+        for field, value in row.items():
+            if field not in job_fields:
+                raise ValueError('unknown job field "{}"'.format(field))
+            if value not in (None, ''):
+                job[field] = job_fields[field](value)
+        if 'equation' not in job:
+            raise ValueError('every job needs an equation')
+        jobs.append(job)
+    return jobs
+
+
+def surface_from_job(job):
+    """
+    creates the surface_points described by a job
+    """
+    settings = {field: job[field] for field in
+                ['has_base', 'base_type', 'base_offset', 'res_type',
+                 'step_size', 'num_interv_x', 'num_interv_y', 'max_deviation',
+                 'domain_type', 'mask']
+                if field in job}
+    if job.get('domain_type') == "Polar":
+        domain = [[job['r_min'], job['r_max']], [job['angle_min'], job['angle_max']]]
+    else:
+        domain = [[job['x_min'], job['x_max']], [job['y_min'], job['y_max']]]
+    return surface_points(job['equation'], domain, **settings)
+
+
+def run_job(index, job, output_dir, output_format, cache_dir=None, row_workers=0):
+    """
+    calculates the surface of a job and writes it to output_dir. returns a
+    summary of the job; errors are reported in it instead of being raised
+    so that one bad job does not stop a batch
+    """
+    start = time.perf_counter()
+    output_format = job.get('format', output_format).lower()
+    name = job.get('name') or 'surface_{:04d}'.format(index)
+    path = os.path.join(output_dir, '{}.{}'.format(name, output_format))
+    summary = {'index': index, 'name': name, 'path': path, 'vertices': 0,
+               'triangles': 0, 'error': None}
+    try:
+        if output_format not in output_formats:
+            raise ValueError('unknown format "{}"'.format(output_format))
+        surface = surface_from_job(job)
+        if cache_dir:
+            surface.disk_cache = grid_disk_cache(cache_dir)
+        surface.process_workers = row_workers
+        if output_format == 'npz':
+            surface.calculate_points()
+        else:
+            surface.prepare_export()  # evaluated as it is written
+        num_rows, num_cols = len(surface.x_values), len(surface.y_values)
+        summary['vertices'] = num_rows * num_cols
+        if output_format == 'npz':
+            np.savez(path, x_values=surface.x_values,
+                     y_values=surface.y_values, points=surface.surface(),
+                     base_level=surface.base_level if surface.has_base else np.nan)
+        else:
+            surface.export_file(path)
+            summary['triangles'] = count_mesh_triangles(
+                num_rows, num_cols, surface.has_base, surface.is_closed(),
+                surface.grid_x is None)
+    except Exception as error:  # noqa
+        summary['error'] = '{}: {}'.format(type(error).__name__, error)
+    summary['seconds'] = time.perf_counter() - start
+    return summary
+
+
+def run_jobs(jobs, output_dir, output_format='stl', workers=None,
+             cache_dir=None, row_workers=0):
+    """
+    runs the jobs, across a pool of worker processes unless workers is 1,
+    and returns their summaries in the order of the jobs. the grid of a job
+    is evaluated across row_workers processes of its own if it is large
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    arguments = [(index, job, output_dir, output_format, cache_dir, row_workers)
+                 for index, job in enumerate(jobs)]
+    if workers == 1:
+        return [run_job(*job_arguments) for job_arguments in arguments]
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        return list(pool.map(run_job, *zip(*arguments)))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog='python -m eds',
+        description='Generates equation driven surfaces from a JSONL or CSV file of jobs.')
+    parser.add_argument('jobs', help='JSONL or CSV file with one surface per line')
+    parser.add_argument('-o', '--output', default='surfaces',
+                        help='directory the surfaces are written to')
+    parser.add_argument('-f', '--format', default='stl', choices=output_formats,
+                        help='output format of jobs that do not set one')
+    parser.add_argument('-w', '--workers', type=int, default=None,
+                        help='number of worker processes (default: one per CPU)')
+    parser.add_argument('--row-workers', type=int, default=0,
+                        help='number of processes the grid of a large surface is '
+                        'evaluated across, best with --workers 1 (default: none)')
+    parser.add_argument('--cache', metavar='DIR', default=None,
+                        help='directory to keep evaluated grids in between runs')
+    args = parser.parse_args(argv)
+
+    jobs = read_jobs(args.jobs)
+    start = time.perf_counter()
+    summaries = run_jobs(jobs, args.output, args.format, args.workers,
+                         args.cache, args.row_workers)
+    seconds = time.perf_counter() - start
+
+    failed = 0
+    for summary in summaries:
+        if summary['error']:
+            failed += 1
+            print('{name}: failed, {error}'.format(**summary))
+        else:
+            print('{name}: {vertices} vertices, {triangles} triangles in '
+                  '{seconds:.2f}s -> {path}'.format(**summary))
+    vertices = sum(summary['vertices'] for summary in summaries)
+    triangles = sum(summary['triangles'] for summary in summaries)
+    print('{} jobs ({} failed) in {:.2f}s: {:.1f} jobs/s, {:.0f} vertices/s, '
+          '{:.0f} triangles/s'.format(
+              len(summaries), failed, seconds, len(summaries) / seconds,
+              vertices / seconds, triangles / seconds))
+    return 1 if failed else 0
@@ -0,0 +1,103 @@
+"""
+rewrites the syntax tree of an equation so that sin, cos and exp of a sum of
+a part that depends on x alone and a part that depends on y alone are taken
+of the axis vectors instead of the whole grid:
+
+    sin(a + b) = sin(a) cos(b) + cos(a) sin(b)
+    cos(a + b) = cos(a) cos(b) - sin(a) sin(b)
+    exp(a + b) = exp(a) exp(b)
+
+everything else is evaluated as written. numpy broadcasting already keeps
+the parts of x alone or y alone on the axis vectors, and these rewrites are
+the only ones that were measured to be faster than that
+"""
+import ast
+import copy
+
+
+def variables_of(node):
+    return {child.id for child in ast.walk(node)
+            if isinstance(child, ast.Name) and child.id in ('x', 'y')}
+
+
+def signed_terms(node, sign=1):
+    """
+    returns the terms of a sum as (sign, term) pairs
+    """
+    if isinstance(node, ast.BinOp) and isinstance(node.op, (ast.Add, ast.Sub)):
+        right_sign = sign if isinstance(node.op, ast.Add) else -sign
+        return signed_terms(node.left, sign) + signed_terms(node.right, right_sign)
+    if isinstance(node, ast.UnaryOp) and isinstance(node.op, ast.USub):
+        return signed_terms(node.operand, -sign)
+    return [(sign, node)]
+
+
+def sum_of(terms):
+    """
+    returns the syntax tree of the sum of (sign, term) pairs
+    """
+    total = None
+    for sign, term in terms:
+        term = copy.deepcopy(term)
+        if total is None:
+            total = term if sign > 0 else ast.UnaryOp(ast.USub(), term)
+        else:
+            total = ast.BinOp(total, ast.Add() if sign > 0 else ast.Sub(), term)
+    return total
+
+
+def split_sum(node):
+    """
+    splits a sum into the sum of its terms of x alone, and constants, and
+    the sum of its terms of y alone. returns None when a term depends on both
+    or there are no terms of x or of y
+    """
+    x_terms, y_terms = [], []
+    for sign, term in signed_terms(node):
+        variables = variables_of(term)
+        if variables == {'y'}:
+            y_terms.append((sign, term))
+        elif 'y' not in variables:
+            x_terms.append((sign, term))
+        else:
+            return None
+    if not y_terms or not any(variables_of(term) for _, term in x_terms):
+        return None
+    return sum_of(x_terms), sum_of(y_terms)
+
+
+def call(name, argument):
+    return ast.Call(ast.Name(name, ast.Load()), [copy.deepcopy(argument)], [])
+
+
+def product(a, b):
+    return ast.BinOp(a, ast.Mult(), b)
+
+
+class separate_functions(ast.NodeTransformer):
+    """
+    rewrites sin, cos and exp of separable sums. split_exp tells whether an
+    exp was split, which can overflow where the equation as written does
+    not, e.g. exp(x - y) as exp(x) * exp(-y)
+    """
+
+    def __init__(self):
+        self.split_exp = False
+
+    def visit_Call(self, node):
+        self.generic_visit(node)
+        name = node.func.id
+        if name not in ('sin', 'cos', 'exp') or len(node.args) != 1:
+            return node
+        parts = split_sum(node.args[0])
+        if parts is None:
+            return node
+        a, b = parts
+        if name == 'exp':
+            self.split_exp = True
+            return product(call('exp', a), call('exp', b))
+        if name == 'sin':
+            return ast.BinOp(product(call('sin', a), call('cos', b)), ast.Add(),
+                             product(call('cos', a), call('sin', b)))
+        return ast.BinOp(product(call('cos', a), call('cos', b)), ast.Sub(),
+                         product(call('sin', a), call('sin', b)))
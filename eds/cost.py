@@ -0,0 +1,188 @@
+"""
+estimates of how much work a build is and how long it takes, from the
+counts of what it creates and the cost of each of those measured by earlier
+builds on the same machine
+"""
+import json
+
+from .export import export_chunk_samples
+from .mesh import count_mesh_triangles
+from .tiles import grid_tiles
+
+# seconds per operation until a build on this machine has measured it
+default_costs = {
+    'sample': 5e-8,  # evaluating the equation at one grid point
+    'sketch curve deferred': 2e-3,  # one line or spline, sketch included
+    'sketch curve not deferred': 5e-3,
+    'loft strip': 0.1,  # one loft between two sections, and its stitching
+    'single loft section': 0.05,  # one section of a single loft
+    'mesh triangle': 2e-6,  # one triangle of a mesh body
+    'export triangle': 2e-7,  # one triangle written to a file
+}
+
+# bytes a float or an int takes in a Python list passed to the API
+list_item_bytes = 32
+
+
+def loft_counts(num_rows, num_cols, has_base, single_loft, smooth_splines,
+                closed=False):
+    """
+    returns the sketches, curves and lofts of lofting one grid of samples
+    the same way make_loft_sections, make_rails and loft_multiple or
+    loft_all_sections do. the rails of a closed grid go back to its first
+    row, with one more loft
+    """
+    num_base_points = 2 if has_base else 0
+    # sections, closed by two base lines and a closing line with a base
+    if smooth_splines:
+        section_curves = 4 if has_base else 1
+    else:
+        section_curves = num_cols + 2 if has_base else num_cols - 1
+    # rails, split at every section unless they run the whole length
+    if single_loft and smooth_splines:
+        rail_curves = num_cols + num_base_points * (num_rows - 1)
+    else:
+        rail_curves = (num_cols + num_base_points) * (num_rows - 1 + closed)
+    lofts = 1 if single_loft else num_rows - 1 + closed
+    return {
+        'sketches': num_rows + num_cols + num_base_points,
+        'curves': num_rows * section_curves + rail_curves,
+        'lofts': lofts,
+        'single loft sections': num_rows if single_loft else 0,
+        'stitches': 1 if not (single_loft or has_base) and lofts > 1 else 0,
+    }
+
+
+def build_counts(num_rows, num_cols, has_base=False, build_type="Loft",
+                 smooth_splines=False, tile_size=0, closed=False, fan_base=True):
+    """
+    returns the number of everything a build of a grid of num_rows by
+    num_cols samples evaluates and creates, and the bytes of the arrays it
+    holds on to. closed and fan_base are as for closed_grid_mesh
+    """
+    num_base_points = 2 if has_base else 0
+    triangles = count_mesh_triangles(num_rows, num_cols, has_base, closed, fan_base)
+    counts = {'samples': num_rows * num_cols,
+              'vertices': num_rows * (num_cols + num_base_points),
+              'sketches': 0, 'curves': 0, 'lofts': 0,
+              'single loft sections': 0, 'stitches': 0,
+              'mesh triangles': 0, 'export triangles': 0}
+    # the evaluated samples and the buffer of points
+    counts['bytes'] = 8 * counts['samples'] + 24 * counts['vertices']
+    if build_type == "Mesh Body":
+        counts['mesh triangles'] = triangles
+        # the mesh arrays and the lists they are passed to the API in
+        counts['bytes'] += (24 + 3 * list_item_bytes) * counts['vertices']
+        counts['bytes'] += (12 + 3 * list_item_bytes) * triangles
+        return counts
+    elif build_type == "Export File":
+        counts['export triangles'] = triangles
+        # the points are evaluated a chunk of rows at a time as they are
+        # written, but a polar or masked grid keeps the x and y of every sample
+        chunk = min(counts['samples'], max(export_chunk_samples, num_cols))
+        counts['bytes'] = 32 * chunk + (0 if fan_base else 16 * counts['samples'])
+        return counts
+    tiles = grid_tiles(num_rows, num_cols, 0 if closed else tile_size)
+    for rows, columns in tiles:
+        tile = loft_counts(len(range(num_rows)[rows]),
+                           len(range(num_cols)[columns]), has_base,
+                           build_type == "Single Loft", smooth_splines, closed)
+        for name, count in tile.items():
+            counts[name] += count
+    if len(tiles) > 1 and not has_base:
+        counts['stitches'] += 1  # the tiles are stitched together
+    return counts
+
+
+def format_seconds(seconds):
+    if seconds < 1:
+        return 'under a second'
+    elif seconds < 60:
+        return 'about {:.0f} s'.format(seconds)
+    elif seconds < 3600:
+        return 'about {:.0f} min {:.0f} s'.format(*divmod(seconds, 60))
+    return 'about {:.0f} h {:.0f} min'.format(seconds // 3600, seconds % 3600 // 60)
+
+
+def format_bytes(num_bytes):
+    for unit in ('bytes', 'kB', 'MB'):
+        if num_bytes < 1000:
+            return '{:.0f} {}'.format(num_bytes, unit)
+        num_bytes /= 1000
+    return '{:.1f} GB'.format(num_bytes)
+
+
+class cost_model():
+    """
+    seconds per operation of a build, measured by the builds on this machine
+    and kept in a JSON file between sessions. costs that were not measured
+    yet fall back to default_costs
+    """
+
+    def __init__(self, path=None):
+        self.path = path  # JSON file the measured costs are kept in
+        self.costs = {}  # measured seconds per operation, by operation
+        if path:
+            self.load()
+
+    def load(self):
+        try:
+            with open(self.path) as costs_file:
+                costs = json.load(costs_file)
+        except (OSError, ValueError):
+            return
+        self.costs = {name: float(seconds) for name, seconds in costs.items()
+                      if name in default_costs}
+
+    def save(self):
+        if not self.path:
+            return
+        try:
+            with open(self.path, 'w') as costs_file:
+                json.dump(self.costs, costs_file, indent=1)
+        except OSError:
+            pass
+
+    def cost(self, name):
+        return self.costs.get(name, default_costs[name])
+
+    # records that count operations took seconds. the cost moves half way to
+    # the new measurement, so one unusual build does not throw it off
+    def update(self, name, seconds, count):
+        if count <= 0 or seconds < 0:
+            return
+        measured = seconds / count
+        if name in self.costs:
+            measured = (self.costs[name] + measured) / 2
+        self.costs[name] = measured
+
+    def estimate(self, counts, defer_compute=True):
+        """
+        returns the seconds a build with the given counts takes
+        """
+        sketching = 'sketch curve ' + ('deferred' if defer_compute else 'not deferred')
+        seconds = counts['samples'] * self.cost('sample')
+        seconds += counts['curves'] * self.cost(sketching)
+        if counts['single loft sections']:
+            seconds += counts['single loft sections'] * self.cost('single loft section')
+        else:
+            seconds += counts['lofts'] * self.cost('loft strip')
+        seconds += counts['mesh triangles'] * self.cost('mesh triangle')
+        seconds += counts['export triangles'] * self.cost('export triangle')
+        return seconds
+
+    def describe(self, counts, defer_compute=True):
+        """
+        returns a line about the time and memory a build takes and what it
+        creates
+        """
+        text = 'Build: {}, {}'.format(
+            format_seconds(self.estimate(counts, defer_compute)),
+            format_bytes(counts['bytes']))
+        if counts['curves']:
+            text += ', {:,} sketches with {:,} curves, {:,} lofts'.format(
+                counts['sketches'], counts['curves'], counts['lofts'])
+        elif counts['mesh triangles'] or counts['export triangles']:
+            text += ', {:,} triangles'.format(
+                counts['mesh triangles'] + counts['export triangles'])
+        return text
@@ -0,0 +1,174 @@
+"""
+partial derivatives of equations, found symbolically from the parsed equation
+where possible and by finite differences otherwise
+"""
+import ast
+import functools
+import numpy as np
+
+from .expression import evaluate_equation, parse_equation
+
+
+class NotDifferentiable(Exception):
+    """
+    raised when an equation uses something without a derivative rule
+    """
+
+
+# derivatives of the functions of one argument, in terms of that argument u
+derivative_rules = {
+    'sin': 'cos({u})', 'cos': '-sin({u})', 'tan': '1/cos({u})**2',
+    'asin': '1/sqrt(1-({u})**2)', 'acos': '-1/sqrt(1-({u})**2)',
+    'atan': '1/(1+({u})**2)',
+    'sinh': 'cosh({u})', 'cosh': 'sinh({u})', 'tanh': '1/cosh({u})**2',
+    'asinh': '1/sqrt(({u})**2+1)', 'acosh': '1/sqrt(({u})**2-1)',
+    'atanh': '1/(1-({u})**2)',
+    'exp': 'exp({u})', 'expm1': 'exp({u})', 'sqrt': '1/(2*sqrt({u}))',
+    'log10': '1/(({u})*log(10))', 'log2': '1/(({u})*log(2))',
+    'log1p': '1/(1+({u}))',
+    'abs': '({u})/abs({u})', 'fabs': '({u})/fabs({u})',
+    'radians': 'pi/180', 'degrees': '180/pi',
+    'erf': '2/sqrt(pi)*exp(-({u})**2)', 'erfc': '-2/sqrt(pi)*exp(-({u})**2)',
+}
+
+
+# the helpers below build the text of the derivative, dropping the terms
+# that are zero and the factors that are one as they go
+def add(a, b):
+    if a == '0':
+        return b
+    if b == '0':
+        return a
+    return '({})+({})'.format(a, b)
+
+
+def subtract(a, b):
+    if b == '0':
+        return a
+    if a == '0':
+        return '-({})'.format(b)
+    return '({})-({})'.format(a, b)
+
+
+def multiply(a, b):
+    if a == '0' or b == '0':
+        return '0'
+    if a == '1':
+        return b
+    if b == '1':
+        return a
+    return '({})*({})'.format(a, b)
+
+
+def divide(a, b):
+    if a == '0':
+        return '0'
+    return '({})/({})'.format(a, b)
+
+
+def depends_on(node, variable):
+    return any(isinstance(child, ast.Name) and child.id == variable
+               for child in ast.walk(node))
+
+
+def power_derivative(base, exponent, variable):
+    u, v = ast.unparse(base), ast.unparse(exponent)
+    du, dv = differentiate(base, variable), differentiate(exponent, variable)
+    if not depends_on(exponent, variable):
+        return multiply(multiply(v, '({})**(({})-1)'.format(u, v)), du)
+    if not depends_on(base, variable):
+        return multiply(multiply('({})**({})'.format(u, v),
+                                 'log({})'.format(u)), dv)
+    return multiply('({})**({})'.format(u, v),
+                    add(multiply(dv, 'log({})'.format(u)),
+                        divide(multiply(v, du), u)))
+
+
+def differentiate(node, variable):
+    """
+    returns the text of the derivative of a parsed equation with respect to
+    variable, or raises NotDifferentiable
+    """
+    if not depends_on(node, variable):
+        return '0'
+    if isinstance(node, ast.Expression):
+        return differentiate(node.body, variable)
+    if isinstance(node, ast.Name):
+        return '1'
+    if isinstance(node, ast.UnaryOp):
+        derivative = differentiate(node.operand, variable)
+        if isinstance(node.op, ast.USub):
+            return subtract('0', derivative)
+        return derivative
+    if isinstance(node, ast.BinOp):
+        u, v = ast.unparse(node.left), ast.unparse(node.right)
+        du = differentiate(node.left, variable)
+        dv = differentiate(node.right, variable)
+        if isinstance(node.op, ast.Add):
+            return add(du, dv)
+        if isinstance(node.op, ast.Sub):
+            return subtract(du, dv)
+        if isinstance(node.op, ast.Mult):
+            return add(multiply(du, v), multiply(u, dv))
+        if isinstance(node.op, ast.Div):
+            if dv == '0':
+                return divide(du, v)
+            return subtract(divide(du, v),
+                            divide(multiply(u, dv), '({})**2'.format(v)))
+        if isinstance(node.op, ast.Pow):
+            return power_derivative(node.left, node.right, variable)
+    if isinstance(node, ast.Call):
+        name, args = node.func.id, node.args
+        texts = [ast.unparse(arg) for arg in args]
+        if name == 'pow' and len(args) == 2:
+            return power_derivative(args[0], args[1], variable)
+        if name == 'log' and len(args) in (1, 2):
+            derivative = divide(differentiate(args[0], variable), texts[0])
+            if len(args) == 1:
+                return derivative
+            if depends_on(args[1], variable):
+                raise NotDifferentiable(name)
+            return divide(derivative, 'log({})'.format(texts[1]))
+        if name == 'hypot' and len(args) == 2:
+            return divide(add(multiply(texts[0], differentiate(args[0], variable)),
+                              multiply(texts[1], differentiate(args[1], variable))),
+                          'hypot({}, {})'.format(*texts))
+        if name == 'atan2' and len(args) == 2:
+            return divide(subtract(multiply(texts[1], differentiate(args[0], variable)),
+                                   multiply(texts[0], differentiate(args[1], variable))),
+                          '({})**2+({})**2'.format(*texts))
+        if name in derivative_rules and len(args) == 1:
+            return multiply(derivative_rules[name].format(u=texts[0]),
+                            differentiate(args[0], variable))
+    raise NotDifferentiable(ast.unparse(node))
+
+
+@functools.lru_cache(maxsize=32)
+def derivative_equation(equation, variable):
+    """
+    returns the partial derivative of the equation with respect to variable
+    as the text of another equation. cached by equation text
+    """
+    return differentiate(parse_equation(equation), variable)
+
+
+def partial_derivative(equation, variable, x, y):
+    """
+    evaluates the partial derivative of the equation with respect to x or y
+    at the points (x, y), falling back to central differences when the
+    equation has no symbolic derivative
+    """
+    try:
+        return evaluate_equation(derivative_equation(equation, variable), x, y)
+    except NotDifferentiable:
+        pass
+    x, y = np.asarray(x, dtype=float), np.asarray(y, dtype=float)
+    value = x if variable == 'x' else y
+    step = 1e-6 * np.maximum(1, np.abs(value))
+    if variable == 'x':
+        ahead = evaluate_equation(equation, x + step, y)
+        behind = evaluate_equation(equation, x - step, y)
+    else:
+        ahead = evaluate_equation(equation, x, y + step)
+        behind = evaluate_equation(equation, x, y - step)
+    return (ahead - behind) / (2 * step)
@@ -0,0 +1,163 @@
+"""
+evaluated grids kept on disk between sessions, so building the same surface
+again loads its samples instead of evaluating the equation
+"""
+import ast
+import hashlib
+import os
+
+import numpy as np
+
+from .expression import parse_equation
+
+# total size of the cached grids before the least recently used are deleted
+default_max_bytes = 512 * 1024 * 1024
+
+
+def grid_key(equation, x_values, y_values):
+    """
+    returns a hash of the equation and its sample values. the equation is
+    normalized by its syntax tree, so spacing and redundant brackets do not
+    change the key
+    """
+    digest = hashlib.sha256()
+    digest.update(ast.unparse(parse_equation(equation)).encode())
+    for values in (x_values, y_values):
+        values = np.ascontiguousarray(values, dtype=np.float64)
+        digest.update(str(len(values)).encode())
+        digest.update(values.tobytes())
+    return digest.hexdigest()
+
+
+class grid_disk_cache():
+    """
+    stores evaluated z-grids as .npy files in a directory, named by the hash
+    of what they were evaluated from. grids are loaded memory-mapped: an
+    export reads the rows of a grid a chunk at a time, see
+    surface_points.z_chunks, and builds that need every point copy the grid
+    straight into their buffer of points, without an array of z in between.
+    when the files take more than max_bytes the least recently used ones are
+    deleted
+    the cache is an optimization only: a grid that can not be read or written
+    is evaluated as if it was not cached
+    """
+
+    def __init__(self, directory, max_bytes=default_max_bytes):
+        self.directory = directory
+        self.max_bytes = max_bytes
+
+    def path(self, equation, x_values, y_values):
+        return os.path.join(self.directory,
+                            grid_key(equation, x_values, y_values) + '.npy')
+
+    def load(self, equation, x_values, y_values):
+        """
+        returns the cached grid as a read-only memory-mapped array, or None
+        if it is not cached
+        """
+        path = self.path(equation, x_values, y_values)
+        try:
+            z = np.load(path, mmap_mode='r')
+            os.utime(path)  # the modification time orders the evictions
+        except (OSError, ValueError):
+            return None
+        if z.shape != (len(x_values), len(y_values)):
+            return None
+        return z
+
+    def save(self, equation, x_values, y_values, z):
+        path = self.path(equation, x_values, y_values)
+        if os.path.exists(path):
+            return
+        # written under another name first, so a grid that is being written
+        # is never loaded
+        temporary_path = '{}.{}.tmp'.format(path, os.getpid())
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            with open(temporary_path, 'wb') as grid_file:
+                np.save(grid_file, np.asarray(z, dtype=np.float64))
+            os.replace(temporary_path, path)
+        except OSError:
+            try:
+                os.remove(temporary_path)
+            except OSError:
+                pass
+            return
+        self.evict()
+
+    def writer(self, equation, x_values, y_values):
+        """
+        returns a grid_writer to fill in a chunk of rows at a time, for grids
+        that are never all in memory, or None if it can not be created
+        """
+        path = self.path(equation, x_values, y_values)
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            return grid_writer(self, path, (len(x_values), len(y_values)))
+        except OSError:
+            return None
+
+    def evict(self):
+        """
+        deletes the least recently used grids until the rest fit in max_bytes
+        """
+        try:
+            entries = [entry for entry in os.scandir(self.directory)
+                       if entry.name.endswith('.npy')]
+            files = [(entry.stat().st_mtime, entry.stat().st_size, entry.path)
+                     for entry in entries]
+        except OSError:
+            return
+        total = sum(size for _, size, _ in files)
+        for _, size, path in sorted(files):
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+            except OSError:  # still mapped by a surface on Windows
+                continue
+            total -= size
+
+    def clear(self):
+        try:
+            entries = list(os.scandir(self.directory))
+        except OSError:
+            return
+        for entry in entries:
+            if entry.name.endswith('.npy'):
+                try:
+                    os.remove(entry.path)
+                except OSError:
+                    pass
+
+
+class grid_writer():
+    """
+    a grid written to the cache a chunk of rows at a time, through the
+    memory map z. store adds it to the cache once all of it is written and
+    discard drops it
+    """
+
+    def __init__(self, cache, path, shape):
+        self.cache = cache
+        self.path = path
+        self.temporary_path = '{}.{}.tmp'.format(path, os.getpid())
+        self.z = np.lib.format.open_memmap(self.temporary_path, mode='w+',
+                                           dtype=np.float64, shape=shape)
+
+    def store(self):
+        try:
+            self.z.flush()
+            self.z = None  # unmapped before it is moved, for Windows
+            os.replace(self.temporary_path, self.path)
+        except OSError:
+            self.discard()
+            return
+        self.cache.evict()
+
+    def discard(self):
+        self.z = None
+        try:
+            os.remove(self.temporary_path)
+        except OSError:
+            pass
@@ -0,0 +1,82 @@
+"""
+comparing a built surface with new inputs, to find the few sketch points
+that have to move instead of building the surface again
+"""
+import numpy as np
+
+from .surface import surface_points
+from .tiles import grid_tiles
+
+# builds whose sketches are all lines that can be moved in place
+editable_build_types = ("Loft", "Single Loft")
+
+# inputs a surface is built from, in the order of eds_input
+parameter_names = ['equation', 'domain', 'has_base', 'base_type',
+                   'base_offset', 'res_type', 'step_size', 'num_interv_x',
+                   'num_interv_y', 'max_deviation', 'build_type',
+                   'smooth_splines', 'tile_size', 'defer_compute',
+                   'domain_type', 'mask']
+
+
+def parameters_surface(parameters):
+    """
+    returns the surface_points of stored parameters. parameters stored
+    before there were other domains are of a rectangle
+    """
+    settings = {name: parameters[name] for name in
+                ['has_base', 'base_type', 'base_offset', 'res_type',
+                 'step_size', 'num_interv_x', 'num_interv_y', 'max_deviation']}
+    settings['domain_type'] = parameters.get('domain_type', "Rectangle")
+    settings['mask'] = parameters.get('mask', '')
+    return surface_points(parameters['equation'], parameters['domain'], **settings)
+
+
+def is_single_tile(surface, tile_size):
+    return len(grid_tiles(len(surface.x_values), len(surface.y_values), tile_size)) == 1
+
+
+def can_move_points(old_parameters, old_surface, new_parameters, new_surface):
+    """
+    tells whether the surface built from old_parameters becomes the one of
+    new_parameters by moving its sketch points: the builds have to make the
+    same sketches with the same number of lines, and the rails of both have
+    to be open or closed alike
+    """
+    return (old_parameters['build_type'] == new_parameters['build_type'] and
+            old_surface.domain_type == new_surface.domain_type and
+            old_surface.is_closed() == new_surface.is_closed() and
+            new_parameters['build_type'] in editable_build_types and
+            not old_parameters['smooth_splines'] and
+            not new_parameters['smooth_splines'] and
+            old_parameters['has_base'] == new_parameters['has_base'] and
+            old_surface.points.shape == new_surface.points.shape and
+            is_single_tile(old_surface, old_parameters['tile_size']) and
+            is_single_tile(new_surface, new_parameters['tile_size']))
+
+
+def changed_points(old_points, new_points):
+    """
+    returns a mask of the points that moved, of shape (rows, columns)
+    """
+    tolerance = 1e-9 * max(1, np.abs(old_points).max(), np.abs(new_points).max())
+    return np.any(np.abs(new_points - old_points) > tolerance, axis=-1)
+
+
+def moved_line_ends(changed, closed):
+    """
+    returns (line, end, point) for every end of the lines of a polyline that
+    sits on a changed point, with end 0 for the start and 1 for the end of
+    the line. line i runs from point i to point i + 1, and a closed polyline
+    has one more line from its last point back to the first
+    """
+    num_points = len(changed)
+    num_lines = num_points if closed else num_points - 1
+    ends = []
+    for point in np.nonzero(changed)[0].tolist():
+        if point < num_lines:
+            ends.append((point, 0, point))
+        if point > 0:
+            ends.append((point - 1, 1, point))
+        elif closed:
+            ends.append((num_lines - 1, 1, point))
+    return ends
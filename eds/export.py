@@ -0,0 +1,217 @@
+"""
+streaming writers for binary STL and 3MF files
+"""
+import numpy as np
+import zipfile
+
+from .mesh import (base_vertices, boundary_loops, boundary_ring_indices,
+                   closing_triangle_indices, count_mesh_triangles,
+                   grid_triangle_indices, strip_triangle_indices,
+                   wall_triangle_indices)
+
+
+# samples of the grid evaluated at a time by a surface that is exported
+# without calculating its points, see surface_points.prepare_export
+export_chunk_samples = 1 << 18
+
+# binary STL triangle record: normal, three vertices and an attribute count
+stl_record = np.dtype([('normal', '<f4', (3,)), ('vertices', '<f4', (3, 3)),
+                       ('attribute', '<u2')])
+
+
+def stl_records(triangles):
+    """
+    packs triangles of shape (n, 3, 3) into binary STL records
+    """
+    records = np.zeros(len(triangles), dtype=stl_record)
+    normals = np.cross(triangles[:, 1] - triangles[:, 0],
+                       triangles[:, 2] - triangles[:, 0])
+    lengths = np.linalg.norm(normals, axis=1, keepdims=True)
+    records['normal'] = np.divide(normals, lengths, out=np.zeros_like(normals),
+                                  where=lengths > 0)
+    records['vertices'] = triangles
+    return records.tobytes()
+
+
+class streamed_grid_mesh():
+    """
+    triangulates a grid of points that arrives one row at a time, keeping only
+    the previous row and the edge of the grid in memory. add_row returns the
+    new triangles of the surface and close returns the walls and bottom of the
+    base, if there is one. triangles are arrays of shape (n, 3, 3)
+    closed and fan_base are as for closed_grid_mesh. without a fan, the
+    bottom of every strip is added with the strip
+    rows can be evaluated as they are passed in, see
+    surface_points.prepare_export, so neither the points nor the triangles of
+    the grid are ever all in memory
+    """
+
+    def __init__(self, num_rows, num_cols, base_level=None, flip=False,
+                 closed=False, fan_base=True):
+        self.num_rows, self.num_cols = num_rows, num_cols
+        self.base_level = base_level
+        self.flip = flip
+        self.closed = closed
+        self.fan_base = fan_base and not closed
+        self.previous_row = None
+        self.first_row = None
+        self.first_column, self.last_column = [], []
+        self.strip_indices = grid_triangle_indices(2, num_cols).reshape(-1, 3)
+
+    def count_triangles(self):
+        return count_mesh_triangles(self.num_rows, self.num_cols,
+                                    self.base_level is not None, self.closed,
+                                    self.fan_base)
+
+    def orient(self, triangles):
+        return triangles[:, ::-1] if self.flip else triangles
+
+    # the triangles of the cells between two rows, and of the bottom below
+    # them unless the bottom is a fan
+    def strip(self, row, next_row):
+        triangles = np.concatenate((row, next_row))[self.strip_indices]
+        if self.base_level is None or self.fan_base:
+            return triangles
+        bottom = triangles[:, ::-1].copy()
+        bottom[..., 2] = self.base_level
+        return np.concatenate((triangles, bottom))
+
+    def add_row(self, row):
+        row = np.asarray(row, dtype=float)
+        # copies, as views would keep the whole chunk a row came in alive
+        self.first_column.append(row[0].copy())
+        self.last_column.append(row[-1].copy())
+        if self.first_row is None:
+            self.first_row = row.copy()
+            triangles = np.empty((0, 3, 3))
+        else:
+            triangles = self.strip(self.previous_row, row)
+        self.previous_row = row
+        return self.orient(triangles)
+
+    # the edge vertices of the grid, in the order of boundary_ring_indices
+    def ring(self):
+        return np.concatenate((self.first_column[:-1],
+                               self.previous_row[:-1],
+                               self.last_column[:0:-1],
+                               self.first_row[:0:-1]))
+
+    # the edge vertices of the grid, as the loops of boundary_loops
+    def loops(self):
+        if self.closed:
+            return [np.array(self.first_column), np.array(self.last_column[::-1])]
+        return [self.ring()]
+
+    def close(self):
+        triangles = [np.empty((0, 3, 3))]
+        if self.closed:
+            triangles.append(self.strip(self.previous_row, self.first_row))
+        if self.base_level is not None and self.fan_base:
+            ring = self.ring()
+            vertices = np.concatenate((ring, base_vertices(ring, self.base_level)))
+            triangles.append(vertices[closing_triangle_indices(np.arange(len(ring)), len(ring))])
+        elif self.base_level is not None:
+            for loop in self.loops():
+                base = loop.copy()
+                base[:, 2] = self.base_level
+                indices = np.arange(len(loop))
+                triangles.append(np.concatenate((loop, base))[
+                    wall_triangle_indices(indices, indices + len(loop))])
+        return self.orient(np.concatenate(triangles))
+
+
+def write_binary_stl(path, rows, num_rows, num_cols, base_level=None,
+                     flip=False, scale=10, closed=False, fan_base=True):
+    """
+    streams a grid of points, given as an iterable of rows of shape
+    (num_cols, 3), to a binary STL file. coordinates are multiplied by scale,
+    which converts Fusion's centimeters to the millimeters slicers expect
+    """
+    mesh = streamed_grid_mesh(num_rows, num_cols, base_level, flip, closed, fan_base)
+    with open(path, 'wb') as stl_file:
+        stl_file.write(b'Equation Driven Surface'.ljust(80, b' '))
+        stl_file.write(np.uint32(mesh.count_triangles()).tobytes())
+        for row in rows:
+            stl_file.write(stl_records(mesh.add_row(row) * scale))
+        stl_file.write(stl_records(mesh.close() * scale))
+    return
+
+
+three_mf_content_types = """<?xml version="1.0" encoding="UTF-8"?>
+<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">
+<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>
+<Default Extension="model" ContentType="application/vnd.ms-package.3dmanufacturing-3dmodel+xml"/>
+</Types>
+"""
+
+three_mf_relationships = """<?xml version="1.0" encoding="UTF-8"?>
+<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">
+<Relationship Target="/3D/3dmodel.model" Id="rel0" Type="http://schemas.microsoft.com/3dmanufacturing/2013/01/3dmodel"/>
+</Relationships>
+"""
+
+
+def write_3mf(path, rows, num_rows, num_cols, base_level=None, flip=False,
+              closed=False, fan_base=True):
+    """
+    streams a grid of points, given as an iterable of rows of shape
+    (num_cols, 3), to a 3MF file in centimeters. vertices are shared between
+    triangles, so the mesh is watertight when it has a base. without a fan,
+    every row is followed by its vertices at the base
+    """
+    vertex_format = '<vertex x="%.7g" y="%.7g" z="%.7g"/>\n'
+    triangle_format = '<triangle v1="%d" v2="%d" v3="%d"/>\n'
+
+    def write_vertices(model, vertices):
+        model.write(((vertex_format * len(vertices)) % tuple(
+            np.ravel(vertices))).encode())
+
+    def write_triangles(model, triangles):
+        if flip:
+            triangles = triangles[:, ::-1]
+        model.write(((triangle_format * len(triangles)) % tuple(
+            np.ravel(triangles))).encode())
+
+    mesh = streamed_grid_mesh(num_rows, num_cols, base_level, flip, closed, fan_base)
+    grid_base = base_level is not None and not mesh.fan_base
+    row_stride = 2 * num_cols if grid_base else num_cols
+    columns = np.arange(num_cols)
+    with zipfile.ZipFile(path, 'w', zipfile.ZIP_DEFLATED) as archive:
+        archive.writestr('[Content_Types].xml', three_mf_content_types)
+        archive.writestr('_rels/.rels', three_mf_relationships)
+        with archive.open('3D/3dmodel.model', 'w', force_zip64=True) as model:
+            model.write(b'<?xml version="1.0" encoding="UTF-8"?>\n'
+                        b'<model unit="centimeter" xml:lang="en-US" '
+                        b'xmlns="http://schemas.microsoft.com/3dmanufacturing/core/2015/02">\n'
+                        b'<resources>\n<object id="1" type="model">\n<mesh>\n<vertices>\n')
+            # vertices come first in a 3MF mesh, so the rows are written as
+            # they arrive and the triangles, which only depend on the grid
+            # size, are written afterwards
+            for row in rows:
+                mesh.add_row(row)
+                write_vertices(model, row)
+                if grid_base:
+                    base = np.array(row, dtype=float)
+                    base[:, 2] = base_level
+                    write_vertices(model, base)
+            if base_level is not None and mesh.fan_base:
+                write_vertices(model, base_vertices(mesh.ring(), base_level))
+            model.write(b'</vertices>\n<triangles>\n')
+            for i in range(num_rows - 1 + closed):
+                row = i * row_stride + columns
+                next_row = (i + 1) % num_rows * row_stride + columns
+                write_triangles(model, strip_triangle_indices(row, next_row))
+                if grid_base:
+                    write_triangles(model, strip_triangle_indices(
+                        row + num_cols, next_row + num_cols)[:, ::-1])
+            if base_level is not None and mesh.fan_base:
+                ring = boundary_ring_indices(num_rows, num_cols)
+                write_triangles(model, closing_triangle_indices(
+                    ring, num_rows * num_cols))
+            elif grid_base:
+                for loop in boundary_loops(num_rows, num_cols, closed):
+                    loop = loop // num_cols * row_stride + loop % num_cols
+                    write_triangles(model, wall_triangle_indices(loop, loop + num_cols))
+            model.write(b'</triangles>\n</mesh>\n</object>\n</resources>\n'
+                        b'<build>\n<item objectid="1"/>\n</build>\n</model>\n')
+    return
@@ -0,0 +1,131 @@
+"""
+safe, compile-once evaluation of equations of the form z = f(x, y)
+"""
+import ast
+import copy
+import functools
+import math
+import numpy as np
+
+from .codegen import separate_functions
+
+# functions of the math module that take or return sequences, which an
+# equation has no syntax for
+unsupported_functions = {'dist', 'frexp', 'fsum', 'modf', 'prod', 'sumprod'}
+
+
+# a function of any number of arguments from one of two, like python's min
+def reduced(function, *initial):
+    return lambda *args: functools.reduce(function, args, *initial)
+
+
+# namespace the equation is evaluated in: the functions and constants of the
+# math module, swapped for their numpy equivalents so that a whole grid can
+# be evaluated at once
+numpy_namespace = {name: getattr(math, name) for name in dir(math)
+                   if not name.startswith('_') and name not in unsupported_functions}
+numpy_namespace.update({
+    name: getattr(np, name) for name in [
+        'cbrt', 'ceil', 'copysign', 'cos', 'cosh', 'degrees', 'exp', 'exp2',
+        'expm1', 'fabs', 'floor', 'fmod', 'isfinite', 'isinf', 'isnan',
+        'log10', 'log1p', 'log2', 'nextafter', 'radians', 'sin', 'sinh',
+        'sqrt', 'tan', 'tanh', 'trunc']})
+numpy_namespace.update({
+    'acos': np.arccos, 'asin': np.arcsin, 'atan': np.arctan,
+    'atan2': np.arctan2, 'acosh': np.arccosh, 'asinh': np.arcsinh,
+    'atanh': np.arctanh, 'pow': np.float_power, 'abs': np.abs,
+    'min': reduced(np.minimum), 'max': reduced(np.maximum),
+    'hypot': reduced(np.hypot, 0), 'round': np.round,
+    'log': lambda x, base=math.e: np.log(x) / np.log(base)})
+# no numpy equivalent, like erf, gamma and the integer functions, so the rest
+# are applied element by element
+for name, function in list(numpy_namespace.items()):
+    if callable(function) and function is getattr(math, name, None):
+        numpy_namespace[name] = np.vectorize(function, otypes=[float])
+numpy_namespace['__builtins__'] = {}
+
+# the only syntax an equation may use: arithmetic on numbers, the variables
+# x and y, and calls to the functions in numpy_namespace
+allowed_nodes = (ast.Expression, ast.BinOp, ast.UnaryOp, ast.Call, ast.Name,
+                 ast.Load, ast.Constant, ast.Add, ast.Sub, ast.Mult, ast.Div,
+                 ast.FloorDiv, ast.Mod, ast.Pow, ast.USub, ast.UAdd)
+allowed_variables = ['x', 'y']
+
+
+class EquationError(ValueError):
+    """
+    raised when an equation can not be parsed or uses unsupported syntax
+    """
+
+
+def parse_equation(equation, variables=allowed_variables, nodes=allowed_nodes):
+    """
+    parses the equation and checks it only uses the given syntax nodes and
+    variables. returns the syntax tree of the equation
+    """
+    try:
+        tree = ast.parse(equation.strip(), mode='eval')
+    except SyntaxError:
+        raise EquationError('"{}" is not a valid equation'.format(equation))
+    for node in ast.walk(tree):
+        if not isinstance(node, nodes):
+            raise EquationError(
+                '{} is not allowed in an equation'.format(type(node).__name__))
+        if isinstance(node, ast.Name):
+            if node.id in unsupported_functions:
+                raise EquationError('"{}" is not supported in an equation, it takes '
+                                    'or returns a sequence'.format(node.id))
+            if node.id not in variables and (
+                    node.id not in numpy_namespace or node.id.startswith('_')):
+                raise EquationError('unknown name "{}"'.format(node.id))
+        elif isinstance(node, ast.Call):
+            if not isinstance(node.func, ast.Name) or node.keywords:
+                raise EquationError('only plain function calls are allowed')
+        elif isinstance(node, ast.Constant):
+            if type(node.value) not in (int, float):
+                raise EquationError('only numbers are allowed as constants')
+    return tree
+
+
+@functools.lru_cache(maxsize=32)
+def compile_equation(equation):
+    """
+    parses the equation once and returns a function z(x, y) that works on
+    numbers as well as arrays. compiled equations are cached by equation text
+    sin, cos and exp of sums of a part of x alone and a part of y alone are
+    taken of the axis vectors, see codegen
+    """
+    tree = parse_equation(equation)
+    code = compile(tree, '<equation>', 'eval')
+    separated = separate_functions()
+    separated_tree = ast.fix_missing_locations(separated.visit(copy.deepcopy(tree)))
+    separated_code = compile(separated_tree, '<equation>', 'eval')
+
+    def z_function(x, y):
+        with np.errstate(all='ignore'):
+            z = eval(separated_code, numpy_namespace, {'x': x, 'y': y})
+            if not separated.split_exp or np.all(np.isfinite(z)):
+                return z
+            # a split exp can overflow where the equation as written does
+            # not, so only the samples that are not finite are evaluated
+            # again as written
+            x, y = np.broadcast_arrays(x, y)
+            z = np.array(np.broadcast_to(z, x.shape), dtype=float)
+            undefined = ~np.isfinite(z)
+            z[undefined] = eval(code, numpy_namespace,
+                                {'x': x[undefined], 'y': y[undefined]})
+            return z
+    return z_function
+
+
+def evaluate_equation(equation, x, y):
+    """
+    evaluates the equation at the points (x, y) and returns a float array
+    with the shape of x and y
+    """
+    z_function = compile_equation(equation)
+    z = np.asarray(z_function(x, y), dtype=float)
+    shape = np.broadcast(x, y).shape
+    if z.shape == shape and z.base is None and z is not x and z is not y:
+        return z  # already a new array of its own
+    return np.broadcast_to(z, shape).copy()
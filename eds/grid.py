@@ -0,0 +1,104 @@
+"""
+sample values of the grid a surface is evaluated on
+"""
+import numpy as np
+
+from .expression import evaluate_equation
+
+
+def matching_indices(old_values, new_values):
+    """
+    finds the values that appear in both sorted arrays and returns their
+    indices in old_values and in new_values
+    """
+    tolerance = 1e-9 * max(1, np.abs(old_values).max(), np.abs(new_values).max())
+    nearest = np.searchsorted(old_values, new_values).clip(0, len(old_values) - 1)
+    left = (nearest - 1).clip(0)
+    closer_left = np.abs(old_values[left] - new_values) < np.abs(old_values[nearest] - new_values)
+    nearest = np.where(closer_left, left, nearest)
+    match = np.abs(old_values[nearest] - new_values) <= tolerance
+    return nearest[match], np.nonzero(match)[0]
+
+
+def midpoint_deviation(equation, x_values, y_values, axis):
+    """
+    returns, for every interval along the given axis (0 for x, 1 for y), the
+    largest distance between the equation at the interval midpoint and the
+    straight line between its end samples, over all samples of the other axis
+    this is a second difference, so it estimates the local curvature
+    """
+    z = evaluate_equation(equation, x_values[:, None], y_values[None, :])
+    if axis == 0:
+        midpoints = (x_values[:-1] + x_values[1:]) / 2
+        z_mid = evaluate_equation(equation, midpoints[:, None], y_values[None, :])
+        chord = (z[:-1, :] + z[1:, :]) / 2
+    else:
+        midpoints = (y_values[:-1] + y_values[1:]) / 2
+        z_mid = evaluate_equation(equation, x_values[:, None], midpoints[None, :])
+        chord = (z[:, :-1] + z[:, 1:]) / 2
+    deviation = np.abs(z_mid - chord).max(axis=1 - axis)
+    return midpoints, np.nan_to_num(deviation, nan=np.inf)
+
+
+def adaptive_axis_values(equation, domain, max_deviation, max_intervals=1000,
+                         initial_intervals=8):
+    """
+    returns x and y sample values that are dense where the surface curves and
+    sparse where it is flat. intervals of both axes are halved until the
+    surface deviates from the sampled grid by at most max_deviation, or until
+    an axis reaches max_intervals
+    """
+    axis_values = [np.linspace(domain[0][0], domain[0][1], initial_intervals + 1),
+                   np.linspace(domain[1][0], domain[1][1], initial_intervals + 1)]
+    refined = True
+    while refined:
+        refined = False
+        for axis in (0, 1):
+            midpoints, deviation = midpoint_deviation(
+                equation, axis_values[0], axis_values[1], axis)
+            split = np.nonzero(deviation > max_deviation)[0]
+            room = max_intervals + 1 - len(axis_values[axis])
+            if len(split) > room:  # split the worst intervals only
+                split = split[np.argsort(deviation[split])[::-1][:room]]
+            if len(split):
+                axis_values[axis] = np.sort(
+                    np.concatenate((axis_values[axis], midpoints[split])))
+                refined = True
+    return axis_values[0], axis_values[1]
+
+
+class evaluated_grid_cache():
+    """
+    remembers the last evaluated grid, so that a new grid only evaluates the
+    samples that were not already evaluated for the same equation
+    """
+
+    def __init__(self):
+        self.equation = None
+        self.x_values = None
+        self.y_values = None
+        self.z_values = None
+
+    def evaluate(self, equation, x_values, y_values):
+        z = np.empty((len(x_values), len(y_values)))
+        new_rows = np.ones(len(x_values), dtype=bool)
+        new_columns = np.ones(len(y_values), dtype=bool)
+        if equation == self.equation:
+            old_x, new_x = matching_indices(self.x_values, x_values)
+            old_y, new_y = matching_indices(self.y_values, y_values)
+            z[np.ix_(new_x, new_y)] = self.z_values[np.ix_(old_x, old_y)]
+            new_rows[new_x] = False
+            new_columns[new_y] = False
+        # the missing samples are the new rows and the new columns of the old
+        # rows, both evaluated as grids of axis vectors
+        if new_rows.any():
+            z[new_rows] = evaluate_equation(
+                equation, x_values[new_rows][:, None], y_values[None, :])
+        old_rows = ~new_rows
+        if old_rows.any() and new_columns.any():
+            z[np.ix_(old_rows, new_columns)] = evaluate_equation(
+                equation, x_values[old_rows][:, None],
+                y_values[new_columns][None, :])
+        self.equation = equation
+        self.x_values, self.y_values, self.z_values = x_values, y_values, z
+        return z
@@ -0,0 +1,205 @@
+"""
+recording where the time of a build goes: how long each phase took, how
+many times each API method was called and how much memory the points took,
+written as one JSON line per build so slow builds can be diagnosed later
+"""
+import collections
+import contextlib
+import cProfile
+import datetime
+import functools
+import inspect
+import json
+import os
+import pstats
+import time
+import tracemalloc
+
+from .cost import format_bytes
+
+# functions of a Python profile kept in the log, the slowest first
+max_profile_functions = 20
+
+# phases and API methods named in a summary, the slowest or most called first
+max_summary_items = 3
+
+
+class build_recorder():
+    """
+    times methods and counts calls while a build runs. methods are wrapped
+    on their class between start and stop, so every instance is recorded,
+    also the copies the tiles of a build are, and the classes are the same
+    as before once the build is done
+    when profile is True the main thread is also profiled with cProfile.
+    the points are evaluated on a worker thread, so only their phase time
+    is recorded
+    """
+
+    def __init__(self, profile=False):
+        self.phase_seconds = collections.Counter()  # by phase name
+        self.phase_calls = collections.Counter()
+        self.api_calls = collections.Counter()  # by 'Class.method'
+        self.peak_bytes = {}  # largest size of a buffer, by name
+        self.profile = cProfile.Profile() if profile else None
+        self.patched = []  # (owner, name, original), to undo in stop
+        self.start_time = None
+        self.seconds = None
+        self.traced_peak = None
+        self.started_tracing = False
+
+    def wrap(self, owner, name, make_wrapper):
+        """
+        replaces the method name of class owner by make_wrapper(method),
+        keeping static and class methods what they are. methods that owner
+        does not have are skipped, so an API without them can be recorded
+        """
+        try:
+            original = inspect.getattr_static(owner, name)
+        except AttributeError:
+            return
+        if isinstance(original, (staticmethod, classmethod)):
+            function = original.__func__
+            wrapper = type(original)(functools.wraps(function)(make_wrapper(function)))
+        elif callable(original):
+            wrapper = functools.wraps(original)(make_wrapper(original))
+        else:
+            return  # a property
+        self.patched.append((owner, name, owner.__dict__.get(name)))
+        setattr(owner, name, wrapper)
+
+    def time_methods(self, owner, names):
+        """
+        records the time spent in each of the methods of owner as a phase
+        named after the method. phases that call each other each include
+        the time of the other
+        """
+        for name in names:
+            def make_wrapper(method, name=name):
+                def wrapper(*args, **kwargs):
+                    with self.phase(name):
+                        return method(*args, **kwargs)
+                return wrapper
+            self.wrap(owner, name, make_wrapper)
+
+    def count_calls(self, owner, names):
+        """
+        counts the calls of each of the methods of owner
+        """
+        for name in names:
+            def make_wrapper(method, call='{}.{}'.format(owner.__name__, name)):
+                def wrapper(*args, **kwargs):
+                    self.api_calls[call] += 1
+                    return method(*args, **kwargs)
+                return wrapper
+            self.wrap(owner, name, make_wrapper)
+
+    @contextlib.contextmanager
+    def phase(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.phase_seconds[name] += time.perf_counter() - start
+            self.phase_calls[name] += 1
+
+    def memory(self, name, num_bytes):
+        self.peak_bytes[name] = max(self.peak_bytes.get(name, 0), int(num_bytes))
+
+    def start(self):
+        self.start_time = time.perf_counter()
+        self.started_tracing = not tracemalloc.is_tracing()
+        if self.started_tracing:
+            tracemalloc.start()
+        else:
+            tracemalloc.reset_peak()
+        if self.profile:
+            self.profile.enable()
+
+    # undoes the wrapping, the latest first so a method wrapped twice ends up
+    # as it was
+    def stop(self):
+        if self.profile:
+            self.profile.disable()
+        for owner, name, original in reversed(self.patched):
+            if original is None:
+                delattr(owner, name)
+            else:
+                setattr(owner, name, original)
+        self.patched.clear()
+        if tracemalloc.is_tracing():
+            self.traced_peak = tracemalloc.get_traced_memory()[1]
+            if self.started_tracing:
+                tracemalloc.stop()
+        self.seconds = time.perf_counter() - self.start_time
+
+    def profile_functions(self):
+        """
+        returns the functions of the profile that took longest, including
+        the functions they called
+        """
+        if not self.profile:
+            return []
+        stats = pstats.Stats(self.profile).stats
+        slowest = sorted(stats.items(), key=lambda item: item[1][3], reverse=True)
+        return [{'function': '{}:{}({})'.format(os.path.basename(path), line, function),
+                 'calls': num_calls, 'seconds': round(total, 6),
+                 'cumulative seconds': round(cumulative, 6)}
+                for (path, line, function), (_, num_calls, total, cumulative, _)
+                in slowest[:max_profile_functions]]
+
+    def record(self, details=None):
+        """
+        returns what was recorded, after the details of the build, as a
+        dictionary that can be written as JSON
+        """
+        record = {'time': datetime.datetime.now().isoformat(timespec='seconds')}
+        record.update(details or {})
+        record.update({
+            'seconds': round(self.seconds, 6),
+            'phases': {name: {'seconds': round(seconds, 6),
+                              'calls': self.phase_calls[name]}
+                       for name, seconds in self.phase_seconds.most_common()},
+            'api calls': dict(self.api_calls.most_common()),
+            'peak bytes': dict(self.peak_bytes),
+            'traced peak bytes': self.traced_peak,
+        })
+        if self.profile:
+            record['profile'] = self.profile_functions()
+        return record
+
+    # appends the record of the build to a JSON lines file. the full profile,
+    # if any, is written next to it for pstats or snakeviz
+    def write(self, path, details=None):
+        record = self.record(details)
+        try:
+            if self.profile:
+                record['profile path'] = '{}.{}.prof'.format(
+                    os.path.splitext(path)[0], record['time'].replace(':', '-'))
+                self.profile.dump_stats(record['profile path'])
+            with open(path, 'a') as log_file:
+                log_file.write(json.dumps(record) + '\n')
+        except OSError:
+            pass
+        return record
+
+    def summary(self):
+        """
+        returns a few lines about the phases that took longest, the API
+        methods called most and the memory used
+        """
+        lines = ['Recorded build: {:.2f}s'.format(self.seconds)]
+        if self.phase_seconds:
+            lines.append('Slowest: ' + ', '.join(
+                '{} {:.2f}s'.format(name, seconds)
+                for name, seconds in self.phase_seconds.most_common(max_summary_items)))
+        if self.api_calls:
+            lines.append('{:,} API calls, most: '.format(sum(self.api_calls.values())) +
+                         ', '.join('{} {:,}'.format(call, count) for call, count
+                                   in self.api_calls.most_common(max_summary_items)))
+        memory = ['{} {}'.format(name, format_bytes(num_bytes))
+                  for name, num_bytes in self.peak_bytes.items()]
+        if self.traced_peak is not None:
+            memory.append('peak traced {}'.format(format_bytes(self.traced_peak)))
+        if memory:
+            lines.append('Memory: ' + ', '.join(memory))
+        return '\n'.join(lines)
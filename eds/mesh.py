@@ -0,0 +1,176 @@
+"""
+triangulation of grids of points
+"""
+from math import ceil, sqrt
+import numpy as np
+
+
+def grid_triangle_indices(num_rows, num_cols, closed=False):
+    """
+    returns the flat vertex indices of two triangles for every cell of a
+    num_rows by num_cols grid whose vertices are stored row after row
+    triangles wind counterclockwise when x and y increase with row and column
+    a closed grid, which goes all the way around, also has the cells between
+    its last row and its first
+    """
+    i, j = np.meshgrid(np.arange(num_rows - 1 + closed), np.arange(num_cols - 1),
+                       indexing='ij')
+    a = (i * num_cols + j).ravel()
+    b = ((i + 1) % num_rows * num_cols + j).ravel()
+    c, d = b + 1, a + 1
+    return np.stack((a, b, c, a, c, d), axis=-1).ravel()
+
+
+def strip_triangle_indices(row, next_row):
+    """
+    returns the triangles, of shape (n, 3), of the cells between two rows of
+    a grid given as the indices of their vertices, wound as those of
+    grid_triangle_indices
+    """
+    a, b, c, d = row[:-1], next_row[:-1], next_row[1:], row[1:]
+    return np.stack((a, b, c, a, c, d), axis=-1).reshape(-1, 3)
+
+
+def boundary_ring_indices(num_rows, num_cols):
+    """
+    returns the flat indices of the edge vertices of a grid, going around it
+    counterclockwise when x and y increase with row and column
+    """
+    rows, cols = np.arange(num_rows - 1), np.arange(num_cols - 1)
+    last_row, last_col = (num_rows - 1) * num_cols, num_cols - 1
+    return np.concatenate((rows * num_cols,
+                           last_row + cols,
+                           (num_rows - 1 - rows) * num_cols + last_col,
+                           last_col - cols))
+
+
+def boundary_loops(num_rows, num_cols, closed=False):
+    """
+    returns the flat indices of the edge vertices of a grid as loops, the
+    outside counterclockwise and a hole clockwise when x and y increase with
+    row and column. a closed grid has no first and last row, so its edge is
+    its first column and, around the hole, its last
+    """
+    if not closed:
+        return [boundary_ring_indices(num_rows, num_cols)]
+    rows = np.arange(num_rows)
+    return [rows * num_cols, (num_rows - 1 - rows) * num_cols + num_cols - 1]
+
+
+def count_mesh_triangles(num_rows, num_cols, has_base=False, closed=False,
+                         fan_base=True):
+    """
+    returns the number of triangles of the mesh closed_grid_mesh makes
+    """
+    triangles = 2 * (num_rows - 1 + closed) * (num_cols - 1)
+    if not has_base:
+        return triangles
+    edge = 2 * num_rows if closed else 2 * (num_rows + num_cols - 2)
+    if fan_base and not closed:
+        return triangles + 3 * edge  # the walls and the fan of the bottom
+    return 2 * triangles + 2 * edge  # the grid again as bottom, and the walls
+
+
+def base_vertices(ring, base_level):
+    """
+    returns the edge vertices of a surface dropped to base_level, followed by
+    the center of the base
+    """
+    base = ring.copy()
+    base[:, 2] = base_level
+    center = [(base[:, 0].min() + base[:, 0].max()) / 2,
+              (base[:, 1].min() + base[:, 1].max()) / 2, base_level]
+    return np.concatenate((base, [center]))
+
+
+def wall_triangle_indices(top, bottom):
+    """
+    returns the triangles of the wall between a loop of edge vertices of the
+    surface, top, and the loop of the same vertices at the base, bottom
+    """
+    next_top, next_bottom = np.roll(top, -1), np.roll(bottom, -1)
+    return np.concatenate((np.stack((top, bottom, next_bottom), axis=-1),
+                           np.stack((top, next_bottom, next_top), axis=-1)))
+
+
+def closing_triangle_indices(ring, first_base_index):
+    """
+    returns the triangles of the walls and of the bottom fan that close a
+    surface into a solid. ring holds the indices of the edge vertices of the
+    surface and the vertices from base_vertices start at first_base_index
+    """
+    bottom = first_base_index + np.arange(len(ring))
+    center = np.full(len(ring), first_base_index + len(ring))
+    return np.concatenate((wall_triangle_indices(ring, bottom),
+                           np.stack((center, np.roll(bottom, -1), bottom), axis=-1)))
+
+
+def closed_grid_mesh(surface, base_level=None, closed=False, fan_base=True):
+    """
+    triangulates a grid of points of shape (rows, cols, 3) and returns the
+    vertices and triangles as arrays of shape (n, 3). with a base_level the
+    mesh is closed into a watertight solid by walls around the edge of the
+    grid and a bottom, all facing outwards
+    the bottom is fanned from the center of the base, which only covers the
+    grid when its edge is star-shaped around the center, as a rectangle's
+    is. without fan_base, and for closed grids, the bottom is the grid
+    itself dropped to base_level, which covers any grid exactly
+    """
+    num_rows, num_cols = surface.shape[:2]
+    vertices = surface.reshape(-1, 3)
+    triangles = grid_triangle_indices(num_rows, num_cols, closed).reshape(-1, 3)
+    if base_level is None:
+        return vertices, triangles
+    if fan_base and not closed:
+        ring = boundary_ring_indices(num_rows, num_cols)
+        triangles = np.concatenate(
+            (triangles, closing_triangle_indices(ring, len(vertices))))
+        vertices = np.concatenate(
+            (vertices, base_vertices(vertices[ring], base_level)))
+    else:
+        base = vertices.copy()
+        base[:, 2] = base_level
+        walls = [wall_triangle_indices(loop, loop + len(vertices))
+                 for loop in boundary_loops(num_rows, num_cols, closed)]
+        triangles = np.concatenate(
+            [triangles, triangles[:, ::-1] + len(vertices)] + walls)
+        vertices = np.concatenate((vertices, base))
+    if base_is_above(surface, base_level):
+        triangles = triangles[:, ::-1]
+    return vertices, triangles
+
+
+def base_is_above(surface, base_level):
+    """
+    whether the base lies above the surface, in which case every triangle of
+    the closed solid has to be turned around to face outwards
+    """
+    return base_level is not None and base_level > surface[..., 2].mean()
+
+
+def decimation_indices(length, stride):
+    """
+    returns every stride-th index of an axis, always keeping the last one
+    """
+    return np.unique(np.append(np.arange(0, length, stride), length - 1))
+
+
+def decimation_stride(num_rows, num_cols, max_vertices):
+    """
+    returns the smallest stride that leaves about max_vertices of a grid
+    """
+    return max(1, int(ceil(sqrt(num_rows * num_cols / max_vertices))))
+
+
+def decimate_grid(points, max_vertices):
+    """
+    keeps every n-th row and column of a grid of points so that at most about
+    max_vertices remain; the edges of the grid are always kept
+    """
+    num_rows, num_cols = points.shape[:2]
+    stride = decimation_stride(num_rows, num_cols, max_vertices)
+    if stride == 1:
+        return points
+    rows = decimation_indices(num_rows, stride)
+    cols = decimation_indices(num_cols, stride)
+    return points[np.ix_(rows, cols)]
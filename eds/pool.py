@@ -0,0 +1,127 @@
+"""
+evaluating the grid of an expensive equation across a pool of processes. the
+grid is split into chunks of rows, the x-slices the lofts are built from,
+and every process writes the z values of its chunks into one block of
+shared memory, so neither the grid nor its values are pickled
+"""
+from concurrent.futures import ProcessPoolExecutor
+import multiprocessing
+from multiprocessing import shared_memory
+import os
+import time
+
+import numpy as np
+
+from .expression import evaluate_equation
+
+# fewest samples a grid needs before a pool is considered, smaller grids are
+# always evaluated in this process
+min_pool_samples = 65536
+
+# least time the rest of a grid has to be estimated to take in this process
+# before a pool is started for it, about what starting one takes
+min_pool_seconds = 0.5
+
+# chunks of rows every process is given, so a chunk that is slower to
+# evaluate does not hold up the rest
+chunks_per_worker = 4
+
+
+def row_chunks(num_rows, num_chunks):
+    """
+    splits num_rows rows into at most num_chunks runs of about the same
+    length, returned as (start, stop) pairs
+    """
+    bounds = np.linspace(0, num_rows, min(num_chunks, num_rows) + 1).round().astype(int)
+    return [(int(start), int(stop)) for start, stop in zip(bounds, bounds[1:])]
+
+
+def chunk_rows(array, start, stop):
+    """
+    the rows start to stop of x or y, which have one row when they are the
+    same for every row of the grid
+    """
+    return array if array.shape[0] == 1 else array[start:stop]
+
+
+def grid_arrays(buffer, x_shape, y_shape, z_shape):
+    """
+    returns x, y and z as arrays over one buffer, one after the other
+    """
+    x_size, y_size = int(np.prod(x_shape)), int(np.prod(y_shape))
+    data = np.ndarray((x_size + y_size + int(np.prod(z_shape)),), dtype=float,
+                      buffer=buffer)
+    return (data[:x_size].reshape(x_shape), data[x_size:x_size + y_size].reshape(y_shape),
+            data[x_size + y_size:].reshape(z_shape))
+
+
+def evaluate_rows(equation, name, shapes, start, stop):
+    """
+    evaluates the rows start to stop of the grid in the shared memory block
+    name, in a worker process. the equation is compiled once per process.
+    the rows are copied out of the block before they are evaluated, so an
+    error does not keep the block from being closed
+    """
+    block = shared_memory.SharedMemory(name=name)
+    try:
+        x, y, _ = grid_arrays(block.buf, *shapes)
+        x, y = chunk_rows(x, start, stop).copy(), chunk_rows(y, start, stop).copy()
+        z = evaluate_equation(equation, x, y)
+        grid_arrays(block.buf, *shapes)[2][start:stop] = z
+    finally:
+        block.close()
+
+
+def evaluate_pool(equation, x, y, first_z, chunks, workers):
+    """
+    evaluates the chunks on a pool of workers processes, with the grid and
+    the z values of the rows already evaluated, first_z, in shared memory
+    """
+    x, y = np.asarray(x, dtype=float), np.asarray(y, dtype=float)
+    shapes = (x.shape, y.shape, np.broadcast(x, y).shape)
+    size = 8 * (x.size + y.size + int(np.prod(shapes[2])))
+    block = shared_memory.SharedMemory(create=True, size=size)
+    try:
+        shared = grid_arrays(block.buf, *shapes)
+        shared[0][...], shared[1][...] = x, y
+        shared[2][:len(first_z)] = first_z
+        # spawned, as forking a process with threads, like Fusion 360's or
+        # a preview's, can deadlock
+        with ProcessPoolExecutor(workers, multiprocessing.get_context('spawn')) as executor:
+            futures = [executor.submit(evaluate_rows, equation, block.name, shapes, start, stop)
+                       for start, stop in chunks]
+            for future in futures:
+                future.result()
+        return shared[2].copy()
+    finally:
+        shared = None  # the arrays over the block have to go before it does
+        block.close()
+        block.unlink()
+
+
+def evaluate_chunked(equation, x, y, workers=0):
+    """
+    evaluates the equation at x and y, which broadcast to a grid of rows,
+    in chunks of rows across workers processes, at most one per CPU. grids
+    smaller than min_pool_samples are evaluated in this process, as are
+    grids whose first chunk shows that the rest takes less than
+    min_pool_seconds
+    """
+    shape = np.broadcast(x, y).shape
+    workers = min(workers, os.cpu_count() or 1)
+    if workers <= 1 or len(shape) != 2 or shape[0] * shape[1] < min_pool_samples:
+        return evaluate_equation(equation, x, y)
+    chunks = row_chunks(shape[0], workers * chunks_per_worker)
+    if len(chunks) < 2:
+        return evaluate_equation(equation, x, y)
+    start, stop = chunks[0]
+    seconds = time.perf_counter()
+    first_z = evaluate_equation(equation, chunk_rows(x, start, stop), chunk_rows(y, start, stop))
+    seconds = time.perf_counter() - seconds
+    if seconds * (shape[0] - stop) / stop < min_pool_seconds:
+        z = np.empty(shape)
+        z[:stop] = first_z
+        z[stop:] = evaluate_equation(
+            equation, chunk_rows(x, stop, shape[0]), chunk_rows(y, stop, shape[0]))
+        return z
+    return evaluate_pool(equation, x, y, first_z, chunks[1:], workers)
@@ -0,0 +1,165 @@
+"""
+domains that are not axis-aligned rectangles: polar domains and rectangles
+masked by an inequality. both are mapped onto a grid of rows and columns
+that only covers the region, so the sections and rails built from the grid
+do too
+"""
+import ast
+import functools
+
+import numpy as np
+
+from .expression import allowed_nodes, numpy_namespace, parse_equation
+from .scan import runs
+
+domain_types = ("Rectangle", "Polar", "Mask")
+
+# the syntax of a mask: an equation's, plus comparisons joined by and and or
+mask_nodes = allowed_nodes + (ast.Compare, ast.Lt, ast.LtE, ast.Gt, ast.GtE,
+                              ast.BoolOp, ast.And, ast.Or)
+
+# samples along each axis of the domain the mask is checked on to find the
+# region, before its edges are found by bisection
+mask_samples = 1025
+
+# halvings of the interval an edge of the region is found in
+edge_bisections = 40
+
+# narrowest row of a masked grid, as a fraction of the widest
+min_span = 0.01
+
+
+class element_wise_logic(ast.NodeTransformer):
+    """
+    rewrites and, or and chained comparisons, which only work on single
+    truth values, to & and | which work element by element on arrays
+    """
+
+    def visit_BoolOp(self, node):
+        self.generic_visit(node)
+        operator = ast.BitAnd() if isinstance(node.op, ast.And) else ast.BitOr()
+        return functools.reduce(
+            lambda left, right: ast.BinOp(left, operator, right), node.values)
+
+    def visit_Compare(self, node):
+        self.generic_visit(node)
+        operands = [node.left] + node.comparators
+        comparisons = [ast.Compare(left, [operator], [right]) for left, operator, right
+                       in zip(operands, node.ops, operands[1:])]
+        return functools.reduce(
+            lambda left, right: ast.BinOp(left, ast.BitAnd(), right), comparisons)
+
+
+@functools.lru_cache(maxsize=32)
+def compile_mask(mask):
+    """
+    parses an inequality in x and y, like x**2 + y**2 <= 16, and returns a
+    function inside(x, y) that tells where it holds. raises EquationError
+    for anything that is not an equation, comparison, and or or
+    """
+    tree = parse_equation(mask, nodes=mask_nodes)
+    tree = ast.fix_missing_locations(element_wise_logic().visit(tree))
+    code = compile(tree, '<mask>', 'eval')
+
+    def inside(x, y):
+        with np.errstate(all='ignore'):
+            holds = eval(code, numpy_namespace, {'x': x, 'y': y})
+        return np.broadcast_to(np.asarray(holds, dtype=bool), np.broadcast(x, y).shape)
+    return inside
+
+
+def is_closed_span(domain):
+    """
+    whether the angles of a polar domain go all the way around
+    """
+    angle_min, angle_max = domain[1]
+    return angle_max - angle_min >= 2 * np.pi - 1e-9
+
+
+def polar_grid(domain, row_intervals, column_intervals):
+    """
+    returns the angles of the rows, the radii of the columns and the x and y
+    of the samples of the polar domain [[r_min, r_max], [angle_min,
+    angle_max]] around the origin. every row is a ray, so the sections are
+    planar, and every column an arc. the radii run from the outside in, so
+    the grid turns the way a rectangular one does and the surface faces up
+    a domain all the way around leaves out its last ray, which is the first
+    one again. the grid is closed: its last row is joined to its first
+    """
+    (r_min, r_max), (angle_min, angle_max) = domain
+    angles = np.linspace(angle_min, angle_max, row_intervals + 1)
+    if is_closed_span(domain):
+        angles = angles[:-1]
+    radii = np.linspace(r_max, r_min, column_intervals + 1)
+    grid_x = np.cos(angles)[:, None] * radii[None, :]
+    grid_y = np.sin(angles)[:, None] * radii[None, :]
+    return angles, radii, grid_x, grid_y
+
+
+def polar_bounds(domain):
+    r_max = domain[0][1]
+    return [[-r_max, r_max], [-r_max, r_max]]
+
+
+def refine_edges(inside, x_values, inner, outer):
+    """
+    moves every edge of a row from inner, where the mask holds, toward
+    outer, where it does not, by bisection. returns the new inner
+    """
+    for _ in range(edge_bisections):
+        middle = (inner + outer) / 2
+        holds = inside(x_values, middle)
+        inner = np.where(holds, middle, inner)
+        outer = np.where(holds, outer, middle)
+    return inner
+
+
+def row_edges(inside, x_values, y_values):
+    """
+    finds where the region starts and ends along the rows at x_values,
+    sampled at y_values and refined by bisection. returns whether the mask
+    holds in each row, whether it holds on one stretch of it, and the lower
+    and upper edges. edges at the border of the domain stay there
+    """
+    holds = inside(x_values[:, None], y_values[None, :])
+    lower = np.argmax(holds, axis=1)
+    upper = len(y_values) - 1 - np.argmax(holds[:, ::-1], axis=1)
+    counts = np.count_nonzero(holds, axis=1)
+    y_lower = refine_edges(inside, x_values, y_values[lower],
+                           y_values[np.maximum(lower - 1, 0)])
+    y_upper = refine_edges(inside, x_values, y_values[upper],
+                           y_values[np.minimum(upper + 1, len(y_values) - 1)])
+    return counts > 0, counts == upper - lower + 1, y_lower, y_upper
+
+
+def masked_grid(mask, domain, row_intervals, column_intervals):
+    """
+    returns the x of the rows, the fractions of the columns and the x and y
+    of the samples of a grid over the part of the rectangular domain where
+    the mask holds. every row runs across the region, from its lower to its
+    upper edge. the region has to be one stretch of every row, and the rows
+    one stretch along x, which any convex region is
+    the tips of the region, where its rows are narrower than min_span of
+    the widest, are left out, as a section can not be lofted through a point
+    """
+    inside = compile_mask(mask)
+    (x_min, x_max), (y_min, y_max) = domain
+    fine_x = np.linspace(x_min, x_max, mask_samples)
+    fine_y = np.linspace(y_min, y_max, mask_samples)
+    holds, is_single, y_lower, y_upper = row_edges(inside, fine_x, fine_y)
+    span = np.where(holds, y_upper - y_lower, 0)
+    if not span.max() > 0:
+        raise ValueError('the mask does not hold on any area of the domain')
+    rows = np.nonzero(span >= min_span * span.max())[0]
+    if len(runs(rows)) > 1 or not is_single[rows].all():
+        raise ValueError('the mask has to hold on one stretch of x, and of y at every x')
+    x_values = np.linspace(fine_x[rows[0]], fine_x[rows[-1]], row_intervals + 1)
+    holds, is_single, y_lower, y_upper = row_edges(inside, x_values, fine_y)
+    is_valid = holds & is_single
+    if not is_valid.all():
+        raise ValueError('the mask has to hold on one stretch of y at x = {:.4g}'.format(
+            x_values[np.argmin(is_valid)]))
+    fractions = np.linspace(0, 1, column_intervals + 1)
+    grid_y = y_lower[:, None] + fractions[None, :] * (y_upper - y_lower)[:, None]
+    grid_x = np.broadcast_to(x_values[:, None], grid_y.shape).copy()
+    return x_values, fractions, grid_x, grid_y
@@ -0,0 +1,171 @@
+"""
+finding where in the domain a surface can not be built, before building it:
+samples where the equation is undefined and places where it jumps
+"""
+import numpy as np
+
+from .expression import evaluate_equation
+
+# most intervals checked for a jump, the ones that change the most
+max_jump_candidates = 10000
+
+# halvings of an interval when checking it for a jump
+jump_bisections = 30
+
+
+# most regions named in a description
+max_regions = 3
+
+
+def runs(indices):
+    """
+    splits sorted indices into runs of consecutive indices
+    """
+    return np.split(indices, np.nonzero(np.diff(indices) > 1)[0] + 1)
+
+
+def grid_coordinates(x, y):
+    """
+    returns the x and y of every sample as arrays of the shape of the grid.
+    x and y are the axis values of a rectangular grid, arrays that broadcast
+    to the grid, like (rows, 1) and (1, columns), or already the x and y of
+    every sample of a polar or masked one
+    """
+    if np.ndim(x) == 1 and np.ndim(y) == 1:
+        x, y = x[:, None], y[None, :]
+    return np.broadcast_arrays(x, y)
+
+
+def range_text(name, low, high):
+    if low == high:
+        return '{} = {:.4g}'.format(name, low)
+    return '{} from {:.4g} to {:.4g}'.format(name, low, high)
+
+
+def region_text(x, y, mask):
+    """
+    describes where the samples in mask are, as the boxes around runs of
+    consecutive rows and, within those, of consecutive columns
+    """
+    x, y = grid_coordinates(x, y)
+    boxes = []
+    for rows in runs(np.nonzero(mask.any(axis=1))[0]):
+        for columns in runs(np.nonzero(mask[rows].any(axis=0))[0]):
+            box = np.ix_(rows, columns)
+            boxes.append('{}, {}'.format(
+                range_text('x', x[box].min(), x[box].max()),
+                range_text('y', y[box].min(), y[box].max())))
+    text = '; '.join(boxes[:max_regions])
+    if len(boxes) > max_regions:
+        text += ' and {} more places'.format(len(boxes) - max_regions)
+    return text
+
+
+def undefined_text(x, y, z):
+    """
+    describes where z, sampled on the grid of x and y, is not finite, or
+    returns None if it is finite everywhere
+    """
+    undefined = ~np.isfinite(z)
+    if not undefined.any():
+        return None
+    return 'equation is undefined at {} of {} samples, for {}'.format(
+        np.count_nonzero(undefined), z.size, region_text(x, y, undefined))
+
+
+def jump_intervals(equation, x, y, z, axis):
+    """
+    returns a mask of the samples at the ends of the intervals between rows
+    (axis 0) or columns (axis 1) that the surface jumps across
+    the intervals that change the most are halved repeatedly, keeping the
+    half that changes most: a continuous surface changes less and less,
+    while a jump does not
+    """
+    x, y = grid_coordinates(x, y)
+    change = np.abs(np.diff(z, axis=axis)).ravel()
+    candidates = np.arange(change.size)
+    if change.size > max_jump_candidates:
+        candidates = np.argpartition(change, -max_jump_candidates)[-max_jump_candidates:]
+    candidates = candidates[change[candidates] > 1e-12 * (1 + np.abs(z).max())]
+    mask = np.zeros(z.shape, dtype=bool)
+    if not len(candidates):
+        return mask
+    rows, columns = np.unravel_index(
+        candidates, (z.shape[0] - 1, z.shape[1]) if axis == 0 else (z.shape[0], z.shape[1] - 1))
+    next_rows, next_columns = (rows + 1, columns) if axis == 0 else (rows, columns + 1)
+    # the intervals are bisected as fractions of the way from start to end
+    x_start, y_start = x[rows, columns], y[rows, columns]
+    x_step = x[next_rows, next_columns] - x_start
+    y_step = y[next_rows, next_columns] - y_start
+    low, high = np.zeros(len(rows)), np.ones(len(rows))
+    z_low, z_high = z[rows, columns], z[next_rows, next_columns]
+    initial_change = np.abs(z_high - z_low)
+    for _ in range(jump_bisections):
+        middle = (low + high) / 2
+        z_middle = evaluate_equation(
+            equation, x_start + middle * x_step, y_start + middle * y_step)
+        lower_half = ~(np.abs(z_middle - z_low) < np.abs(z_high - z_middle))
+        high = np.where(lower_half, middle, high)
+        z_high = np.where(lower_half, z_middle, z_high)
+        low = np.where(lower_half, low, middle)
+        z_low = np.where(lower_half, z_low, z_middle)
+    with np.errstate(invalid='ignore'):
+        jumps = ~(np.abs(z_high - z_low) < initial_change / 2)
+    mask[rows[jumps], columns[jumps]] = True
+    mask[next_rows[jumps], next_columns[jumps]] = True
+    return mask
+
+
+def scan_grid(equation, x, y):
+    """
+    evaluates the equation on the grid and returns a description of where
+    it is undefined or jumps, or None if the surface can be built
+    """
+    try:
+        if np.ndim(x) == 1:
+            z = evaluate_equation(equation, x[:, None], y[None, :])
+        else:
+            z = evaluate_equation(equation, x, y)
+    except Exception as error:  # noqa
+        return str(error)
+    problem = undefined_text(x, y, z)
+    if problem:
+        return problem
+    jumps = np.zeros(z.shape, dtype=bool)
+    for axis in (0, 1):
+        if z.shape[axis] > 1:
+            jumps |= jump_intervals(equation, x, y, z, axis)
+    if jumps.any():
+        return 'equation jumps between samples, for {}'.format(
+            region_text(x, y, jumps))
+    return None
+
+
+def coarse_indices(num_samples, num_intervals):
+    """
+    returns the indices of about num_intervals + 1 evenly spread samples,
+    the first and last included
+    """
+    stride = max(1, -(-(num_samples - 1) // num_intervals))
+    return np.unique(np.append(np.arange(0, num_samples, stride), num_samples - 1))
+
+
+def scan_surface(equation, x, y, coarse_intervals=32, max_samples=4000000):
+    """
+    scans a coarse subset of the grid first, so most problems are found
+    quickly, and then the grid itself unless it has more than max_samples
+    x and y are as for grid_coordinates
+    """
+    if np.ndim(x) == 1:
+        num_rows, num_cols = len(x), len(y)
+        coarse_x = x[coarse_indices(num_rows, coarse_intervals)]
+        coarse_y = y[coarse_indices(num_cols, coarse_intervals)]
+    else:
+        num_rows, num_cols = x.shape
+        coarse = np.ix_(coarse_indices(num_rows, coarse_intervals),
+                        coarse_indices(num_cols, coarse_intervals))
+        coarse_x, coarse_y = x[coarse], y[coarse]
+    problem = scan_grid(equation, coarse_x, coarse_y)
+    if problem or num_rows * num_cols > max_samples:
+        return problem
+    return scan_grid(equation, x, y)
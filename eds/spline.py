@@ -0,0 +1,31 @@
+"""
+cubic splines through sampled points with known tangents, written as the
+control points and knots of a single non-rational NURBS curve
+"""
+import numpy as np
+
+
+def hermite_control_points(points, tangents, parameters):
+    """
+    returns the control points of the cubic bezier segments between
+    consecutive points, where tangents are the derivatives of the points with
+    respect to the parameters. shape (3 * segments + 1, 3)
+    """
+    points = np.asarray(points, dtype=float)
+    tangents = np.asarray(tangents, dtype=float)
+    steps = np.diff(np.asarray(parameters, dtype=float))[:, None]
+    control_points = np.empty((3 * len(steps) + 1, points.shape[1]))
+    control_points[0::3] = points
+    control_points[1::3] = points[:-1] + tangents[:-1] * steps / 3
+    control_points[2::3] = points[1:] - tangents[1:] * steps / 3
+    return control_points
+
+
+def bezier_knots(parameters):
+    """
+    returns the knots of a cubic NURBS curve made of bezier segments that
+    start and end at the parameters
+    """
+    parameters = np.asarray(parameters, dtype=float)
+    return np.concatenate(
+        [parameters[:1], np.repeat(parameters, 3), parameters[-1:]])
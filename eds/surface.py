@@ -0,0 +1,433 @@
+"""
+the points of an equation driven surface, computed without Fusion 360 so they
+can be used inside the add-in as well as from scripts and the command line
+"""
+import copy
+from math import ceil, floor
+import numpy as np
+import os
+import time
+
+from .export import export_chunk_samples, write_3mf, write_binary_stl
+from .derivative import partial_derivative
+from .grid import adaptive_axis_values
+from .mesh import base_is_above, closed_grid_mesh
+from .pool import evaluate_chunked
+from .region import is_closed_span, masked_grid, polar_bounds, polar_grid
+from .scan import undefined_text
+from .tiles import evaluate_tiles, grid_tiles
+
+
+class surface_points():
+    def __init__(self, equation, domain, has_base=False, base_type="Automatic",
+                 base_offset=-1, res_type="Number of Intervals", step_size=1,
+                 num_interv_x=10, num_interv_y=10, max_deviation=0.05,
+                 tile_size=0, domain_type="Rectangle", mask=''):
+        # inputs
+        self.equation = equation
+        # [[x_min, x_max], [y_min, y_max]], or [[r_min, r_max], [angle_min,
+        # angle_max]] for a polar domain
+        self.domain = domain
+        self.domain_type = domain_type  # one of region.domain_types
+        self.mask = mask  # inequality a "Mask" domain is kept where, see region
+        self.has_base = has_base
+        self.base_type = base_type
+        self.base_offset = base_offset
+        self.res_type = res_type
+        self.step_size = step_size
+        self.num_interv_x = num_interv_x
+        self.num_interv_y = num_interv_y
+        self.max_deviation = max_deviation
+        self.tile_size = tile_size  # intervals per side of a tile, 0 for one tile
+        # internal variables
+        self.x_values = None  # x values of the grid, one per x-slice
+        self.y_values = None  # y values of the grid, shared by every x-slice
+        # x and y of every sample of a polar or masked grid, whose x_values
+        # and y_values are the angles and radii or the x and the fractions
+        # of the way across the region of its rows and columns
+        self.grid_x = None
+        self.grid_y = None
+        self.points = None  # array of points of shape (x samples, y samples, 3)
+        self.grid_cache = None  # evaluated_grid_cache to reuse samples from
+        self.disk_cache = None  # grid_disk_cache to load and store grids in
+        self.process_workers = 0  # processes to evaluate large grids on, see pool
+        self.allow_failed_tiles = False  # keep the tiles that could be evaluated
+        self.failed_tiles = {}  # reason each tile failed, by tile index
+        self.evaluation_seconds = None  # time evaluate_z took, if it was run
+        self.min_z = 0
+        self.mean_z = None  # of a surface prepared for export, see prepare_export
+        self.base_level = 0
+
+    def make_xy_points_grid(self):
+        """
+        creates the x and y sample values in the specifed domain as arrays
+        uses step size, number of intervals (x & y) and resolution type
+        samples are computed from their index so no rounding error accumulates
+        """
+        if self.domain_type != "Rectangle":
+            return self.make_region_grid()
+        x_min, x_max = self.domain[0][0], self.domain[0][1]
+        y_min, y_max = self.domain[1][0], self.domain[1][1]
+        # these methods reflect the difference in input type: step size vs number of intervals vs deviation
+        if self.res_type == "Maximum Deviation":
+            self.x_values, self.y_values = adaptive_axis_values(
+                self.equation, self.domain, self.max_deviation)
+        elif self.res_type == "Interval Length":
+            num_interv_x = int(floor((x_max - x_min) / self.step_size + 1e-9))
+            num_interv_y = int(floor((y_max - y_min) / self.step_size + 1e-9))
+            self.x_values = x_min + self.step_size * np.arange(num_interv_x + 1)
+            self.y_values = y_min + self.step_size * np.arange(num_interv_y + 1)
+        else:
+            self.x_values = np.linspace(x_min, x_max, self.num_interv_x + 1)
+            self.y_values = np.linspace(y_min, y_max, self.num_interv_y + 1)
+        return
+
+    def make_region_grid(self):
+        """
+        creates the grid of a polar or masked domain, with about as many
+        samples as a rectangular grid over its bounds has. with an interval
+        length, no interval is longer than it
+        """
+        if self.domain_type == "Polar":
+            bounds = polar_bounds(self.domain)
+            (r_min, r_max), (angle_min, angle_max) = self.domain
+            lengths = [r_max * (angle_max - angle_min), r_max - r_min]
+        else:
+            bounds = self.domain
+            lengths = [bound[1] - bound[0] for bound in self.domain]
+        if self.res_type == "Maximum Deviation":
+            x_values, y_values = adaptive_axis_values(
+                self.equation, bounds, self.max_deviation)
+            intervals = [len(x_values) - 1, len(y_values) - 1]
+        elif self.res_type == "Interval Length":
+            intervals = [max(1, int(ceil(length / self.step_size - 1e-9)))
+                         for length in lengths]
+        else:
+            intervals = [self.num_interv_x, self.num_interv_y]
+        if self.domain_type == "Polar":
+            grid = polar_grid(self.domain, *intervals)
+        else:
+            grid = masked_grid(self.mask, self.domain, *intervals)
+        self.x_values, self.y_values, self.grid_x, self.grid_y = grid
+        return
+
+    # the x and y the equation is evaluated at, which broadcast to the grid
+    def sample_coordinates(self):
+        if self.grid_x is not None:
+            return self.grid_x, self.grid_y
+        return self.x_values[:, None], self.y_values[None, :]
+
+    def add_z_dimension(self):
+        """
+        evaluates the equation once over the whole grid and returns an array
+        of points in 3D space of shape (x samples, y samples, 3)
+        the points live in one contiguous float64 buffer that already has room
+        for the two base points of every row, so adding them copies nothing
+        grids that were evaluated before are loaded from the disk cache
+        """
+        self.failed_tiles = {}
+        self.evaluation_seconds = None
+        z = None
+        # the cache is keyed by the axis values of rectangular grids
+        if self.disk_cache and self.grid_x is None:
+            z = self.disk_cache.load(self.equation, self.x_values, self.y_values)
+        if z is None:
+            start = time.perf_counter()
+            z = self.evaluate_z()
+            self.evaluation_seconds = time.perf_counter() - start
+            # grids missing failed tiles are not cached, they may be retried
+            if self.disk_cache and self.grid_x is None and not self.failed_tiles:
+                self.disk_cache.save(self.equation, self.x_values, self.y_values, z)
+        return self.fill_points(z)
+
+    def fill_points(self, z):
+        """
+        puts the grid and its evaluated z values into the buffer of points.
+        the lofts, rails and meshes built from it need every point, so a grid
+        memory-mapped from the disk cache is read into the buffer in full.
+        exports read it a chunk at a time instead, see z_chunks
+        """
+        num_base_points = 2 if self.has_base else 0
+        self.points = np.empty(
+            (len(self.x_values), len(self.y_values) + num_base_points, 3))
+        surface = self.surface()
+        surface[..., 0], surface[..., 1] = self.sample_coordinates()
+        surface[..., 2] = z
+        self.min_z = np.nanmin(z) if self.failed_tiles else z.min()
+        return self.points
+
+    def evaluate_z(self):
+        """
+        evaluates the equation at every sample of the grid, from the grid
+        cache or tile by tile when they are set. polar and masked grids are
+        evaluated at once. large grids are evaluated in chunks of rows across
+        process_workers processes
+        """
+        if self.grid_x is not None:
+            z = evaluate_chunked(self.equation, self.grid_x, self.grid_y,
+                                 self.process_workers)
+        elif self.grid_cache:
+            z = self.grid_cache.evaluate(
+                self.equation, self.x_values, self.y_values)
+        elif self.tile_size:
+            tiles = self.tiles()
+            z, errors = evaluate_tiles(
+                self.equation, self.x_values, self.y_values, tiles)
+            if errors and (not self.allow_failed_tiles or len(errors) == len(tiles)):
+                raise next(iter(errors.values()))
+            self.failed_tiles = {index: str(error)
+                                 for index, error in errors.items()}
+        else:
+            z = evaluate_chunked(self.equation, self.x_values[:, None],
+                                 self.y_values[None, :], self.process_workers)
+        if not self.failed_tiles and not np.all(np.isfinite(z)):
+            raise ValueError(undefined_text(*self.sample_coordinates(), z))
+        return z
+
+    def center_points(self):
+        """
+        shift all points such that they are in the center of the xy-plane
+        """
+        x_offset, y_offset = self.center_offset()
+        surface = self.surface()
+        surface[..., 0] -= x_offset
+        surface[..., 1] -= y_offset
+        return self.points
+
+    # how far the grid is from the center of the xy-plane. a polar domain
+    # stays around the origin and a masked one is centered as the rectangle
+    # it is masked from
+    def center_offset(self):
+        if self.domain_type == "Polar":
+            return 0, 0
+        elif self.domain_type == "Mask":
+            return ((self.domain[0][0] + self.domain[0][1]) / 2,
+                    (self.domain[1][0] + self.domain[1][1]) / 2)
+        return ((self.x_values[0] + self.x_values[-1]) / 2,
+                (self.y_values[0] + self.y_values[-1]) / 2)
+
+    # interprets the base_type set by the user and returns a base_level
+    def get_base_level(self):
+        if self.base_type == "Automatic":
+            if self.min_z < -self.base_offset:
+                self.base_level = self.min_z + self.base_offset
+            else:
+                self.base_level = 0
+        elif self.base_type == "xy-plane":
+            self.base_level = self.base_offset
+        elif self.base_type == "Minimum Value":
+            self.base_level = self.min_z + self.base_offset
+        return
+
+    # takes a set of points in 3D space and adds a set of points at base_level
+    # below the last and first point of every row (in that order), in the
+    # room add_z_dimension left for them
+    def add_base_points(self):
+        num_cols = len(self.y_values)
+        self.points[:, num_cols, :2] = self.points[:, num_cols - 1, :2]
+        self.points[:, num_cols + 1, :2] = self.points[:, 0, :2]
+        self.points[:, num_cols:, 2] = self.base_level
+        return self.points
+
+    # returns the array of points outlining the solid body to be created
+    def calculate_points(self):  # noqa
+        self.make_xy_points_grid()
+        self.add_z_dimension()
+        return self.place_points()
+
+    # like calculate_points, for a grid made and evaluated elsewhere, as the
+    # shared grid of a surface_batch is. grid_x and grid_y are those of a
+    # polar or masked grid
+    def calculate_points_from(self, x_values, y_values, z, grid_x=None, grid_y=None):
+        self.x_values, self.y_values = x_values, y_values
+        self.grid_x, self.grid_y = grid_x, grid_y
+        self.failed_tiles = {}
+        self.evaluation_seconds = None
+        self.fill_points(z)
+        return self.place_points()
+
+    # centers the evaluated points and adds the base points below them
+    def place_points(self):
+        self.center_points()
+        if self.has_base:
+            self.get_base_level()
+            self.add_base_points()
+        return self.points
+
+    # the points of the surface itself, without the base points
+    def surface(self):
+        return self.points[:, :len(self.y_values)]
+
+    # whether the last row of the grid is joined to the first, as it is for a
+    # polar domain all the way around
+    def is_closed(self):
+        return self.domain_type == "Polar" and is_closed_span(self.domain)
+
+    # the points the rails go through, row by row. the rails of a closed grid
+    # go on from its last row back to its first
+    def rail_points(self):
+        if self.is_closed():
+            return np.concatenate((self.points, self.points[:1]))
+        return self.points
+
+    # the (rows, columns) slices of the tiles the grid is split into. a
+    # closed grid is one tile, as a tile can not go around the seam
+    def tiles(self):
+        return grid_tiles(len(self.x_values), len(self.y_values),
+                          0 if self.is_closed() else self.tile_size)
+
+    # returns a copy of this surface cut down to the given rows and columns,
+    # with base points of its own below the edge of the tile
+    def tile(self, rows, columns):
+        tile = copy.copy(self)
+        tile.x_values = self.x_values[rows]
+        tile.y_values = self.y_values[columns]
+        if self.grid_x is not None:
+            tile.grid_x = self.grid_x[rows, columns]
+            tile.grid_y = self.grid_y[rows, columns]
+        surface = self.surface()[rows, columns]
+        num_base_points = 2 if self.has_base else 0
+        tile.points = np.empty(
+            (surface.shape[0], surface.shape[1] + num_base_points, 3))
+        tile.surface()[...] = surface
+        if self.has_base:
+            tile.add_base_points()
+        return tile
+
+    # the tangents of the surface at every grid point along x (variable 'x')
+    # or along y (variable 'y'), as derivatives of the points with respect to
+    # that variable. where the equation's derivative is undefined the slope of
+    # the sampled points is used instead
+    def surface_tangents(self, variable):
+        axis = 0 if variable == 'x' else 1
+        values = self.x_values if axis == 0 else self.y_values
+        z = self.surface()[..., 2]
+        slope = partial_derivative(self.equation, variable,
+                                   self.x_values[:, None], self.y_values[None, :])
+        if not np.all(np.isfinite(slope)):
+            sampled_slope = np.gradient(z, values, axis=axis)
+            slope = np.where(np.isfinite(slope), slope, sampled_slope)
+        tangents = np.zeros(z.shape + (3,))
+        tangents[..., axis] = 1
+        tangents[..., 2] = slope
+        return tangents
+
+    # returns the vertices and triangles of the surface, closed into a solid
+    # when it has a base. only a rectangle's base can be fanned from its
+    # center, polar and masked ones are the grid again
+    def mesh(self):
+        base_level = self.base_level if self.has_base else None
+        return closed_grid_mesh(self.surface(), base_level, self.is_closed(),
+                                self.grid_x is None)
+
+    def prepare_export(self):
+        """
+        finds the grid and base level of a surface that is only exported. its
+        points are evaluated a chunk of rows at a time as export_file writes
+        them, so the dense grid is never in memory. a base takes a first pass
+        over the grid for the lowest and mean z, which the base level and the
+        way the solid faces depend on
+        """
+        self.make_xy_points_grid()
+        self.points = None
+        self.failed_tiles = {}
+        self.evaluation_seconds = None
+        self.mean_z = None
+        if self.has_base:
+            self.min_z, total = np.inf, 0
+            for _, _, z in self.z_chunks():
+                self.min_z = min(self.min_z, z.min())
+                total += z.sum()
+            self.mean_z = total / (len(self.x_values) * len(self.y_values))
+            self.get_base_level()
+        return
+
+    def row_chunks(self):
+        """
+        splits the rows of the grid into (start, stop) runs of about
+        export_chunk_samples samples
+        """
+        rows = max(1, export_chunk_samples // len(self.y_values))
+        return [(start, min(start + rows, len(self.x_values)))
+                for start in range(0, len(self.x_values), rows)]
+
+    def z_chunks(self):
+        """
+        yields (start, stop, z) for the chunks of rows of the grid. a grid in
+        the disk cache is read from its memory map a chunk at a time, any
+        other is evaluated a chunk at a time and stored in the disk cache
+        once all of it is
+        """
+        cached, writer = None, None
+        if self.disk_cache and self.grid_x is None:
+            cached = self.disk_cache.load(self.equation, self.x_values, self.y_values)
+            if cached is None:
+                writer = self.disk_cache.writer(self.equation, self.x_values, self.y_values)
+        try:
+            for start, stop in self.row_chunks():
+                if cached is not None:
+                    z = np.array(cached[start:stop])
+                else:
+                    z = self.evaluate_rows(start, stop)
+                    if writer:
+                        writer.z[start:stop] = z
+                yield start, stop, z
+            if writer:
+                writer.store()
+        finally:
+            if writer and writer.z is not None:
+                writer.discard()
+
+    def evaluate_rows(self, start, stop):
+        """
+        evaluates the equation on the rows start to stop of the grid
+        """
+        if self.grid_x is not None:
+            x, y = self.grid_x[start:stop], self.grid_y[start:stop]
+        else:
+            x, y = self.x_values[start:stop, None], self.y_values[None, :]
+        begin = time.perf_counter()
+        z = evaluate_chunked(self.equation, x, y, self.process_workers)
+        self.evaluation_seconds = (self.evaluation_seconds or 0) + time.perf_counter() - begin
+        if not np.all(np.isfinite(z)):
+            self.evaluate_z()  # raises, describing where in the whole grid
+        return z
+
+    # the centered rows of the surface, from its points or, when they were
+    # not calculated, evaluated a chunk at a time
+    def surface_rows(self):
+        if self.points is not None:
+            yield from self.surface()
+            return
+        x_offset, y_offset = self.center_offset()
+        for start, stop, z in self.z_chunks():
+            rows = np.empty(z.shape + (3,))
+            if self.grid_x is not None:
+                rows[..., 0] = self.grid_x[start:stop] - x_offset
+                rows[..., 1] = self.grid_y[start:stop] - y_offset
+            else:
+                rows[..., 0] = self.x_values[start:stop, None] - x_offset
+                rows[..., 1] = self.y_values[None, :] - y_offset
+            rows[..., 2] = z
+            yield from rows
+
+    # writes the surface (and base) straight to a binary STL or 3MF file,
+    # one x-slice at a time. after prepare_export, the points are evaluated
+    # as they are written as well
+    def export_file(self, path):
+        base_level = self.base_level if self.has_base else None
+        if self.points is not None:
+            flip = base_is_above(self.surface(), base_level)
+        else:
+            flip = base_level is not None and base_level > self.mean_z
+        shape = len(self.x_values), len(self.y_values)
+        mesh_options = {'closed': self.is_closed(), 'fan_base': self.grid_x is None}
+        write = write_3mf if os.path.splitext(path)[1].lower() == '.3mf' else write_binary_stl
+        try:
+            write(path, self.surface_rows(), *shape, base_level, flip, **mesh_options)
+        except:  # noqa
+            # points evaluated as they are written can fail part way through
+            if os.path.exists(path):
+                os.remove(path)
+            raise
+        return
@@ -0,0 +1,59 @@
+"""
+splitting the grid of a surface into tiles that can be evaluated and built on
+their own
+"""
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+
+from .expression import evaluate_equation
+from .scan import undefined_text
+
+
+def tile_ranges(num_intervals, tile_size):
+    """
+    splits num_intervals intervals into runs of at most tile_size intervals,
+    returned as slices of the samples. neighbouring slices share the sample
+    on their seam. a tile_size of 0 gives a single run
+    """
+    if tile_size <= 0:
+        return [slice(0, num_intervals + 1)]
+    return [slice(start, min(start + tile_size, num_intervals) + 1)
+            for start in range(0, num_intervals, tile_size)]
+
+
+def grid_tiles(num_rows, num_cols, tile_size):
+    """
+    returns the (rows, columns) slices of every tile of a grid of samples,
+    row of tiles by row of tiles
+    """
+    return [(rows, columns)
+            for rows in tile_ranges(num_rows - 1, tile_size)
+            for columns in tile_ranges(num_cols - 1, tile_size)]
+
+
+def evaluate_tile(equation, x_values, y_values):
+    z = evaluate_equation(equation, x_values[:, None], y_values[None, :])
+    if not np.all(np.isfinite(z)):
+        raise ValueError(undefined_text(x_values, y_values, z))
+    return z
+
+
+def evaluate_tiles(equation, x_values, y_values, tiles, workers=None):
+    """
+    evaluates the equation on every tile, on a pool of threads as numpy
+    releases the GIL while it works. returns the grid of z values and the
+    errors of the tiles that failed by tile index. the samples only failed
+    tiles cover are nan
+    """
+    z = np.full((len(x_values), len(y_values)), np.nan)
+    errors = {}
+    with ThreadPoolExecutor(workers) as executor:
+        futures = [executor.submit(evaluate_tile, equation,
+                                   x_values[rows], y_values[columns])
+                   for rows, columns in tiles]
+        for index, ((rows, columns), future) in enumerate(zip(tiles, futures)):
+            try:
+                z[rows, columns] = future.result()
+            except Exception as error:  # noqa
+                errors[index] = error
+    return z, errors
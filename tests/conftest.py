@@ -0,0 +1,25 @@
+import os
+import sys
+
+import pytest
+
+# the eds package and the benchmarks' stand-in for the adsk API are imported
+# from the checkout, as Fusion 360 does not install the add-in as a package
+root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, root)
+sys.path.insert(0, os.path.join(root, 'benchmarks'))
+
+import fake_adsk  # noqa: E402
+
+
+@pytest.fixture(scope='session')
+def addin():
+    """
+    the add-in, loaded against fake_adsk and started as Fusion 360 starts it.
+    builds neither read the disk cache nor write measured costs next to it
+    """
+    addin = fake_adsk.load_addin()
+    addin.register_custom_events()
+    addin.build_disk_cache = None
+    addin.build_costs.path = None
+    return addin
@@ -0,0 +1,45 @@
+import numpy as np
+import pytest
+
+from eds.batch import (evaluate_sweep, split_equations, surface_batch,
+                       sweep_equations, sweep_values)
+from eds.expression import EquationError, evaluate_equation
+from eds.surface import surface_points
+
+
+def sweep_batch(equation, values, **settings):
+    surfaces = [surface_points(swept, [[-4, 4], [-4, 4]], **settings)
+                for swept in sweep_equations(equation, 'a', values)]
+    return surface_batch(surfaces, spacing=1, sweep=(equation, 'a', values))
+
+
+def test_split_equations():
+    assert split_equations('x; y\n\n x*y ;') == ['x', 'y', 'x*y']
+
+
+def test_sweep_equals_its_equations():
+    values = sweep_values(1, 3, 3)
+    x, y = np.linspace(-1, 1, 5)[:, None], np.linspace(-1, 1, 4)[None, :]
+    z = evaluate_sweep('sin(a*x)*y - a', 'a', values, x, y)
+    for swept, swept_z in zip(sweep_equations('sin(a*x)*y - a', 'a', values), z):
+        assert np.allclose(swept_z, evaluate_equation(swept, x, y))
+
+
+def test_sweep_rejects_a_variable_as_parameter():
+    with pytest.raises(EquationError):
+        sweep_equations('x*y', 'x', [1, 2])
+
+
+def test_batch_places_surfaces_side_by_side():
+    batch = sweep_batch('a*x*y', sweep_values(1, 3, 3))
+    points = batch.calculate_points()
+    assert len(points) == 3
+    widths = [surface[..., 0].max() - surface[..., 0].min() for surface in points]
+    assert np.allclose(widths, 8)
+    assert np.isclose(points[1][..., 0].min() - points[0][..., 0].min(), 9)
+
+
+def test_undefined_sweep_names_the_value_and_region():
+    batch = sweep_batch('x**a + 2', sweep_values(-1, 1, 3))
+    with pytest.raises(ValueError, match=r'^x \*\* \(-1\.0\) \+ 2: equation is undefined .* for x = 0'):
+        batch.calculate_points()
@@ -0,0 +1,65 @@
+import json
+import os
+import struct
+import zipfile
+
+import numpy as np
+import pytest
+
+from eds.cli import main, read_jobs, run_jobs
+
+
+def write_jobs(path, jobs):
+    with open(path, 'w') as jobs_file:
+        jobs_file.write('\n'.join(json.dumps(job) for job in jobs) + '\n')
+    return str(path)
+
+
+def test_read_jsonl_and_csv(tmp_path):
+    jobs = read_jobs(write_jobs(tmp_path / 'jobs.jsonl', [
+        {'equation': 'x*y', 'num_interv_x': '5', 'has_base': 'yes'}]))
+    assert jobs[0]['num_interv_x'] == 5 and jobs[0]['has_base'] is True
+    assert jobs[0]['x_min'] == -4
+    (tmp_path / 'jobs.csv').write_text('equation,x_max,has_base\nx+y,2,\nx-y,,false\n')
+    jobs = read_jobs(str(tmp_path / 'jobs.csv'))
+    assert [job['x_max'] for job in jobs] == [2, 4]
+    assert 'has_base' not in jobs[0] and jobs[1]['has_base'] is False
+
+
+@pytest.mark.parametrize('job, message', [
+    ({'equation': 'x', 'colour': 'red'}, 'unknown job field "colour"'),
+    ({'name': 'no equation'}, 'every job needs an equation'),
+])
+def test_invalid_jobs(tmp_path, job, message):
+    with pytest.raises(ValueError, match=message):
+        read_jobs(write_jobs(tmp_path / 'jobs.jsonl', [job]))
+
+
+def test_run_jobs_writes_every_format(tmp_path):
+    jobs = [{'equation': 'x*y', 'num_interv_x': 4, 'num_interv_y': 3, 'has_base': True},
+            {'equation': 'x + y', 'num_interv_x': 4, 'num_interv_y': 3, 'format': '3mf'},
+            {'name': 'ring', 'equation': '1', 'domain_type': 'Polar', 'r_min': 1,
+             'r_max': 2, 'angle_min': 0, 'angle_max': 2 * np.pi,
+             'num_interv_x': 8, 'num_interv_y': 2, 'format': 'npz'},
+            {'equation': '1/x', 'num_interv_x': 4, 'num_interv_y': 4}]
+    jobs = read_jobs(write_jobs(tmp_path / 'jobs.jsonl', jobs))
+    summaries = run_jobs(jobs, str(tmp_path / 'out'), workers=1)
+    stl, three_mf, ring, undefined = summaries
+    with open(stl['path'], 'rb') as stl_file:
+        assert struct.unpack('<I', stl_file.read(84)[80:])[0] == stl['triangles']
+    assert stl['vertices'] == 5 * 4 and stl['error'] is None
+    assert zipfile.ZipFile(three_mf['path']).namelist()[-1] == '3D/3dmodel.model'
+    assert np.load(ring['path'])['points'].shape == (8, 3, 3)
+    assert undefined['error'].startswith('ValueError: equation is undefined')
+    assert not os.path.exists(undefined['path'])
+
+
+def test_main_reports_failed_jobs(tmp_path, capsys):
+    jobs_path = write_jobs(tmp_path / 'jobs.jsonl', [
+        {'name': 'good', 'equation': 'x', 'num_interv_x': 2, 'num_interv_y': 2},
+        {'name': 'bad', 'equation': 'x', 'format': 'obj'}])
+    assert main([jobs_path, '--output', str(tmp_path), '--workers', '1']) == 1
+    output = capsys.readouterr().out
+    assert 'good: 9 vertices, 8 triangles' in output
+    assert 'bad: failed, ValueError: unknown format "obj"' in output
+    assert '2 jobs (1 failed)' in output
@@ -0,0 +1,54 @@
+import struct
+
+import numpy as np
+import pytest
+
+import fake_adsk
+
+# what each count of build_counts is made of in the fake API
+created_kinds = {
+    'sketches': ['sketch'],
+    'curves': ['sketch line', 'sketch spline'],
+    'lofts': ['loft'],
+    'stitches': ['stitch'],
+    'mesh triangles': ['mesh triangle'],
+}
+
+polar = {'domain_type': 'Polar', 'angle_min_id': 0, 'angle_max_id': 2 * np.pi}
+
+
+@pytest.mark.parametrize('build_type', ['Loft', 'Single Loft', 'Mesh Body', 'Export File'])
+@pytest.mark.parametrize('options', [
+    {}, {'spline_id': True}, {'tile_size': 3}, {'defer_id': False},
+    {'num_interv_x': 7, 'num_interv_y': 4},
+    dict(polar), dict(polar, angle_max_id=np.pi),
+    {'domain_type': 'Mask', 'mask_id': 'x**2 + y**2 <= 12'},
+])
+@pytest.mark.parametrize('has_base', [False, True])
+def test_predicted_counts_are_created(addin, monkeypatch, tmp_path, build_type, options,
+                                      has_base):
+    monkeypatch.setattr(fake_adsk, 'save_path', str(tmp_path / 'surface.stl'))
+    built = []
+    build = addin.equation_driven_surface.build
+
+    def recorded_build(eds):
+        built.append(eds)
+        return build(eds)
+    monkeypatch.setattr(addin.equation_driven_surface, 'build', recorded_build)
+    fake_adsk.reset()
+    values = dict(fake_adsk.default_inputs, num_interv_x=6, num_interv_y=5,
+                  build_type=build_type, base_id=has_base)
+    values.update(options)
+    args = fake_adsk.CommandEventArgsStandIn(values)
+    addin.CommandExecuteHandler().notify(args)
+    assert fake_adsk.Application.get().userInterface.messages == []
+    assert not args.executeFailed
+    eds, = built
+    predicted = eds.build_counts()
+    created = {name: sum(fake_adsk.created[kind] for kind in kinds)
+               for name, kinds in created_kinds.items()}
+    created['export triangles'] = 0
+    if build_type == "Export File":
+        with open(fake_adsk.save_path, 'rb') as stl_file:
+            created['export triangles'], = struct.unpack('<I', stl_file.read(84)[80:])
+    assert created == {name: predicted[name] for name in created}
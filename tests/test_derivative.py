@@ -0,0 +1,89 @@
+import numpy as np
+import pytest
+
+from eds.derivative import NotDifferentiable, derivative_equation, partial_derivative
+from eds.expression import evaluate_equation
+from eds.spline import bezier_knots, hermite_control_points
+
+x, y = np.linspace(0.3, 1.7, 8)[:, None], np.linspace(-1.2, 0.9, 7)[None, :]
+
+
+def central_difference(equation, variable, step=1e-6):
+    if variable == 'x':
+        ahead, behind = evaluate_equation(equation, x + step, y), evaluate_equation(equation, x - step, y)
+    else:
+        ahead, behind = evaluate_equation(equation, x, y + step), evaluate_equation(equation, x, y - step)
+    return (ahead - behind) / (2 * step)
+
+
+@pytest.mark.parametrize('equation', [
+    'cos((2/3)*pow((pow(x,2)+pow(y,2)),(1/2)))+1',
+    'x**2*y - 3*x/y**2 + 7',
+    'exp(-x*y)*sin(2*x) - tan(y/2)',
+    'sqrt(x**2 + y**2) + log(x, 3) + log10(x) + log2(x) + log1p(x)',
+    'atan2(y, x) + hypot(x, 2*y) + abs(y) + fabs(x - 2)',
+    'asin(x/2) + acos(y/2) + atan(x*y) + sinh(x) + cosh(y) + tanh(x*y)',
+    'asinh(x) + acosh(x + 1) + atanh(y/2) + expm1(y) + erf(x) + erfc(y)',
+    'pow(x, y) + y**x + 2**x + x**x + radians(x) + degrees(y)',
+    '-x / (1 + y**2)',
+])
+@pytest.mark.parametrize('variable', ['x', 'y'])
+def test_symbolic_derivative_equals_central_differences(equation, variable):
+    derivative_equation(equation, variable)  # has a symbolic derivative
+    # y**x and x**y are undefined alike for the negative y
+    assert np.allclose(partial_derivative(equation, variable, x, y),
+                       central_difference(equation, variable), rtol=1e-5, atol=1e-6,
+                       equal_nan=True)
+
+
+def test_constant_terms_have_no_derivative():
+    assert derivative_equation('x**2 + sin(y)', 'x') == '(2)*((x)**((2)-1))'
+    assert derivative_equation('3 + sin(y)', 'x') == '0'
+
+
+@pytest.mark.parametrize('equation, variable', [
+    ('lgamma(x + 3) * y', 'x'), ('floor(3*x) + gamma(y + 3)', 'x'),
+    ('floor(3*x) + gamma(y + 3)', 'y'), ('log(x, y + 3)', 'y')])
+def test_finite_difference_fallback(equation, variable):
+    with pytest.raises(NotDifferentiable):
+        derivative_equation(equation, variable)
+    # floor only jumps at x = 1/3, 2/3, ..., away from the samples
+    assert np.allclose(partial_derivative(equation, variable, x, y),
+                       central_difference(equation, variable), rtol=1e-4, atol=1e-5)
+
+
+def bspline_point(control_points, knots, t, degree=3):
+    """
+    evaluates a non-rational B-spline by de Boor's algorithm
+    """
+    span = min(np.searchsorted(knots, t, side='right') - 1, len(knots) - degree - 2)
+    d = [control_points[j + span - degree].copy() for j in range(degree + 1)]
+    for r in range(1, degree + 1):
+        for j in range(degree, r - 1, -1):
+            i = j + span - degree
+            alpha = (t - knots[i]) / (knots[i + degree + 1 - r] - knots[i])
+            d[j] = (1 - alpha) * d[j - 1] + alpha * d[j]
+    return d[degree]
+
+
+def test_spline_interpolates_the_points_with_their_tangents():
+    parameters = np.array([-1.0, -0.2, 0.5, 1.5, 2.0])
+    points = np.stack([parameters, np.zeros(5), np.sin(parameters)], axis=1)
+    tangents = np.stack([np.ones(5), np.zeros(5), np.cos(parameters)], axis=1)
+    control_points = hermite_control_points(points, tangents, parameters)
+    knots = bezier_knots(parameters)
+    assert len(control_points) == 3 * (len(parameters) - 1) + 1
+    # the count Fusion 360 expects of a cubic curve
+    assert len(knots) == len(control_points) + 4
+    assert np.all(np.diff(knots) >= 0)
+    step = 1e-6
+    for parameter, point, tangent in zip(parameters, points, tangents):
+        assert np.allclose(bspline_point(control_points, knots, parameter), point)
+        inside = min(max(parameter, parameters[0] + step), parameters[-1] - step)
+        slope = (bspline_point(control_points, knots, inside + step) -
+                 bspline_point(control_points, knots, inside - step)) / (2 * step)
+        assert np.allclose(slope, tangent, atol=1e-4)
+    # and follows the function between them
+    for parameter in np.linspace(-1, 2, 31):
+        assert np.allclose(bspline_point(control_points, knots, parameter)[2],
+                           np.sin(parameter), atol=5e-3)
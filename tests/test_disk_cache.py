@@ -0,0 +1,80 @@
+import os
+
+import numpy as np
+
+from eds.disk_cache import grid_disk_cache, grid_key
+from eds.surface import surface_points
+
+x_values, y_values = np.linspace(-1, 1, 5), np.linspace(-2, 2, 4)
+
+
+def test_key_is_normalized_by_the_syntax_tree():
+    assert grid_key('x*y', x_values, y_values) == grid_key(' (x)* y ', x_values, y_values)
+    assert grid_key('x*y', x_values, y_values) != grid_key('x*y + 1', x_values, y_values)
+    assert grid_key('x*y', x_values, y_values) != grid_key('x*y', y_values, x_values)
+
+
+def test_saved_grid_is_loaded_memory_mapped(tmp_path):
+    cache = grid_disk_cache(str(tmp_path / 'cache'))
+    assert cache.load('x*y', x_values, y_values) is None
+    z = x_values[:, None] * y_values[None, :]
+    cache.save('x*y', x_values, y_values, z)
+    loaded = cache.load('x*y', x_values, y_values)
+    assert isinstance(loaded, np.memmap) and not loaded.flags.writeable
+    assert np.array_equal(loaded, z)
+
+
+def test_unreadable_or_misshapen_grid_is_not_loaded(tmp_path):
+    cache = grid_disk_cache(str(tmp_path))
+    cache.save('x', x_values, y_values, np.zeros((4, 5)))
+    assert cache.load('x', x_values, y_values) is None
+    with open(cache.path('y', x_values, y_values), 'wb') as grid_file:
+        grid_file.write(b'not a grid')
+    assert cache.load('y', x_values, y_values) is None
+
+
+def saved_grid(directory, equation):
+    cache = grid_disk_cache(str(directory))
+    cache.save(equation, x_values, y_values, np.zeros((5, 4)))
+    return cache.path(equation, x_values, y_values)
+
+
+def test_least_recently_used_grids_are_evicted(tmp_path):
+    grid_bytes = os.path.getsize(saved_grid(tmp_path, 'x'))
+    cache = grid_disk_cache(str(tmp_path), max_bytes=2 * grid_bytes)
+    os.utime(cache.path('x', x_values, y_values), (1, 1))
+    cache.save('y', x_values, y_values, np.zeros((5, 4)))
+    os.utime(cache.path('y', x_values, y_values), (2, 2))
+    cache.load('x', x_values, y_values)  # now the most recently used
+    cache.save('x + y', x_values, y_values, np.zeros((5, 4)))
+    assert cache.load('y', x_values, y_values) is None
+    assert cache.load('x', x_values, y_values) is not None
+    assert cache.load('x + y', x_values, y_values) is not None
+    cache.clear()
+    assert not os.listdir(tmp_path)
+
+
+def test_surface_loads_its_grid_from_the_cache(tmp_path):
+    def build():
+        surface = surface_points('sin(x)*y', [[-1, 1], [-2, 2]], num_interv_x=4,
+                                 num_interv_y=3)
+        surface.disk_cache = grid_disk_cache(str(tmp_path))
+        return surface, surface.calculate_points().copy()
+
+    first, first_points = build()
+    second, second_points = build()
+    assert first.evaluation_seconds is not None and second.evaluation_seconds is None
+    assert np.array_equal(first_points, second_points)
+    assert len(os.listdir(tmp_path)) == 1
+
+
+def test_grid_written_a_chunk_at_a_time(tmp_path):
+    cache = grid_disk_cache(str(tmp_path))
+    writer = cache.writer('x*y', x_values, y_values)
+    writer.z[:2] = 1
+    writer.z[2:] = 2
+    assert cache.load('x*y', x_values, y_values) is None  # not stored yet
+    writer.store()
+    assert cache.load('x*y', x_values, y_values).tolist() == [[1] * 4] * 2 + [[2] * 4] * 3
+    cache.writer('x', x_values, y_values).discard()
+    assert os.listdir(tmp_path) == [os.path.basename(cache.path('x*y', x_values, y_values))]
@@ -0,0 +1,76 @@
+import numpy as np
+import pytest
+
+from eds.edit import (can_move_points, changed_points, moved_line_ends,
+                      parameter_names, parameters_surface)
+
+parameters = {
+    'equation': 'x*y', 'domain': [[-4, 4], [-4, 4]], 'has_base': True,
+    'base_type': "Automatic", 'base_offset': -1, 'res_type': "Number of Intervals",
+    'step_size': 1, 'num_interv_x': 6, 'num_interv_y': 4, 'max_deviation': 0.05,
+    'build_type': "Loft", 'smooth_splines': False, 'tile_size': 0,
+    'defer_compute': True, 'domain_type': "Rectangle", 'mask': ''}
+
+
+def built(**changes):
+    changed = dict(parameters, **changes)
+    surface = parameters_surface(changed)
+    surface.calculate_points()
+    return changed, surface
+
+
+def test_parameters_cover_the_inputs():
+    assert sorted(parameter_names) == sorted(parameters)
+
+
+def test_parameters_stored_before_other_domains_are_a_rectangle():
+    old = {name: value for name, value in parameters.items()
+           if name not in ('domain_type', 'mask')}
+    surface = parameters_surface(old)
+    assert surface.domain_type == "Rectangle" and surface.mask == ''
+
+
+@pytest.mark.parametrize('changes, movable', [
+    ({'equation': 'x*y + 1', 'base_offset': -2}, True),
+    ({'domain': [[-3, 5], [-4, 4]]}, True),
+    ({'build_type': "Single Loft"}, False),
+    ({'smooth_splines': True}, False),
+    ({'has_base': False}, False),
+    ({'num_interv_x': 9}, False),
+    ({'tile_size': 3}, False),
+    # 11 closed rows of 7 points, as the 11 rows of the old rectangle
+    ({'num_interv_x': 11, 'domain_type': "Polar", 'domain': [[0.5, 4], [0, 2 * np.pi]]}, False),
+    ({'domain_type': "Polar", 'domain': [[0.5, 4], [0, np.pi]]}, False),
+])
+def test_can_move_points(changes, movable):
+    old_parameters, old_surface = built(num_interv_x=10)
+    new_parameters, new_surface = built(**dict({'num_interv_x': 10}, **changes))
+    assert can_move_points(old_parameters, old_surface,
+                           new_parameters, new_surface) == movable
+
+
+def test_changed_points():
+    _, old_surface = built()
+    _, new_surface = built(equation='x*y + max(x - 3, 0)')
+    changed = changed_points(old_surface.points, new_surface.points)
+    assert changed.shape == (7, 7)
+    # only the last row, at x = 4, moves. the base level stays at the lowest
+    # point, so the base points do not
+    assert changed[-1, :5].all() and not changed[:-1].any() and not changed[:, 5:].any()
+    assert changed_points(old_surface.points, old_surface.points + 1e-12).sum() == 0
+
+
+def test_moved_line_ends():
+    changed = np.array([True, False, True, False])
+    assert moved_line_ends(changed, False) == [(0, 0, 0), (2, 0, 2), (1, 1, 2)]
+    assert moved_line_ends(changed, True) == [(0, 0, 0), (3, 1, 0), (2, 0, 2), (1, 1, 2)]
+    assert moved_line_ends(np.array([False, False, True]), False) == [(1, 1, 2)]
+
+
+def test_closed_polar_grid_is_not_moved_into_from_a_rectangle():
+    old_parameters, old_surface = built(num_interv_x=10)
+    new_parameters, new_surface = built(num_interv_x=11, domain_type="Polar",
+                                        domain=[[0.5, 4], [0, 2 * np.pi]])
+    assert new_surface.is_closed()
+    assert new_surface.points.shape == old_surface.points.shape
+    assert not can_move_points(old_parameters, old_surface, new_parameters, new_surface)
@@ -0,0 +1,117 @@
+import ast
+import random
+
+import numpy as np
+import pytest
+
+from eds.codegen import separate_functions
+from eds.expression import (EquationError, compile_equation, evaluate_equation,
+                            numpy_namespace, parse_equation)
+
+
+def random_equation(rng, depth):
+    if depth == 0 or rng.random() < 0.2:
+        return rng.choice(['x', 'y', 'x', 'y', str(rng.randint(1, 3)), 'pi'])
+    kind = rng.random()
+    if kind < 0.45:
+        return '{}({})'.format(rng.choice(['sin', 'cos', 'exp', 'sin', 'cos', 'exp', 'sqrt']),
+                               random_equation(rng, depth - 1))
+    if kind < 0.55:
+        return '-({})'.format(random_equation(rng, depth - 1))
+    return '({} {} {})'.format(random_equation(rng, depth - 1), rng.choice('+-+-*'),
+                               random_equation(rng, depth - 1))
+
+
+def plain_z(equation, x, y):
+    code = compile(parse_equation(equation), '<equation>', 'eval')
+    with np.errstate(all='ignore'):
+        z = eval(code, numpy_namespace, {'x': x, 'y': y})
+    return np.broadcast_to(z, np.broadcast(x, y).shape)
+
+
+def is_separated(equation):
+    tree = parse_equation(equation)
+    return ast.dump(separate_functions().visit(tree)) != ast.dump(parse_equation(equation))
+
+
+@pytest.mark.parametrize('seed', range(300))
+def test_separated_equals_plain(seed):
+    rng = random.Random(seed)
+    equation = random_equation(rng, 4)
+    x, y = np.linspace(-3, 3, 13)[:, None], np.linspace(-2, 2, 9)[None, :]
+    z, expected = evaluate_equation(equation, x, y), plain_z(equation, x, y)
+    assert z.shape == expected.shape
+    assert np.array_equal(np.isfinite(z), np.isfinite(expected)), equation
+    finite = np.isfinite(expected)
+    assert np.allclose(z[finite], expected[finite], rtol=1e-9, atol=1e-9), equation
+
+
+def test_fuzzed_equations_are_separated():
+    equations = [random_equation(random.Random(seed), 4) for seed in range(300)]
+    assert sum(map(is_separated, equations)) > 20
+
+
+@pytest.mark.parametrize('equation, separated', [
+    ('sin(x + y)', True),
+    ('cos(2*x - 3*y + 1)', True),
+    ('exp(-x**2 - y**2)', True),
+    ('sin(x)*cos(y)', False),
+    ('sin(x*y)', False),
+    ('sin(x + y + x*y)', False),
+    ('sin(x + 1)', False),
+    ('log(x + y)', False),
+])
+def test_separated_forms(equation, separated):
+    assert is_separated(equation) == separated
+
+
+def test_split_exp_overflow_falls_back_to_the_equation():
+    assert is_separated('exp(x - y) + 1')
+    # exp(x) and exp(-y) overflow to inf and 0 at x = y = 800, exp(x - y) is
+    # 1, and exp(800 - 1) overflows either way
+    x, y = np.array([[800.0], [1.0]]), np.array([[800.0, 1.0]])
+    z = evaluate_equation('exp(x - y) + 1', x, y)
+    assert z[0, 0] == z[1, 1] == 2
+    assert np.isposinf(z[0, 1]) and z[1, 0] == 1
+
+
+def test_undefined_samples_stay_undefined():
+    x, y = np.linspace(-1, 1, 5)[:, None], np.linspace(-1, 1, 5)[None, :]
+    z = evaluate_equation('exp(x + y) / x', x, y)
+    assert not np.any(np.isfinite(z[2])) and np.all(np.isfinite(np.delete(z, 2, 0)))
+
+
+def test_scalar_points():
+    assert np.isclose(compile_equation('sin(x + y)')(0.5, 0.25), np.sin(0.75))
+
+
+def test_invalid_equation():
+    with pytest.raises(EquationError):
+        parse_equation('sin(x +')
+    with pytest.raises(EquationError):
+        parse_equation('__import__("os")')
+
+
+def test_pow_of_integers_is_a_float():
+    assert np.allclose(evaluate_equation('pow(2, -1)*x', np.array([[4.0]]), np.array([[1.0]])), 2)
+
+
+@pytest.mark.parametrize('equation, expected', [
+    ('min(x, y, 0)', [[-1, -1], [0, 0]]),
+    ('max(x, y, 0.5, -x)', [[1, 2], [1, 2]]),
+    ('hypot(x, y, 1)', [[np.sqrt(3), np.sqrt(6)], [np.sqrt(3), np.sqrt(6)]]),
+    ('cbrt(8*x) + exp2(y)', [[0, 2], [4, 6]]),
+    ('remainder(5*y, 3)', [[-1, 1], [-1, 1]]),
+    ('isnan(x) + isfinite(y) + isclose(x, y)', [[1, 1], [2, 1]]),
+    ('factorial(3) + comb(4, 2)*x + gcd(12, 8)', [[4, 4], [16, 16]]),
+    ('log(8, 2*y) + log(exp(x))', [[2, 0.5], [4, 2.5]]),
+])
+def test_math_functions_work_on_grids(equation, expected):
+    x, y = np.array([[-1.0], [1.0]]), np.array([[1.0, 2.0]])
+    assert np.allclose(evaluate_equation(equation, x, y), expected)
+
+
+@pytest.mark.parametrize('equation', ['fsum(x)', 'frexp(x)', 'dist(x, y)'])
+def test_sequence_functions_are_rejected(equation):
+    with pytest.raises(EquationError, match='sequence'):
+        parse_equation(equation)
@@ -0,0 +1,86 @@
+import numpy as np
+import pytest
+
+from eds import grid
+from eds.expression import evaluate_equation
+from eds.grid import adaptive_axis_values, evaluated_grid_cache, matching_indices
+
+
+def spacing_at(values, value):
+    """
+    the length of the shortest interval next to value
+    """
+    index = np.searchsorted(values, value)
+    return np.diff(values)[max(index - 1, 0):index + 1].min()
+
+
+def test_samples_are_denser_near_the_tip_of_a_cone():
+    domain = [[-4, 4], [-4, 4]]
+    x_values, y_values = adaptive_axis_values('sqrt((x - 1)**2 + (y + 2)**2)', domain, 0.01)
+    for values, tip, far in [(x_values, 1, -4), (y_values, -2, 4)]:
+        assert values[0] == -4 and values[-1] == 4
+        assert np.all(np.diff(values) > 0)
+        assert tip in values
+        assert spacing_at(values, tip) <= spacing_at(values, far) / 4
+
+
+def test_flat_surface_keeps_the_initial_samples():
+    x_values, y_values = adaptive_axis_values('2*x - y + 1', [[-3, 5], [0.5, 1]], 0.01)
+    assert np.allclose(x_values, np.linspace(-3, 5, 9))
+    assert np.allclose(y_values, np.linspace(0.5, 1, 9))
+
+
+@pytest.mark.parametrize('max_intervals', [10, 13])
+def test_intervals_stop_at_the_limit_with_the_endpoints_kept(max_intervals):
+    domain = [[-1.5, 2.5], [-2, 3]]
+    x_values, y_values = adaptive_axis_values('sqrt(x**2 + y**2)', domain, 1e-9,
+                                              max_intervals=max_intervals)
+    for values, (start, stop) in zip([x_values, y_values], domain):
+        assert len(values) == max_intervals + 1
+        assert values[0] == start and values[-1] == stop
+
+
+def test_matching_indices():
+    old_indices, new_indices = matching_indices(np.linspace(-4, 4, 9),
+                                                np.linspace(-3, 5, 9) + 1e-12)
+    assert old_indices.tolist() == list(range(1, 9))
+    assert new_indices.tolist() == list(range(8))
+
+
+@pytest.fixture
+def evaluated_samples(monkeypatch):
+    """
+    the number of samples each evaluation of the grid module computes
+    """
+    samples = []
+
+    def counted(equation, x, y):
+        samples.append(np.broadcast(x, y).size)
+        return evaluate_equation(equation, x, y)
+    monkeypatch.setattr(grid, 'evaluate_equation', counted)
+    return samples
+
+
+def test_panned_and_resized_grids_reuse_the_cached_samples(evaluated_samples):
+    equation = 'sin(x)*cos(y) + x*y'
+    cache = evaluated_grid_cache()
+
+    def check(x_values, y_values):
+        z = cache.evaluate(equation, x_values, y_values)
+        assert np.allclose(z, evaluate_equation(equation, x_values[:, None], y_values[None, :]))
+        evaluated = sum(evaluated_samples)
+        evaluated_samples.clear()
+        return evaluated
+
+    assert check(np.linspace(-4, 4, 9), np.linspace(-4, 4, 9)) == 81
+    # panned by one step in x: only the new row
+    assert check(np.linspace(-3, 5, 9), np.linspace(-4, 4, 9)) == 9
+    # and back in x and y: the old row, a new column of the rows left
+    assert check(np.linspace(-4, 4, 9), np.linspace(-5, 3, 9)) == 9 + 8
+    # grown by two steps in y and shrunk in x: only the new columns
+    assert check(np.linspace(-3, 3, 7), np.linspace(-5, 5, 11)) == 7 * 2
+    # halving the step keeps every other sample
+    assert check(np.linspace(-3, 3, 13), np.linspace(-5, 5, 11)) == 6 * 11
+    # another equation evaluates the whole grid
+    assert cache.evaluate('x + y', np.linspace(-3, 3, 13), np.linspace(-5, 5, 11))[0, 0] == -8
+    assert sum(evaluated_samples) == 13 * 11
@@ -0,0 +1,118 @@
+import itertools
+import json
+
+import pytest
+
+from eds import instrument
+from eds.instrument import build_recorder
+
+
+class api():
+    def add(self, value):
+        return value + 1
+
+    @staticmethod
+    def create(value):
+        return [value]
+
+    @classmethod
+    def cast(cls, value):
+        return cls
+
+    @property
+    def count(self):
+        return 1
+
+
+class derived_api(api):
+    pass
+
+
+class surface():
+    def calculate_points(self):
+        return self.make_rails() + 1
+
+    def make_rails(self):
+        return 1
+
+
+def test_methods_are_wrapped_and_restored():
+    originals = {name: api.__dict__[name] for name in ['add', 'create', 'cast', 'count']}
+    recorder = build_recorder()
+    recorder.start()
+    recorder.count_calls(api, ['add', 'create', 'cast', 'count', 'missing'])
+    recorder.count_calls(derived_api, ['add'])
+    recorder.count_calls(api, ['add'])  # wrapped twice
+    assert isinstance(api.__dict__['create'], staticmethod)
+    assert isinstance(api.__dict__['cast'], classmethod)
+    assert api().add(1) == 2 and api.create(3) == [3] and api.cast(0) is api
+    assert derived_api().add(2) == 3 and derived_api.cast(0) is derived_api
+    assert api().count == 1
+    recorder.stop()
+    assert recorder.api_calls == {'api.add': 3, 'api.create': 1, 'api.cast': 2,
+                                  'derived_api.add': 1}
+    assert {name: api.__dict__[name] for name in originals} == originals
+    assert 'add' not in derived_api.__dict__ and not hasattr(api, 'missing')
+    assert api().add(1) == 2 and recorder.api_calls['api.add'] == 3
+
+
+def test_phases_are_timed_on_every_instance(monkeypatch):
+    clock = itertools.count()
+    monkeypatch.setattr(instrument.time, 'perf_counter', lambda: next(clock))
+    recorder = build_recorder()
+    recorder.start()
+    recorder.time_methods(surface, ['calculate_points', 'make_rails'])
+    assert surface().calculate_points() == 2 and surface().make_rails() == 1
+    recorder.stop()
+    assert recorder.phase_calls == {'calculate_points': 1, 'make_rails': 2}
+    # calculate_points includes the make_rails it calls
+    assert recorder.phase_seconds == {'calculate_points': 3, 'make_rails': 2}
+    assert not hasattr(surface.__dict__['make_rails'], '__wrapped__')
+
+
+def recorded(profile=False):
+    recorder = build_recorder(profile)
+    recorder.start()
+    recorder.count_calls(api, ['add', 'create'])
+    recorder.time_methods(surface, ['calculate_points'])
+    for value in range(5):
+        api().add(value)
+    api.create(0)
+    surface().calculate_points()
+    recorder.memory('points', 2400)
+    recorder.memory('points', 1200)
+    recorder.stop()
+    return recorder
+
+
+@pytest.mark.parametrize('profile', [False, True])
+def test_records_are_appended_as_json_lines(tmp_path, profile):
+    path = str(tmp_path / 'builds.jsonl')
+    recorded(profile).write(path, {'equation': 'x*y'})
+    recorded(profile).write(path, {'equation': 'x + y'})
+    with open(path) as log_file:
+        records = [json.loads(line) for line in log_file]
+    assert [record['equation'] for record in records] == ['x*y', 'x + y']
+    record = records[0]
+    assert record['api calls'] == {'api.add': 5, 'api.create': 1}
+    assert record['phases']['calculate_points']['calls'] == 1
+    assert record['peak bytes'] == {'points': 2400}
+    assert record['traced peak bytes'] > 0 and record['seconds'] >= 0
+    assert ('profile' in record) == profile
+    if profile:
+        assert (tmp_path / record['profile path'].split('/')[-1]).exists()
+        assert len(record['profile']) <= 20
+
+
+def test_write_to_a_missing_directory_still_returns_the_record(tmp_path):
+    record = recorded().write(str(tmp_path / 'missing' / 'builds.jsonl'))
+    assert record['api calls']['api.add'] == 5
+
+
+def test_summary():
+    recorder = recorded()
+    lines = recorder.summary().split('\n')
+    assert lines[0].startswith('Recorded build: ')
+    assert lines[1].startswith('Slowest: calculate_points ')
+    assert lines[2] == '6 API calls, most: api.add 5, api.create 1'
+    assert lines[3].startswith('Memory: points 2 kB, peak traced ')
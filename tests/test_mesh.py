@@ -0,0 +1,196 @@
+import filecmp
+import os
+import re
+import zipfile
+from math import pi
+
+import numpy as np
+import pytest
+
+import eds.surface
+from eds.disk_cache import grid_disk_cache
+from eds.mesh import (closed_grid_mesh, count_mesh_triangles, decimate_grid,
+                      grid_triangle_indices)
+from eds.region import polar_grid
+from eds.surface import surface_points
+
+
+def solid_surfaces():
+    return {
+        'rectangle': surface_points('x*y/8 + 2', [[-4, 4], [-3, 3]], has_base=True,
+                                    num_interv_x=12, num_interv_y=9),
+        'annulus': surface_points('sin(x) + y/4', [[1, 4], [0, 2 * pi]], has_base=True,
+                                  domain_type="Polar", num_interv_x=24, num_interv_y=6),
+        'sector': surface_points('x - y', [[0.5, 3], [0, pi]], has_base=True,
+                                 domain_type="Polar", num_interv_x=12, num_interv_y=5),
+        'concave mask': surface_points('cos(x) + 4', [[-2, 2], [-3, 3]], has_base=True,
+                                       domain_type="Mask", mask='y < x**2',
+                                       num_interv_x=16, num_interv_y=8),
+        'base above': surface_points('x**2 + y**2', [[-2, 2], [-2, 2]], has_base=True,
+                                     domain_type="Mask", mask='x**2 + y**2 < 4',
+                                     base_type="xy-plane", base_offset=10,
+                                     num_interv_x=10, num_interv_y=10),
+    }
+
+
+def indexed(vertices, triangles):
+    """
+    merges vertices at the same place, as a slicer reading an STL does
+    """
+    unique, inverse = np.unique(np.round(vertices, 5), axis=0, return_inverse=True)
+    return unique, inverse.ravel()[triangles]
+
+
+def projected_areas(corners):
+    """
+    the signed areas of triangles seen from above, positive counterclockwise
+    """
+    first, second = corners[:, 1] - corners[:, 0], corners[:, 2] - corners[:, 0]
+    return (first[:, 0] * second[:, 1] - first[:, 1] * second[:, 0]) / 2
+
+
+def check_solid(vertices, triangles, base_level):
+    """
+    checks that the mesh is a watertight solid facing outwards whose bottom
+    covers the surface exactly, without triangles that overlap
+    """
+    edges = np.concatenate([triangles[:, [i, (i + 1) % 3]] for i in range(3)])
+    directed = set(map(tuple, edges.tolist()))
+    assert len(directed) == len(edges), 'an edge is used twice the same way'
+    assert all((end, start) in directed for start, end in directed), 'the mesh has a hole'
+
+    corners = vertices[triangles]
+    areas = projected_areas(corners)
+    is_bottom = np.all(np.isclose(corners[..., 2], base_level), axis=1)
+    # the bottom faces away from the surface and covers it once: its
+    # triangles all face the same way and have the area of the surface
+    bottom_sign = -1 if base_level < corners[~is_bottom][..., 2].mean() else 1
+    assert np.all(areas[is_bottom] * bottom_sign > -1e-12)
+    heights = corners[..., 2].mean(axis=1) - base_level
+    volume = np.einsum('ij,ij->i', corners[:, 0], np.cross(corners[:, 1], corners[:, 2])).sum() / 6
+    return volume, np.abs(areas[is_bottom]).sum(), heights
+
+
+@pytest.mark.parametrize('name', list(solid_surfaces()))
+def test_closed_grid_mesh_is_a_watertight_solid(name):
+    surface = solid_surfaces()[name]
+    surface.calculate_points()
+    vertices, triangles = surface.mesh()
+    assert len(triangles) == count_mesh_triangles(
+        *surface.surface().shape[:2], True, surface.is_closed(), surface.grid_x is None)
+    volume, bottom_area, _ = check_solid(vertices, triangles, surface.base_level)
+    top = surface.surface()
+    top_vertices, top_triangles = closed_grid_mesh(top, None, surface.is_closed())
+    corners = top_vertices[top_triangles]
+    top_areas = projected_areas(corners)
+    assert np.all(top_areas > -1e-12), 'the surface folds over itself'
+    assert np.isclose(bottom_area, top_areas.sum())
+    # a solid with a flat bottom and upright walls holds the prisms below
+    # the triangles of its surface
+    prisms = (top_areas * (corners[..., 2].mean(axis=1) - surface.base_level)).sum()
+    assert np.isclose(abs(volume), abs(prisms))
+    assert volume > 0
+
+
+def read_stl(path):
+    data = np.fromfile(path, dtype=np.uint8)
+    count = int(data[80:84].view('<u4')[0])
+    records = np.frombuffer(data[84:].tobytes(), dtype=np.dtype([
+        ('normal', '<f4', (3,)), ('vertices', '<f4', (3, 3)), ('attribute', '<u2')]))
+    assert len(records) == count
+    return records['vertices'].astype(float) / 10
+
+
+def read_3mf(path):
+    with zipfile.ZipFile(path) as archive:
+        model = archive.read('3D/3dmodel.model').decode()
+    vertices = np.array(re.findall(r'<vertex x="([^"]+)" y="([^"]+)" z="([^"]+)"', model),
+                        dtype=float)
+    triangles = np.array(re.findall(r'<triangle v1="(\d+)" v2="(\d+)" v3="(\d+)"', model),
+                         dtype=int)
+    return vertices, triangles
+
+
+@pytest.mark.parametrize('name', list(solid_surfaces()))
+def test_exported_files_are_watertight_solids(name, tmp_path):
+    surface = solid_surfaces()[name]
+    surface.calculate_points()
+    expected_volume = check_solid(*surface.mesh(), surface.base_level)[0]
+
+    surface.export_file(str(tmp_path / 'surface.stl'))
+    corners = read_stl(tmp_path / 'surface.stl')
+    vertices, triangles = indexed(corners.reshape(-1, 3), np.arange(3 * len(corners)).reshape(-1, 3))
+    volume = check_solid(vertices, triangles, np.round(np.float32(surface.base_level * 10) / 10, 5))[0]
+    assert np.isclose(volume, expected_volume, rtol=1e-4)
+
+    surface.export_file(str(tmp_path / 'surface.3mf'))
+    vertices, triangles = read_3mf(tmp_path / 'surface.3mf')
+    volume = check_solid(vertices, triangles, surface.base_level)[0]
+    assert np.isclose(volume, expected_volume, rtol=1e-5)
+
+
+@pytest.mark.parametrize('name', list(solid_surfaces()) + ['no base'])
+@pytest.mark.parametrize('extension', ['stl', '3mf'])
+def test_export_evaluated_as_it_is_written_equals_export_of_the_points(
+        name, extension, tmp_path, monkeypatch):
+    monkeypatch.setattr(eds.surface, 'export_chunk_samples', 40)
+    surfaces = [solid_surfaces().get(name) or surface_points(
+        'x*y', [[-1, 1], [-1, 1]], num_interv_x=9, num_interv_y=7) for _ in range(2)]
+    surfaces[0].calculate_points()
+    surfaces[0].export_file(str(tmp_path / ('points.' + extension)))
+    surfaces[1].prepare_export()
+    assert surfaces[1].points is None and surfaces[1].base_level == surfaces[0].base_level
+    surfaces[1].export_file(str(tmp_path / ('streamed.' + extension)))
+    if extension == 'stl':
+        assert filecmp.cmp(tmp_path / 'points.stl', tmp_path / 'streamed.stl', shallow=False)
+    else:
+        assert read_3mf(tmp_path / 'points.3mf')[0].tolist() == \
+            read_3mf(tmp_path / 'streamed.3mf')[0].tolist()
+        assert np.array_equal(read_3mf(tmp_path / 'points.3mf')[1],
+                              read_3mf(tmp_path / 'streamed.3mf')[1])
+
+
+def test_streamed_export_is_stored_in_and_read_from_the_disk_cache(tmp_path, monkeypatch):
+    monkeypatch.setattr(eds.surface, 'export_chunk_samples', 40)
+    surfaces = [surface_points('x*y', [[-1, 1], [-1, 1]], has_base=True,
+                               num_interv_x=9, num_interv_y=7) for _ in range(2)]
+    for index, surface in enumerate(surfaces):
+        surface.disk_cache = grid_disk_cache(str(tmp_path / 'cache'))
+        surface.prepare_export()
+        surface.export_file(str(tmp_path / '{}.stl'.format(index)))
+    assert surfaces[0].evaluation_seconds is not None and surfaces[1].evaluation_seconds is None
+    assert filecmp.cmp(tmp_path / '0.stl', tmp_path / '1.stl', shallow=False)
+    assert [name[-4:] for name in os.listdir(tmp_path / 'cache')] == ['.npy']
+
+
+def test_failed_streamed_export_leaves_no_file(tmp_path, monkeypatch):
+    monkeypatch.setattr(eds.surface, 'export_chunk_samples', 40)
+    surface = surface_points('1/(x - 0.75)', [[-1, 1], [-1, 1]], num_interv_x=8,
+                             num_interv_y=7)
+    surface.disk_cache = grid_disk_cache(str(tmp_path / 'cache'))
+    surface.prepare_export()
+    with pytest.raises(ValueError, match='undefined at 8 of 72 samples'):
+        surface.export_file(str(tmp_path / 'surface.stl'))
+    assert not os.path.exists(tmp_path / 'surface.stl')
+    assert os.listdir(tmp_path / 'cache') == []
+
+
+def test_full_turn_polar_grid_has_no_seam_row():
+    angles, radii, grid_x, grid_y = polar_grid([[1, 2], [0, 2 * pi]], 8, 4)
+    assert len(angles) == 8 and grid_x.shape == (8, 5)
+    assert not np.isclose(angles[-1], 2 * pi)
+    assert len(polar_grid([[1, 2], [0, pi]], 8, 4)[0]) == 9
+
+
+def test_closed_grid_triangles_join_the_last_row_to_the_first():
+    triangles = grid_triangle_indices(4, 3, closed=True).reshape(-1, 3)
+    assert len(triangles) == 2 * 4 * 2
+    assert {9, 0} <= set(triangles[-4:].ravel())
+
+
+def test_decimate_grid_keeps_the_edges():
+    points = np.arange(101 * 51 * 3, dtype=float).reshape(101, 51, 3)
+    decimated = decimate_grid(points, 500)
+    assert decimated.shape[0] * decimated.shape[1] <= 600
+    assert np.array_equal(decimated[-1, -1], points[-1, -1])
+    assert np.array_equal(decimated[0, 0], points[0, 0])
@@ -0,0 +1,54 @@
+import numpy as np
+import pytest
+
+from eds import pool
+from eds.expression import evaluate_equation
+
+equation = 'sin(x*y) + sqrt(x**2 + y**2)'
+
+
+@pytest.mark.parametrize('num_rows, num_chunks', [(10, 3), (3, 8), (100, 16), (1, 4)])
+def test_row_chunks_cover_the_rows(num_rows, num_chunks):
+    chunks = pool.row_chunks(num_rows, num_chunks)
+    assert len(chunks) == min(num_rows, num_chunks)
+    assert chunks[0][0] == 0 and chunks[-1][1] == num_rows
+    assert all(stop == start for (_, stop), (start, _) in zip(chunks, chunks[1:]))
+    lengths = [stop - start for start, stop in chunks]
+    assert min(lengths) >= 1 and max(lengths) - min(lengths) <= 1
+
+
+def test_small_grids_are_evaluated_in_this_process(monkeypatch):
+    monkeypatch.setattr(pool, 'evaluate_pool', None)  # fails if called
+    monkeypatch.setattr(pool.os, 'cpu_count', lambda: 8)
+    x, y = np.linspace(-1, 1, 100)[:, None], np.linspace(-1, 1, 100)[None, :]
+    assert np.array_equal(pool.evaluate_chunked(equation, x, y, workers=4),
+                          evaluate_equation(equation, x, y))
+
+
+def test_fast_grids_are_evaluated_in_this_process(monkeypatch):
+    monkeypatch.setattr(pool, 'evaluate_pool', None)
+    monkeypatch.setattr(pool.os, 'cpu_count', lambda: 8)
+    monkeypatch.setattr(pool, 'min_pool_seconds', 1e9)
+    x, y = np.linspace(-1, 1, 400)[:, None], np.linspace(-2, 2, 300)[None, :]
+    assert np.array_equal(pool.evaluate_chunked(equation, x, y, workers=4),
+                          evaluate_equation(equation, x, y))
+
+
+@pytest.mark.parametrize('shapes', [((400, 1), (1, 300)), ((400, 300), (400, 300)),
+                                    ((400, 1), (400, 300))])
+def test_pool_equals_one_process(monkeypatch, shapes):
+    monkeypatch.setattr(pool.os, 'cpu_count', lambda: 2)
+    monkeypatch.setattr(pool, 'min_pool_seconds', 0)
+    rng = np.random.default_rng(0)
+    x, y = rng.uniform(-3, 3, shapes[0]), rng.uniform(-3, 3, shapes[1])
+    assert np.array_equal(pool.evaluate_chunked(equation, x, y, workers=2),
+                          evaluate_equation(equation, x, y))
+
+
+def test_pool_errors_are_raised(monkeypatch):
+    monkeypatch.setattr(pool.os, 'cpu_count', lambda: 2)
+    monkeypatch.setattr(pool, 'min_pool_seconds', 0)
+    x, y = np.linspace(-1, 1, 400)[:, None], np.linspace(-1, 1, 300)[None, :]
+    first_z = evaluate_equation('x*y', x[:100], y)
+    with pytest.raises(ValueError):
+        pool.evaluate_pool('x*y + undefined_name', x, y, first_z, [(100, 400)], 2)
@@ -0,0 +1,167 @@
+import time
+
+import numpy as np
+import pytest
+
+import fake_adsk
+
+
+@pytest.fixture(autouse=True)
+def fresh_design(addin):
+    fake_adsk.reset()
+    addin.preview.cancel()
+    yield
+    addin.preview.cancel()
+    addin.remove_preview_graphics()
+
+
+def graphics_groups():
+    return fake_adsk.Application.get().activeProduct.rootComponent.customGraphicsGroups
+
+
+def surface_input(intervals, has_base=False, domain_type="Rectangle",
+                  domain=((-4, 4), (-4, 4))):
+    return ['x**2 - y', [list(domain[0]), list(domain[1])], has_base, "Automatic",
+            -1, "Number of Intervals", 1, intervals, intervals, None, 0.05, "Loft",
+            False, 0, True, domain_type, '']
+
+
+def plotted(addin, eds_input, max_vertices=None):
+    eds = addin.equation_driven_surface(eds_input)
+    eds.calculate_points()
+    fake_adsk.calls.clear()
+    graphics = eds.plot_points(max_vertices or addin.default_preview_vertices)
+    return eds, graphics
+
+
+def mesh_of(graphics):
+    (coordinates, indices), = graphics.meshes
+    return np.reshape(coordinates, (-1, 3)), np.reshape(indices, (-1, 3))
+
+
+def test_plot_points_draws_one_mesh(addin):
+    eds, graphics = plotted(addin, surface_input(10))
+    vertices, triangles = mesh_of(graphics)
+    assert len(vertices) == 11 * 11 and len(triangles) == 2 * 10 * 10
+    assert np.array_equal(vertices, eds.surface().reshape(-1, 3))
+    assert graphics.lines == []
+    assert fake_adsk.calls == {'CustomGraphicsGroups.add': 1,
+                               'CustomGraphicsCoordinates.create': 1,
+                               'CustomGraphicsGroup.addMesh': 1}
+
+
+def test_plot_points_outlines_the_base(addin):
+    eds, graphics = plotted(addin, surface_input(10, has_base=True))
+    assert len(mesh_of(graphics)[0]) == 11 * 11
+    (coordinates, strip_lengths), = graphics.lines
+    outline = np.reshape(coordinates, (-1, 4, 3))
+    assert strip_lengths == [4] * 11
+    assert np.all(outline[:, 1:3, 2] == eds.base_level)
+    assert np.array_equal(outline[:, 0], eds.surface()[:, -1])
+    assert np.array_equal(outline[:, 3], eds.surface()[:, 0])
+    assert fake_adsk.calls['CustomGraphicsGroup.addLines'] == 1
+
+
+def test_plot_points_decimates_dense_grids(addin):
+    eds, graphics = plotted(addin, surface_input(200, has_base=True), max_vertices=1000)
+    vertices, triangles = mesh_of(graphics)
+    # every 7th of 201 rows and columns, and the last
+    assert len(vertices) == 30 * 30 and len(triangles) == 2 * 29 * 29
+    grid = vertices.reshape(30, 30, 3)
+    surface = eds.surface()
+    for corner in [(0, 0), (0, -1), (-1, 0), (-1, -1)]:
+        assert np.array_equal(grid[corner], surface[corner])
+    (_, strip_lengths), = graphics.lines
+    assert len(strip_lengths) == 30
+
+
+def test_plot_points_closes_a_polar_grid(addin):
+    eds, graphics = plotted(addin, surface_input(8, domain_type="Polar",
+                                          domain=((1, 4), (0, 2 * np.pi))))
+    vertices, triangles = mesh_of(graphics)
+    assert len(vertices) == 8 * 9 and len(triangles) == 2 * 8 * 8
+    assert triangles.max() == len(vertices) - 1
+
+
+def preview_values(**values):
+    return dict(fake_adsk.default_inputs, preview_status='', **values)
+
+
+def run_preview(addin, **values):
+    args = fake_adsk.CommandEventArgsStandIn(preview_values(**values))
+    addin.CommandExecutePreviewHandler().notify(args)
+    return args.command.commandInputs.itemById('preview_status')
+
+
+def wait_for(condition, timeout=10):
+    end = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < end, 'timed out'
+        time.sleep(0.01)
+
+
+def drawn_vertices():
+    valid = [group for group in graphics_groups() if group.isValid]
+    assert len(valid) == 1
+    return len(mesh_of(valid[0])[0])
+
+
+def test_small_grid_is_previewed_at_once(addin, monkeypatch):
+    monkeypatch.setattr(addin, 'preview_delay', 0)
+    status = run_preview(addin, num_interv_x=20, num_interv_y=10)
+    assert status.formattedText.startswith('Preview: 21 x 11 points<br>')
+    assert drawn_vertices() == 21 * 11
+    assert addin.preview.timer is None or not addin.preview.timer.is_alive()
+    assert fake_adsk.calls['Application.fireCustomEvent'] == 0
+
+
+def test_dense_grid_is_previewed_coarse_then_refined(addin, monkeypatch):
+    monkeypatch.setattr(addin, 'preview_delay', 0.05)
+    status = run_preview(addin, num_interv_x=100, num_interv_y=60)
+    coarse = addin.coarse_preview_intervals + 1
+    assert status.formattedText.startswith(
+        'Preview: {0} x {0} points, refining...'.format(coarse))
+    assert drawn_vertices() == coarse * coarse
+    wait_for(lambda: 'refining' not in status.formattedText)
+    assert status.formattedText.startswith('Preview: 101 x 61 points<br>')
+    # the full grid has 6161 vertices, under the default limit
+    assert drawn_vertices() == 101 * 61
+    assert len(graphics_groups()) == 2
+    assert fake_adsk.calls['CustomGraphicsGroup.deleteMe'] == 1
+    assert fake_adsk.calls['Application.fireCustomEvent'] == 1
+
+
+def test_refined_preview_is_decimated(addin, monkeypatch):
+    monkeypatch.setattr(addin, 'preview_delay', 0.05)
+    status = run_preview(addin, num_interv_x=300, num_interv_y=300, preview_vertices=2000)
+    wait_for(lambda: 'refining' not in status.formattedText)
+    assert status.formattedText.startswith('Preview: 301 x 301 points')
+    # every 7th of 301 rows and columns
+    assert drawn_vertices() == 44 * 44
+
+
+def test_burst_of_changes_refines_the_last_only(addin, monkeypatch):
+    monkeypatch.setattr(addin, 'preview_delay', 0.2)
+    for intervals in range(40, 50):
+        status = run_preview(addin, num_interv_x=intervals, num_interv_y=intervals)
+    wait_for(lambda: 'refining' not in status.formattedText)
+    time.sleep(0.3)  # any other refinement would have been drawn by now
+    assert status.formattedText.startswith('Preview: 50 x 50 points')
+    assert drawn_vertices() == 50 * 50
+    assert fake_adsk.calls['Application.fireCustomEvent'] == 1
+
+
+def test_cancel_drops_the_pending_refinement(addin, monkeypatch):
+    monkeypatch.setattr(addin, 'preview_delay', 0.1)
+    run_preview(addin, num_interv_x=100, num_interv_y=100)
+    addin.preview.cancel()
+    addin.remove_preview_graphics()
+    time.sleep(0.3)
+    assert not any(group.isValid for group in graphics_groups())
+    assert fake_adsk.calls['Application.fireCustomEvent'] == 0
+
+
+def test_failed_preview_draws_nothing(addin):
+    status = run_preview(addin, equation='sqrt(x)')
+    assert status.formattedText.startswith('Preview failed: equation is undefined')
+    assert not any(group.isValid for group in graphics_groups())
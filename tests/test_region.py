@@ -0,0 +1,64 @@
+import numpy as np
+import pytest
+
+from eds.expression import EquationError
+from eds.region import compile_mask, is_closed_span, masked_grid, polar_grid
+
+
+def test_mask_logic_works_element_wise():
+    inside = compile_mask('-1 < x <= 1 and y > 0 or x >= 3')
+    x, y = np.array([[-1.0], [0.0], [1.0], [3.0]]), np.array([[-1.0, 1.0]])
+    assert inside(x, y).tolist() == [[False, False], [False, True],
+                                     [False, True], [True, True]]
+    assert compile_mask('x > 0')(np.arange(-1.0, 2.0)[:, None], np.zeros((1, 2))).shape == (3, 2)
+
+
+@pytest.mark.parametrize('mask', ['x <', 'x if y else 1', 'x > 0 and not y > 0',
+                                  'x[0] > 0', 'x.real > 0', 'x == 0'])
+def test_invalid_mask(mask):
+    with pytest.raises(EquationError):
+        compile_mask(mask)
+
+
+def test_open_polar_grid():
+    angles, radii, grid_x, grid_y = polar_grid([[1, 2], [0, np.pi / 2]], 4, 3)
+    assert np.allclose(angles, np.linspace(0, np.pi / 2, 5))
+    assert np.allclose(radii, [2, 5 / 3, 4 / 3, 1])
+    assert np.allclose(np.hypot(grid_x, grid_y), radii[None, :])
+    assert np.allclose(np.arctan2(grid_y, grid_x), angles[:, None])
+    assert not is_closed_span([[1, 2], [0, np.pi / 2]])
+
+
+def test_closed_polar_grid_leaves_out_the_seam():
+    domain = [[0, 1], [-np.pi, np.pi]]
+    assert is_closed_span(domain)
+    angles, _, grid_x, _ = polar_grid(domain, 8, 2)
+    assert len(angles) == 8 and grid_x.shape == (8, 3)
+    assert np.allclose(np.diff(angles), np.pi / 4)
+
+
+def test_masked_grid_spans_the_region():
+    x_values, fractions, grid_x, grid_y = masked_grid('x**2 + y**2 <= 16', [[-5, 5], [-5, 5]], 10, 4)
+    assert np.allclose(fractions, np.linspace(0, 1, 5))
+    assert np.all(grid_x == x_values[:, None])
+    # the edges of every row are on the circle, to within bisection
+    assert np.allclose(grid_x[:, [0, -1]]**2 + grid_y[:, [0, -1]]**2, 16, atol=1e-6)
+    assert np.allclose(grid_y[:, 0], -grid_y[:, -1])
+    # the tips, narrower than min_span of the widest row, are left out
+    assert -4 < x_values[0] < -3.99 and 3.99 < x_values[-1] < 4
+
+
+def test_masked_grid_keeps_edges_at_the_border():
+    _, _, grid_x, grid_y = masked_grid('y < x', [[0, 2], [-1, 1]], 4, 2)
+    assert np.allclose(grid_y[:, 0], -1)
+    assert np.all(grid_y[:, -1] <= np.minimum(grid_x[:, -1], 1) + 1e-9)
+
+
+@pytest.mark.parametrize('mask, message', [
+    ('x > 10', 'does not hold on any area'),
+    ('abs(x) > 1', 'one stretch of x'),
+    ('abs(y) > 1', 'one stretch of x, and of y'),
+])
+def test_unsupported_regions(mask, message):
+    with pytest.raises(ValueError, match=message):
+        masked_grid(mask, [[-2, 2], [-2, 2]], 8, 8)
@@ -0,0 +1,43 @@
+import numpy as np
+import pytest
+
+from eds.scan import grid_coordinates, scan_grid, scan_surface, undefined_text
+from eds.surface import surface_points
+
+
+def test_grid_coordinates_of_axes_and_broadcast_arrays():
+    x, y = np.linspace(0, 1, 3), np.linspace(0, 2, 4)
+    for coordinates in [(x, y), (x[:, None], y[None, :])]:
+        grid_x, grid_y = grid_coordinates(*coordinates)
+        assert grid_x.shape == grid_y.shape == (3, 4)
+        assert np.array_equal(grid_x[:, 0], x) and np.array_equal(grid_y[0], y)
+
+
+def test_undefined_text_names_the_region():
+    x, y = np.linspace(-4, 4, 9), np.linspace(-4, 4, 9)
+    with np.errstate(divide='ignore'):
+        z = 1 / x[:, None] + 0 * y[None, :]
+    text = undefined_text(x[:, None], y[None, :], z)
+    assert text == 'equation is undefined at 9 of 81 samples, for x = 0, y from -4 to 4'
+    assert undefined_text(x, y, z) == text
+
+
+def test_rectangular_grid_with_an_undefined_sample():
+    surface = surface_points('1/x', [[-4, 4], [-4, 4]])
+    with pytest.raises(ValueError, match='undefined at 11 of 121 samples, for x = 0'):
+        surface.calculate_points()
+
+
+def test_scan_finds_jumps_and_passes_continuous_surfaces():
+    x = y = np.linspace(-4, 4, 65)
+    assert scan_grid('x**2 + y**2', x, y) is None
+    assert scan_grid('fmod(x, 1)', x, y).startswith('equation jumps between samples')
+    assert 'undefined' in scan_surface('log(x)', x, y)
+
+
+def test_scan_of_a_mapped_grid():
+    angles, radii = np.linspace(0, np.pi, 17), np.linspace(4, 1, 9)
+    grid_x = np.cos(angles)[:, None] * radii
+    grid_y = np.sin(angles)[:, None] * radii
+    assert scan_surface('sqrt(x**2 + y**2)', grid_x, grid_y) is None
+    assert 'undefined' in scan_surface('log(y)', grid_x, grid_y)
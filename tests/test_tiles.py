@@ -0,0 +1,49 @@
+import numpy as np
+import pytest
+
+from eds.expression import evaluate_equation
+from eds.tiles import evaluate_tiles, grid_tiles, tile_ranges
+
+
+@pytest.mark.parametrize('num_intervals, tile_size', [(10, 3), (9, 3), (4, 10), (1, 1), (7, 0)])
+def test_tiles_share_their_seam(num_intervals, tile_size):
+    ranges = tile_ranges(num_intervals, tile_size)
+    assert ranges[0].start == 0 and ranges[-1].stop == num_intervals + 1
+    assert all(before.stop - 1 == after.start for before, after in zip(ranges, ranges[1:]))
+    assert all(1 <= tile.stop - 1 - tile.start <= (tile_size or num_intervals) for tile in ranges)
+
+
+def test_grid_tiles_cover_the_grid_row_of_tiles_by_row_of_tiles():
+    tiles = grid_tiles(8, 6, 3)
+    assert [(rows.start, rows.stop) for rows, _ in tiles[::2]] == [(0, 4), (3, 7), (6, 8)]
+    assert [(columns.start, columns.stop) for _, columns in tiles[:2]] == [(0, 4), (3, 6)]
+    covered = np.zeros((8, 6), dtype=int)
+    for rows, columns in tiles:
+        covered[rows, columns] += 1
+    # inner seams are in two tiles, where four tiles meet in four
+    assert covered.min() == 1 and covered[3, 3] == 4 and covered[3, 0] == covered[0, 3] == 2
+    assert grid_tiles(8, 6, 0) == [(slice(0, 8), slice(0, 6))]
+
+
+def test_tiles_evaluate_to_the_whole_grid():
+    x_values, y_values = np.linspace(-2, 2, 11), np.linspace(-1, 3, 8)
+    equation = 'sin(x*y) + x**2'
+    z, errors = evaluate_tiles(equation, x_values, y_values, grid_tiles(11, 8, 3), workers=2)
+    assert errors == {}
+    assert np.array_equal(z, evaluate_equation(equation, x_values[:, None], y_values[None, :]))
+
+
+def test_failed_tile_leaves_nan_only_in_its_own_block():
+    x_values = y_values = np.arange(9.0)
+    tiles = grid_tiles(9, 9, 3)
+    # undefined where x and y are 7 or 8 but not both 7, all in the last tile
+    z, errors = evaluate_tiles('sqrt(1 - max(x - 6, 0)*max(y - 6, 0))',
+                               x_values, y_values, tiles)
+    assert list(errors) == [len(tiles) - 1]
+    assert isinstance(errors[len(tiles) - 1], ValueError)
+    rows, columns = tiles[-1]
+    assert (rows.start, columns.start) == (6, 6)
+    # its seams are filled in by the tiles next to it
+    expected = np.zeros((9, 9), dtype=bool)
+    expected[7:, 7:] = True
+    assert np.array_equal(np.isnan(z), expected)